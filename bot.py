@@ -4,6 +4,11 @@ from pyrogram import Client, idle
 from pyrogram import __version__
 from pyrogram.raw.all import layer
 from config import Config
+from helper.database import pp_bots
+from helper.broadcast import resume_broadcasts
+from helper.jobs import resume_jobs, worker_loop
+from helper.downloader import downloader
+from helper.tg_download import session_pool
 from aiohttp import web
 from pytz import timezone
 from datetime import datetime
@@ -24,17 +29,24 @@ logging.getLogger("pyrogram.connection.connection").setLevel(logging.ERROR)
 # Global variables
 premium_client = None
 app = None
+# Built in main(): autotrim's spawn workers re-import this module and must not get a Client
+bot_instance = None
 
 class Bot(Client):
     def __init__(self):
+        is_worker = Config.RUN_MODE == "worker"
         super().__init__(
-            name="pp_bots",
+            # Workers share the bot token, so each gets its own in-memory session
+            name=f"pp_bots_{Config.WORKER_ID}" if is_worker else "pp_bots",
             api_id=Config.API_ID,
             api_hash=Config.API_HASH,
             bot_token=Config.BOT_TOKEN,
             workers=200,
             plugins={"root": "plugins"},
             sleep_threshold=15,
+            in_memory=is_worker,
+            # Workers never receive updates; plugins still load to register job handlers
+            no_updates=is_worker,
         )
 
     async def start(self):
@@ -107,16 +119,28 @@ class Bot(Client):
         else:
             logging.info("ℹ️ No log channel configured")
 
+        if Config.RUN_MODE == "worker":
+            logging.info(f"🛠️ Running as worker {Config.WORKER_ID}")
+            self.jobs_task = asyncio.create_task(worker_loop(self))
+            return
+
+        # Pick up broadcasts interrupted by the last restart
+        self.broadcast_task = asyncio.create_task(resume_broadcasts(self))
+        # ...and media jobs that were queued or running when it went down
+        if Config.RUN_MODE == "all":
+            self.jobs_task = asyncio.create_task(resume_jobs(self))
+
     async def stop(self, *args):
+        await downloader.close()
+        await session_pool.close()
         await super().stop()
         logging.info("Bot Stopped 🙄")
 
 
-bot_instance = Bot()
-
-
 def main():
-    global premium_client, app
+    global premium_client, app, bot_instance
+    
+    bot_instance = Bot()
     
     # Initialize premium user client
     if Config.STRING_SESSION:
@@ -142,6 +166,9 @@ def main():
     async def start_services():
         global premium_client, app
         try:
+            # Check database before anything starts handling updates
+            await pp_bots.ping()
+            
             # Start premium client if available
             if Config.STRING_SESSION and premium_client:
                 logging.info("Starting Premium User Client...")
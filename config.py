@@ -1,7 +1,32 @@
-import re, os, time
+import re, os, time, socket, uuid
 
 id_pattern = re.compile(r'^.\d+$') 
 
+
+def stable_worker_id():
+    """WORKER_ID from the environment, else an ID generated once and kept in WORKER_ID_FILE
+
+    Job leases are keyed on it, so it must survive restarts; hostnames on
+    Heroku/Koyeb change on every boot.
+    """
+    worker_id = os.environ.get("WORKER_ID", "").strip()
+    if worker_id:
+        return worker_id
+    path = os.environ.get("WORKER_ID_FILE", ".worker_id")
+    try:
+        with open(path) as f:
+            worker_id = f.read().strip()
+    except OSError:
+        worker_id = ""
+    if not worker_id:
+        worker_id = f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        try:
+            with open(path, "w") as f:
+                f.write(worker_id)
+        except OSError:
+            pass
+    return worker_id
+
 class Config(object):
     # pyro client config
     API_ID    = os.environ.get("API_ID", "")
@@ -14,6 +39,15 @@ class Config(object):
     # database config
     DB_NAME = os.environ.get("DB_NAME","pp_bots")     
     DB_URL  = os.environ.get("DB_URL","")
+
+    # mongo connection pool
+    DB_MAX_POOL_SIZE = int(os.environ.get("DB_MAX_POOL_SIZE", "50"))
+    DB_MIN_POOL_SIZE = int(os.environ.get("DB_MIN_POOL_SIZE", "5"))
+    DB_MAX_IDLE_MS   = int(os.environ.get("DB_MAX_IDLE_MS", "300000"))
+
+    # per-user settings cache (seconds / max cached users); not used in worker mode
+    USER_CACHE_TTL  = int(os.environ.get("USER_CACHE_TTL", "300"))
+    USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", "5000"))
  
     # other configs
     BOT_UPTIME  = time.time()
@@ -33,6 +67,11 @@ class Config(object):
     else:
         FORCE_SUB_CHANNELS = []
     
+    # Membership check cache (seconds); non-members are re-checked sooner
+    FSUB_CACHE_TTL    = int(os.environ.get("FSUB_CACHE_TTL", "600"))
+    FSUB_NEGATIVE_TTL = int(os.environ.get("FSUB_NEGATIVE_TTL", "30"))
+    FSUB_CACHE_SIZE   = int(os.environ.get("FSUB_CACHE_SIZE", "20000"))
+    
     # LOG_CHANNEL - Parse safely (OPTIONAL)
     log_channel_str = os.environ.get("LOG_CHANNEL", "0")
     try:
@@ -42,6 +81,84 @@ class Config(object):
     
     PORT = int(os.environ.get("PORT", "8080"))
     
+    # Broadcast engine: parallel senders sharing one global rate limit (msgs/sec)
+    BROADCAST_CONCURRENCY = int(os.environ.get("BROADCAST_CONCURRENCY", "10"))
+    BROADCAST_RATE        = float(os.environ.get("BROADCAST_RATE", "25"))
+    BROADCAST_BATCH_SIZE  = int(os.environ.get("BROADCAST_BATCH_SIZE", "200"))
+    
+    # Media job scheduler: global slots per job kind and per-user cap
+    MAX_ENCODE_JOBS   = int(os.environ.get("MAX_ENCODE_JOBS", str(max(1, (os.cpu_count() or 2) // 2))))
+    MAX_RENAME_JOBS   = int(os.environ.get("MAX_RENAME_JOBS", "5"))
+    MAX_JOBS_PER_USER = int(os.environ.get("MAX_JOBS_PER_USER", "2"))
+    
+    # Persistent job queue: leases are renewed every heartbeat while a job runs
+    WORKER_ID             = stable_worker_id()
+    JOB_LEASE_SECONDS     = int(os.environ.get("JOB_LEASE_SECONDS", "120"))
+    JOB_HEARTBEAT_SECONDS = int(os.environ.get("JOB_HEARTBEAT_SECONDS", "30"))
+    # Jobs whose worker died this many times are failed instead of claimed again
+    JOB_MAX_ATTEMPTS      = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+    # How often "all" mode looks for jobs whose lease expired after boot
+    JOB_RECLAIM_SECONDS   = float(os.environ.get("JOB_RECLAIM_SECONDS", "30"))
+    # Finished jobs are dropped by a TTL index this long after they end
+    JOB_RETENTION_DAYS    = int(os.environ.get("JOB_RETENTION_DAYS", "7"))
+    
+    # "all" = one process does everything, "frontend" = handle updates and enqueue
+    # jobs only, "worker" = no updates, just claim and run jobs from the shared queue
+    RUN_MODE            = os.environ.get("RUN_MODE", "all").lower()
+    WORKER_CONCURRENCY  = int(os.environ.get("WORKER_CONCURRENCY", str(MAX_ENCODE_JOBS + MAX_RENAME_JOBS)))
+    WORKER_POLL_SECONDS = float(os.environ.get("WORKER_POLL_SECONDS", "2"))
+    
+    # Autotrim: worker processes and frame sampling for intro detection
+    AUTOTRIM_WORKERS     = int(os.environ.get("AUTOTRIM_WORKERS", str(os.cpu_count() or 2)))
+    # Videos are analysed in up to AUTOTRIM_WORKERS time windows of at least this many seconds
+    AUTOTRIM_MIN_WINDOW  = float(os.environ.get("AUTOTRIM_MIN_WINDOW", "120"))
+    # Frame sampler: "ffmpeg" (low-res gray over a pipe), "grab" (cv2 grab/retrieve) or "read" (legacy)
+    AUTOTRIM_SAMPLER     = os.environ.get("AUTOTRIM_SAMPLER", "ffmpeg").lower()
+    AUTOTRIM_SAMPLE_FPS  = float(os.environ.get("AUTOTRIM_SAMPLE_FPS", "5"))
+    AUTOTRIM_FRAME_WIDTH = int(os.environ.get("AUTOTRIM_FRAME_WIDTH", "320"))
+    # Matcher: "template" (correlation on every frame) or "dhash" (hash prefilter + confirmation)
+    AUTOTRIM_MATCHER       = os.environ.get("AUTOTRIM_MATCHER", "template").lower()
+    AUTOTRIM_HASH_DISTANCE = int(os.environ.get("AUTOTRIM_HASH_DISTANCE", "12"))
+    # Intro fingerprint: frames sampled across the intro, and the mean similarity an alignment needs
+    AUTOTRIM_FINGERPRINT_FRAMES = int(os.environ.get("AUTOTRIM_FINGERPRINT_FRAMES", "16"))
+    AUTOTRIM_MATCH_THRESHOLD    = float(os.environ.get("AUTOTRIM_MATCH_THRESHOLD", "0.7"))
+    # Detector: "video" (fingerprint frames) or "audio" (intro jingle spectrogram peaks)
+    AUTOTRIM_DETECTOR           = os.environ.get("AUTOTRIM_DETECTOR", "video").lower()
+    AUTOTRIM_AUDIO_RATE         = int(os.environ.get("AUTOTRIM_AUDIO_RATE", "8000"))
+    # How far (in standard deviations per spectrogram frame) the jingle's peaks must stand out
+    AUTOTRIM_AUDIO_THRESHOLD    = float(os.environ.get("AUTOTRIM_AUDIO_THRESHOLD", "1.5"))
+    # Cutting: "copy" (stream copy, keyframe-aligned) or "reencode" (frame-accurate, slower)
+    AUTOTRIM_TRIM_MODE          = os.environ.get("AUTOTRIM_TRIM_MODE", "copy").lower()
+    # Intro fingerprints kept on disk (least recently used evicted past this count)
+    AUTOTRIM_TEMPLATE_DIR       = os.environ.get("AUTOTRIM_TEMPLATE_DIR", "templates")
+    AUTOTRIM_TEMPLATE_CACHE     = int(os.environ.get("AUTOTRIM_TEMPLATE_CACHE", "50"))
+    
+    # Link downloads: chunk size, parallel Range connections per file, and retries before giving up
+    DOWNLOAD_CHUNK_SIZE        = int(os.environ.get("DOWNLOAD_CHUNK_SIZE", str(1024 * 1024)))
+    DOWNLOAD_CONNECTIONS       = int(os.environ.get("DOWNLOAD_CONNECTIONS", "4"))
+    DOWNLOAD_MIN_PART_SIZE     = int(os.environ.get("DOWNLOAD_MIN_PART_SIZE", str(16 * 1024 * 1024)))
+    DOWNLOAD_RETRIES           = int(os.environ.get("DOWNLOAD_RETRIES", "5"))
+    DOWNLOAD_PROGRESS_INTERVAL = float(os.environ.get("DOWNLOAD_PROGRESS_INTERVAL", "5"))
+    
+    # Telegram downloads: parallel upload.GetFile over this many media sessions per client
+    TG_DOWNLOAD_PARALLEL    = os.environ.get("TG_DOWNLOAD_PARALLEL", "True").lower() in ["true", "1", "yes"]
+    TG_DOWNLOAD_CONNECTIONS = int(os.environ.get("TG_DOWNLOAD_CONNECTIONS", "4"))
+    TG_DOWNLOAD_MIN_SIZE    = int(os.environ.get("TG_DOWNLOAD_MIN_SIZE", str(20 * 1024 * 1024)))
+    TG_DOWNLOAD_RETRIES     = int(os.environ.get("TG_DOWNLOAD_RETRIES", "3"))
+
+    # Telegram uploads: parallel upload.SaveBigFilePart over this many media sessions
+    TG_UPLOAD_PARALLEL    = os.environ.get("TG_UPLOAD_PARALLEL", "True").lower() in ["true", "1", "yes"]
+    TG_UPLOAD_CONNECTIONS = int(os.environ.get("TG_UPLOAD_CONNECTIONS", "4"))
+    TG_UPLOAD_MIN_SIZE    = int(os.environ.get("TG_UPLOAD_MIN_SIZE", str(20 * 1024 * 1024)))
+    TG_UPLOAD_RETRIES     = int(os.environ.get("TG_UPLOAD_RETRIES", "3"))
+
+    # Renames that leave the bytes alone: resend the file_id, or relay parts without a local copy
+    RENAME_REUSE_FILE_ID = os.environ.get("RENAME_REUSE_FILE_ID", "True").lower() in ["true", "1", "yes"]
+    RENAME_RELAY         = os.environ.get("RENAME_RELAY", "True").lower() in ["true", "1", "yes"]
+
+    # Trim uploaded files by fetching only the parts ffmpeg seeks to (falls back to a full download)
+    TRIM_PARTIAL_DOWNLOAD = os.environ.get("TRIM_PARTIAL_DOWNLOAD", "True").lower() in ["true", "1", "yes"]
+    
     # File size limits
     MAX_FILE_SIZE = 4 * 1024 * 1024 * 1024  # 4GB in bytes
     MAX_FILE_SIZE_NON_PREMIUM = 2 * 1024 * 1024 * 1024  # 2GB for non-premium
@@ -0,0 +1,205 @@
+from pyrogram.errors import FloodWait, InputUserDeactivated, UserIsBlocked, PeerIdInvalid
+from helper.database import pp_bots
+from config import Config
+import asyncio
+import datetime
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Global send-rate limiter shared by every broadcast sender"""
+
+    def __init__(self, rate, min_rate=1.0):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.paused_until = 0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # Senders queue on the lock, so tokens are handed out in FIFO order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+
+                # Refill from the end of any FloodWait pause, or a full bucket bursts out at once
+                since = max(self.updated, self.paused_until)
+                self.tokens = min(self.rate, self.tokens + (now - since) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def on_success(self):
+        # Additive recovery towards the configured rate after a slowdown
+        self.rate = min(self.max_rate, self.rate + 0.05)
+
+    def on_flood_wait(self, seconds):
+        # Telegram throttles per bot, so every sender pauses, then resumes slower
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.rate = max(self.min_rate, self.rate * 0.7)
+        self.tokens = 0
+
+
+class Broadcast:
+    """Copies one message to every user with N concurrent senders, checkpointing to Mongo"""
+
+    def __init__(self, client, state):
+        self.client = client
+        self.state = state
+        self.bucket = TokenBucket(Config.BROADCAST_RATE)
+        self.semaphore = asyncio.Semaphore(Config.BROADCAST_CONCURRENCY)
+
+    @classmethod
+    async def create(cls, client, message, status_msg):
+        state = {
+            'status': "running",
+            'from_chat_id': message.chat.id,
+            'message_id': message.id,
+            'status_chat_id': status_msg.chat.id,
+            'status_message_id': status_msg.id,
+            'total': await pp_bots.total_users_count(),
+            'last_id': None,
+            'done': 0,
+            'success': 0,
+            'failed': 0,
+            'deleted': 0,
+            'started_at': time.time(),
+        }
+        state['_id'] = await pp_bots.create_broadcast(dict(state))
+        return cls(client, state)
+
+    async def run(self):
+        try:
+            batch = []
+            async for user_id in pp_bots.iter_user_ids(
+                batch_size=Config.BROADCAST_BATCH_SIZE,
+                start_after=self.state['last_id']
+            ):
+                batch.append(user_id)
+                if len(batch) >= Config.BROADCAST_BATCH_SIZE:
+                    await self._send_batch(batch)
+                    batch = []
+            if batch:
+                await self._send_batch(batch)
+        except Exception as e:
+            # Don't leave it "running": that blocks new broadcasts until a restart
+            logger.error(f"Broadcast {self.state['_id']} failed after user {self.state['last_id']}: {e}")
+            self.state['status'] = "failed"
+            self.state['error'] = str(e)
+            await self._save()
+            await self._edit_status(error=e)
+            return
+
+        self.state['status'] = "done"
+        await self._save()
+        await self._edit_status(final=True)
+
+    async def _send_batch(self, user_ids):
+        results = await asyncio.gather(*(self._send(user_id) for user_id in user_ids))
+
+        dead = [user_id for user_id, sts in zip(user_ids, results) if sts == 400]
+        if dead:
+            await pp_bots.delete_users(dead)
+
+        self.state['done'] += len(user_ids)
+        self.state['success'] += sum(1 for sts in results if sts == 200)
+        self.state['failed'] += sum(1 for sts in results if sts != 200)
+        self.state['deleted'] += len(dead)
+        # Ids come sorted, so once the whole batch is through this is a safe resume point
+        self.state['last_id'] = user_ids[-1]
+
+        await self._save()
+        await self._edit_status()
+
+    async def _send(self, user_id):
+        async with self.semaphore:
+            for _ in range(5):
+                await self.bucket.acquire()
+                try:
+                    await self.client.copy_message(
+                        chat_id=int(user_id),
+                        from_chat_id=self.state['from_chat_id'],
+                        message_id=self.state['message_id']
+                    )
+                    self.bucket.on_success()
+                    return 200
+                except FloodWait as e:
+                    logger.warning(f"Broadcast FloodWait: {e.value}s")
+                    self.bucket.on_flood_wait(e.value)
+                except InputUserDeactivated:
+                    logger.info(f"{user_id}: Deactivated")
+                    return 400
+                except UserIsBlocked:
+                    logger.info(f"{user_id}: Blocked")
+                    return 400
+                except PeerIdInvalid:
+                    logger.info(f"{user_id}: Peer id invalid")
+                    return 500
+                except Exception as e:
+                    logger.error(f"{user_id}: Broadcast error: {e}")
+                    return 500
+            return 500
+
+    async def _save(self):
+        fields = {k: v for k, v in self.state.items() if k != '_id'}
+        await pp_bots.update_broadcast(self.state['_id'], fields)
+
+    async def _edit_status(self, final=False, error=None):
+        state = self.state
+        total = state['total'] or 1
+        if error is not None:
+            text = (
+                f"**❌ Broadcast Failed!**\n\n"
+                f"**Completed:** `{state['done']}/{state['total']}`\n"
+                f"**Success:** `{state['success']}` ✅\n"
+                f"**Failed:** `{state['failed']}` ❌\n"
+                f"**Error:** `{error}`"
+            )
+        elif final:
+            completed_in = datetime.timedelta(seconds=int(time.time() - state['started_at']))
+            text = (
+                f"**✅ Broadcast Completed!**\n\n"
+                f"**Total Users:** `{state['total']}`\n"
+                f"**Completed:** `{state['done']}/{state['total']}`\n"
+                f"**Success:** `{state['success']}` ✅\n"
+                f"**Failed:** `{state['failed']}` ❌\n"
+                f"**Removed (blocked/deleted):** `{state['deleted']}`\n"
+                f"**Time Taken:** `{completed_in}`\n\n"
+                f"**Powered by @pp_bots**"
+            )
+        else:
+            text = (
+                f"**📢 Broadcast In Progress**\n\n"
+                f"**Total Users:** `{state['total']}`\n"
+                f"**Completed:** `{state['done']}/{state['total']}`\n"
+                f"**Success:** `{state['success']}` ✅\n"
+                f"**Failed:** `{state['failed']}` ❌\n"
+                f"**Progress:** `{(state['done']/total)*100:.1f}%`\n"
+                f"**Send Rate:** `{self.bucket.rate:.1f}/s`"
+            )
+        try:
+            await self.client.edit_message_text(
+                state['status_chat_id'], state['status_message_id'], text
+            )
+        except Exception:
+            pass
+
+
+async def resume_broadcasts(client):
+    """Continue broadcasts that were interrupted by a restart"""
+    for state in await pp_bots.get_unfinished_broadcasts():
+        logger.info(f"Resuming broadcast {state['_id']} after user {state['last_id']}")
+        try:
+            await Broadcast(client, state).run()
+        except Exception as e:
+            logger.error(f"Error resuming broadcast {state['_id']}: {e}")
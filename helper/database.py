@@ -1,18 +1,129 @@
 import motor.motor_asyncio
 from config import Config
+from helper.cache import TTLCache
+from pymongo import ASCENDING, ReturnDocument, UpdateOne
+from datetime import datetime, timedelta
 import logging
+import copy
+import time
+
+# Marks a cache miss, since a cached user document may legitimately be None
+_MISSING = object()
+
+# Fields that only the merge queue methods read; kept out of the settings cache
+_SETTINGS_PROJECTION = {"merge_queue": 0}
+
+# UserSettings attribute -> document field, where the two differ
+_SETTINGS_FIELDS = {
+    "thumbnail": "file_id",
+    "caption": "caption",
+    "metadata": "metadata",
+    "metadata_code": "metadata_code",
+    "format_template": "format_template",
+    "upload_channel": "upload_channel",
+    "media_mode": "media_mode",
+    "media_preference": "media_type",
+    "remove_words": "remove_words",
+    "replace_words": "replace_words",
+    "prefix": "prefix",
+    "suffix": "suffix",
+    "merge_type": "merge_type",
+    "compression_qualities": "compression_qualities",
+}
+
+
+class UserSettings:
+    """Snapshot of all of a user's settings, loaded with a single query"""
+
+    __slots__ = (
+        "thumbnail", "caption", "metadata", "metadata_code", "format_template",
+        "upload_channel", "media_mode", "media_preference", "remove_words",
+        "replace_words", "prefix", "suffix", "merge_type", "compression_qualities",
+    )
+
+    def __init__(self, user=None):
+        user = user or {}
+        # Defaults mirror the individual get_* methods
+        self.thumbnail = user.get("file_id", None)
+        self.caption = user.get("caption", None)
+        self.metadata = user.get("metadata", True)
+        self.metadata_code = user.get("metadata_code", "Telegram : @pp_bots")
+        self.format_template = user.get("format_template", None)
+        self.upload_channel = user.get("upload_channel", None)
+        self.media_mode = user.get("media_mode", "rename")
+        self.media_preference = user.get("media_type", None)
+        self.remove_words = user.get("remove_words", [])
+        self.replace_words = user.get("replace_words", {})
+        self.prefix = user.get("prefix", None)
+        self.suffix = user.get("suffix", None)
+        self.merge_type = user.get("merge_type", None)
+        self.compression_qualities = user.get("compression_qualities", [])
+
 
 class Database:
     def __init__(self, uri, database_name):
-        try:
-            self._client = motor.motor_asyncio.AsyncIOMotorClient(uri)
-            self._client.server_info()
-            logging.info("Successfully connected to MongoDB")
+        self._cache = TTLCache(Config.USER_CACHE_SIZE, Config.USER_CACHE_TTL)
+        # Settings change through the frontend, whose invalidation a worker
+        # process never sees: workers always read them fresh
+        self._cache_users = Config.RUN_MODE != "worker"
+        try:
+            self._client = motor.motor_asyncio.AsyncIOMotorClient(
+                uri,
+                maxPoolSize=Config.DB_MAX_POOL_SIZE,
+                minPoolSize=Config.DB_MIN_POOL_SIZE,
+                maxIdleTimeMS=Config.DB_MAX_IDLE_MS,
+            )
         except Exception as e:
-            logging.error(f"Failed to connect to MongoDB: {e}")
+            logging.error(f"Failed to create MongoDB client: {e}")
             raise e
         self.pp_bots = self._client[database_name]
         self.col = self.pp_bots.user
+        self.broadcasts = self.pp_bots.broadcasts
+        self.jobs = self.pp_bots.jobs
+
+    async def ping(self):
+        """Round-trip to the server at startup so the pool is warm before updates arrive"""
+        start = time.perf_counter()
+        try:
+            await self._client.admin.command("ping")
+        except Exception as e:
+            logging.error(f"Failed to connect to MongoDB: {e}")
+            raise e
+        elapsed = (time.perf_counter() - start) * 1000
+        logging.info(f"Successfully connected to MongoDB ({elapsed:.1f} ms)")
+        await self.ensure_indexes()
+        return elapsed
+
+    async def ensure_indexes(self):
+        """Indexes for the job queue: claim lookups, and TTL cleanup of finished jobs"""
+        try:
+            await self.jobs.create_index(
+                [("status", ASCENDING), ("lease_until", ASCENDING), ("created_at", ASCENDING)]
+            )
+            await self.jobs.create_index("expire_at", expireAfterSeconds=0)
+        except Exception as e:
+            logging.error(f"Error creating job indexes: {e}")
+
+    # User cache
+    async def _get_user(self, id):
+        """Read-through lookup of a user's settings document"""
+        if not self._cache_users:
+            return await self.col.find_one({"_id": int(id)}, _SETTINGS_PROJECTION)
+        user = self._cache.get(int(id), _MISSING)
+        if user is _MISSING:
+            version = self._cache.version
+            user = await self.col.find_one({"_id": int(id)}, _SETTINGS_PROJECTION)
+            # Don't cache a document that a concurrent write may already have changed
+            if self._cache.version == version:
+                self._cache.set(int(id), user)
+        # Callers mutate the returned lists/dicts before saving them back
+        return copy.deepcopy(user)
+
+    def _invalidate(self, id):
+        self._cache.invalidate(int(id))
+
+    def cache_stats(self):
+        return self._cache.stats()
 
     def new_user(self, id):
         return dict(
@@ -44,15 +155,61 @@ class Database:
                 await send_log(b, u)
             except Exception as e:
                 logging.error(f"Error adding user {u.id}: {e}")
+            self._invalidate(u.id)
 
     async def is_user_exist(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
+            user = await self._get_user(id)
             return bool(user)
         except Exception as e:
             logging.error(f"Error checking if user {id} exists: {e}")
             return False
 
+    async def get_user_settings(self, id):
+        try:
+            user = await self._get_user(id)
+        except Exception as e:
+            logging.error(f"Error getting settings for user {id}: {e}")
+            user = None
+        return UserSettings(user)
+
+    def _settings_update(self, fields):
+        unknown = set(fields) - set(_SETTINGS_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+        return {"$set": {_SETTINGS_FIELDS[name]: value for name, value in fields.items()}}
+
+    async def update_settings(self, id, **fields):
+        """Set several settings at once with a single atomic $set"""
+        if not fields:
+            return
+        try:
+            await self.col.update_one({"_id": int(id)}, self._settings_update(fields))
+        except Exception as e:
+            logging.error(f"Error updating settings for user {id}: {e}")
+        self._invalidate(id)
+
+    async def bulk_update_settings(self, updates):
+        """Apply {user_id: {setting: value}} for many users in one bulk_write"""
+        if not updates:
+            return 0
+        try:
+            requests = [
+                UpdateOne({"_id": int(user_id)}, self._settings_update(fields))
+                for user_id, fields in updates.items()
+                if fields
+            ]
+            if not requests:
+                return 0
+            result = await self.col.bulk_write(requests, ordered=False)
+            return result.modified_count
+        except Exception as e:
+            logging.error(f"Error bulk updating settings for {len(updates)} users: {e}")
+            return 0
+        finally:
+            for user_id in updates:
+                self._invalidate(user_id)
+
     async def total_users_count(self):
         try:
             count = await self.col.count_documents({})
@@ -69,11 +226,182 @@ class Database:
             logging.error(f"Error getting all users: {e}")
             return None
 
+    async def iter_user_ids(self, batch_size=1000, start_after=None):
+        """Stream user ids in _id order, resuming after start_after if given"""
+        query = {"_id": {"$gt": int(start_after)}} if start_after is not None else {}
+        try:
+            cursor = self.col.find(query, {"_id": 1}).sort("_id", 1).batch_size(batch_size)
+            async for user in cursor:
+                yield user["_id"]
+        except Exception as e:
+            logging.error(f"Error iterating user ids after {start_after}: {e}")
+            # Surface it: a silently short iteration would look like a finished broadcast
+            raise
+
     async def delete_user(self, user_id):
         try:
             await self.col.delete_many({"_id": int(user_id)})
         except Exception as e:
             logging.error(f"Error deleting user {user_id}: {e}")
+        self._invalidate(user_id)
+
+    async def delete_users(self, user_ids):
+        if not user_ids:
+            return 0
+        try:
+            result = await self.col.delete_many({"_id": {"$in": [int(i) for i in user_ids]}})
+            return result.deleted_count
+        except Exception as e:
+            logging.error(f"Error deleting {len(user_ids)} users: {e}")
+            return 0
+        finally:
+            for user_id in user_ids:
+                self._invalidate(user_id)
+
+    # Broadcast progress
+    async def create_broadcast(self, broadcast):
+        try:
+            result = await self.broadcasts.insert_one(broadcast)
+            return result.inserted_id
+        except Exception as e:
+            logging.error(f"Error creating broadcast: {e}")
+            return None
+
+    async def update_broadcast(self, broadcast_id, fields):
+        try:
+            await self.broadcasts.update_one({"_id": broadcast_id}, {"$set": fields})
+        except Exception as e:
+            logging.error(f"Error updating broadcast {broadcast_id}: {e}")
+
+    async def get_unfinished_broadcasts(self):
+        try:
+            return await self.broadcasts.find({"status": "running"}).to_list(length=None)
+        except Exception as e:
+            logging.error(f"Error getting unfinished broadcasts: {e}")
+            return []
+
+    # Persistent media jobs
+    def _claimable(self, now):
+        # Pending jobs, or running ones whose worker stopped renewing its lease,
+        # unless workers already died on them JOB_MAX_ATTEMPTS times
+        return {
+            "$or": [
+                {"status": "pending"},
+                {"status": "running", "lease_until": {"$lt": now}},
+            ],
+            "attempts": {"$lt": Config.JOB_MAX_ATTEMPTS},
+        }
+
+    def _finished(self, status, error=None):
+        return {
+            "status": status,
+            "error": error,
+            "finished_at": time.time(),
+            # TTL index on this field removes the job after the retention period
+            "expire_at": datetime.utcnow() + timedelta(days=Config.JOB_RETENTION_DAYS),
+        }
+
+    def _claim_update(self, worker, lease_seconds, now):
+        return {
+            "$set": {
+                "status": "running",
+                "worker": worker,
+                "lease_until": now + lease_seconds,
+                "heartbeat_at": now,
+            },
+            "$inc": {"attempts": 1},
+        }
+
+    async def create_job(self, job):
+        try:
+            result = await self.jobs.insert_one(job)
+            return result.inserted_id
+        except Exception as e:
+            logging.error(f"Error creating job: {e}")
+            return None
+
+    async def claim_job(self, job_id, worker, lease_seconds):
+        now = time.time()
+        try:
+            return await self.jobs.find_one_and_update(
+                {"_id": job_id, **self._claimable(now)},
+                self._claim_update(worker, lease_seconds, now),
+                return_document=ReturnDocument.AFTER
+            )
+        except Exception as e:
+            logging.error(f"Error claiming job {job_id}: {e}")
+            return None
+
+    async def claim_next_job(self, worker, lease_seconds, names=None):
+        now = time.time()
+        query = self._claimable(now)
+        if names is not None:
+            query["name"] = {"$in": list(names)}
+        try:
+            return await self.jobs.find_one_and_update(
+                query,
+                self._claim_update(worker, lease_seconds, now),
+                sort=[("created_at", 1)],
+                return_document=ReturnDocument.AFTER
+            )
+        except Exception as e:
+            logging.error(f"Error claiming next job: {e}")
+            return None
+
+    async def heartbeat_job(self, job_id, worker, lease_seconds):
+        """Extend the lease; False means another worker has taken the job over"""
+        now = time.time()
+        try:
+            result = await self.jobs.update_one(
+                {"_id": job_id, "worker": worker, "status": "running"},
+                {"$set": {"lease_until": now + lease_seconds, "heartbeat_at": now}}
+            )
+            return result.matched_count > 0
+        except Exception as e:
+            logging.error(f"Error renewing lease for job {job_id}: {e}")
+            # Keep working through a transient DB error; the lease covers it
+            return True
+
+    async def finish_job(self, job_id, worker, status, error=None):
+        """Record the outcome, unless another worker has taken the job over meanwhile"""
+        try:
+            await self.jobs.update_one(
+                {"_id": job_id, "worker": worker, "status": "running"},
+                {"$set": self._finished(status, error)}
+            )
+        except Exception as e:
+            logging.error(f"Error finishing job {job_id}: {e}")
+
+    async def fail_exhausted_jobs(self):
+        """Fail jobs that crashed their worker JOB_MAX_ATTEMPTS times, instead of leaving them claimable"""
+        now = time.time()
+        try:
+            result = await self.jobs.update_many(
+                {
+                    "$or": [
+                        {"status": "pending"},
+                        {"status": "running", "lease_until": {"$lt": now}},
+                    ],
+                    "attempts": {"$gte": Config.JOB_MAX_ATTEMPTS},
+                },
+                {"$set": self._finished("failed", f"gave up after {Config.JOB_MAX_ATTEMPTS} attempts")}
+            )
+            return result.modified_count
+        except Exception as e:
+            logging.error(f"Error failing exhausted jobs: {e}")
+            return 0
+
+    async def requeue_worker_jobs(self, worker):
+        """Hand back jobs a previous run of this worker left running"""
+        try:
+            result = await self.jobs.update_many(
+                {"status": "running", "worker": worker},
+                {"$set": {"status": "pending", "lease_until": 0}}
+            )
+            return result.modified_count
+        except Exception as e:
+            logging.error(f"Error requeueing jobs for {worker}: {e}")
+            return 0
 
     # Thumbnail
     async def set_thumbnail(self, id, file_id):
@@ -81,10 +409,11 @@ class Database:
             await self.col.update_one({"_id": int(id)}, {"$set": {"file_id": file_id}})
         except Exception as e:
             logging.error(f"Error setting thumbnail for user {id}: {e}")
+        self._invalidate(id)
 
     async def get_thumbnail(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
+            user = await self._get_user(id)
             return user.get("file_id", None) if user else None
         except Exception as e:
             logging.error(f"Error getting thumbnail for user {id}: {e}")
@@ -96,10 +425,11 @@ class Database:
             await self.col.update_one({"_id": int(id)}, {"$set": {"caption": caption}})
         except Exception as e:
             logging.error(f"Error setting caption for user {id}: {e}")
+        self._invalidate(id)
 
     async def get_caption(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
+            user = await self._get_user(id)
             return user.get("caption", None) if user else None
         except Exception as e:
             logging.error(f"Error getting caption for user {id}: {e}")
@@ -113,10 +443,11 @@ class Database:
             )
         except Exception as e:
             logging.error(f"Error setting format template for user {id}: {e}")
+        self._invalidate(id)
 
     async def get_format_template(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
+            user = await self._get_user(id)
             return user.get("format_template", None) if user else None
         except Exception as e:
             logging.error(f"Error getting format template for user {id}: {e}")
@@ -130,10 +461,11 @@ class Database:
             )
         except Exception as e:
             logging.error(f"Error setting media preference for user {id}: {e}")
+        self._invalidate(id)
 
     async def get_media_preference(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
+            user = await self._get_user(id)
             return user.get("media_type", None) if user else None
         except Exception as e:
             logging.error(f"Error getting media preference for user {id}: {e}")
@@ -147,10 +479,11 @@ class Database:
             )
         except Exception as e:
             logging.error(f"Error setting metadata for user {id}: {e}")
+        self._invalidate(id)
 
     async def get_metadata(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
+            user = await self._get_user(id)
             return user.get("metadata", True) if user else True
         except Exception as e:
             logging.error(f"Error getting metadata for user {id}: {e}")
@@ -163,10 +496,11 @@ class Database:
             )
         except Exception as e:
             logging.error(f"Error setting metadata code for user {id}: {e}")
+        self._invalidate(id)
 
     async def get_metadata_code(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
+            user = await self._get_user(id)
             return user.get("metadata_code", "Telegram : @pp_bots") if user else "Telegram : @pp_bots"
         except Exception as e:
             logging.error(f"Error getting metadata code for user {id}: {e}")
@@ -180,10 +514,11 @@ class Database:
             )
         except Exception as e:
             logging.error(f"Error setting upload channel for user {id}: {e}")
+        self._invalidate(id)
 
     async def get_upload_channel(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
+            user = await self._get_user(id)
             return user.get("upload_channel", None) if user else None
         except Exception as e:
             logging.error(f"Error getting upload channel for user {id}: {e}")
@@ -196,6 +531,7 @@ class Database:
             )
         except Exception as e:
             logging.error(f"Error deleting upload channel for user {id}: {e}")
+        self._invalidate(id)
 
     # Media mode
     async def set_media_mode(self, id, mode):
@@ -205,10 +541,11 @@ class Database:
             )
         except Exception as e:
             logging.error(f"Error setting media mode for user {id}: {e}")
+        self._invalidate(id)
 
     async def get_media_mode(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
+            user = await self._get_user(id)
             return user.get("media_mode", "rename") if user else "rename"
         except Exception as e:
             logging.error(f"Error getting media mode for user {id}: {e}")
@@ -222,10 +559,11 @@ class Database:
             )
         except Exception as e:
             logging.error(f"Error setting remove words for user {id}: {e}")
+        self._invalidate(id)
 
     async def get_remove_words(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
+            user = await self._get_user(id)
             return user.get("remove_words", []) if user else []
         except Exception as e:
             logging.error(f"Error getting remove words for user {id}: {e}")
@@ -239,30 +577,85 @@ class Database:
             )
         except Exception as e:
             logging.error(f"Error setting replace words for user {id}: {e}")
+        self._invalidate(id)
 
     async def get_replace_words(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
+            user = await self._get_user(id)
             return user.get("replace_words", {}) if user else {}
         except Exception as e:
             logging.error(f"Error getting replace words for user {id}: {e}")
             return {}
 
     # Merge queue
+    async def _update_merge_queue(self, query, update):
+        """Apply an atomic update and return the resulting queue in the same round trip"""
+        user = await self.col.find_one_and_update(
+            query,
+            update,
+            projection={"merge_queue": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        return user.get("merge_queue", []) if user else None
+
     async def add_to_merge_queue(self, id, file_info):
         try:
-            user = await self.col.find_one({"_id": int(id)})
-            queue = user.get("merge_queue", []) if user else []
-            queue.append(file_info)
-            await self.col.update_one(
-                {"_id": int(id)}, {"$set": {"merge_queue": queue}}
+            queue = await self._update_merge_queue(
+                {"_id": int(id)}, {"$push": {"merge_queue": file_info}}
             )
+            return queue or []
         except Exception as e:
             logging.error(f"Error adding to merge queue for user {id}: {e}")
+            return []
+
+    async def remove_from_merge_queue(self, id, file_info):
+        try:
+            queue = await self._update_merge_queue(
+                {"_id": int(id)},
+                {"$pull": {"merge_queue": {
+                    "file_id": file_info["file_id"],
+                    "message_id": file_info["message_id"],
+                }}},
+            )
+            return queue or []
+        except Exception as e:
+            logging.error(f"Error removing from merge queue for user {id}: {e}")
+            return []
+
+    async def pop_merge_queue(self, id):
+        try:
+            queue = await self._update_merge_queue(
+                {"_id": int(id)}, {"$pop": {"merge_queue": 1}}
+            )
+            return queue or []
+        except Exception as e:
+            logging.error(f"Error removing last merge queue item for user {id}: {e}")
+            return []
+
+    async def move_in_merge_queue(self, id, old_index, new_index):
+        """Move one queue entry, retrying if another handler changed the queue meanwhile"""
+        try:
+            for _ in range(5):
+                queue = await self.get_merge_queue(id)
+                if not (0 <= old_index < len(queue) and 0 <= new_index < len(queue)):
+                    return queue
+                reordered = list(queue)
+                reordered.insert(new_index, reordered.pop(old_index))
+                # Only applies if the queue is still exactly what we read
+                result = await self._update_merge_queue(
+                    {"_id": int(id), "merge_queue": queue},
+                    {"$set": {"merge_queue": reordered}},
+                )
+                if result is not None:
+                    return result
+            return await self.get_merge_queue(id)
+        except Exception as e:
+            logging.error(f"Error reordering merge queue for user {id}: {e}")
+            return []
 
     async def get_merge_queue(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
+            user = await self.col.find_one({"_id": int(id)}, {"merge_queue": 1})
             return user.get("merge_queue", []) if user else []
         except Exception as e:
             logging.error(f"Error getting merge queue for user {id}: {e}")
@@ -284,10 +677,11 @@ class Database:
             )
         except Exception as e:
             logging.error(f"Error setting merge type for user {id}: {e}")
+        self._invalidate(id)
 
     async def get_merge_type(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
+            user = await self._get_user(id)
             return user.get("merge_type", None) if user else None
         except Exception as e:
             logging.error(f"Error getting merge type for user {id}: {e}")
@@ -301,10 +695,11 @@ class Database:
             )
         except Exception as e:
             logging.error(f"Error setting compression qualities for user {id}: {e}")
+        self._invalidate(id)
 
     async def get_compression_qualities(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
+            user = await self._get_user(id)
             return user.get("compression_qualities", []) if user else []
         except Exception as e:
             logging.error(f"Error getting compression qualities for user {id}: {e}")
@@ -318,10 +713,11 @@ class Database:
             )
         except Exception as e:
             logging.error(f"Error setting prefix for user {id}: {e}")
+        self._invalidate(id)
             
     async def get_prefix(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
+            user = await self._get_user(id)
             return user.get("prefix", None) if user else None
         except Exception as e:
             logging.error(f"Error getting prefix for user {id}: {e}")
@@ -335,10 +731,11 @@ class Database:
             )
         except Exception as e:
             logging.error(f"Error setting suffix for user {id}: {e}")
+        self._invalidate(id)
             
     async def get_suffix(self, id):
         try:
-            user = await self.col.find_one({"_id": int(id)})
+            user = await self._get_user(id)
             return user.get("suffix", None) if user else None
         except Exception as e:
             logging.error(f"Error getting suffix for user {id}: {e}")
@@ -346,7 +743,6 @@ class Database:
 
 
 
+# One client/pool for the whole process; the old module name is kept as an alias
 pp_bots = Database(Config.DB_URL, Config.DB_NAME)
-AshutoshGoswami24 = Database(Config.DB_URL, Config.DB_NAME)
-
-
+AshutoshGoswami24 = pp_bots
@@ -0,0 +1,187 @@
+from config import Config
+import asyncio
+import logging
+import aiohttp
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+
+class RangesIgnored(Exception):
+    """The server answered a Range request with something other than those bytes"""
+
+
+class Downloader:
+    """Shared aiohttp client for every link-based download
+
+    Files are fetched in large chunks. When the server supports byte ranges,
+    big files are split across several connections, and a dropped connection
+    resumes from the last byte written instead of starting over.
+    """
+
+    def __init__(self, chunk_size, connections, retries, progress_interval):
+        self.chunk_size = chunk_size
+        self.connections = max(1, connections)
+        self.retries = retries
+        self.progress_interval = progress_interval
+        self._session = None
+
+    def session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=100, limit_per_host=self.connections * 4),
+                timeout=aiohttp.ClientTimeout(total=None, connect=30, sock_read=60),
+            )
+        return self._session
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    async def fetch_bytes(self, url, timeout=30):
+        """Small downloads (thumbnails): the whole body in memory"""
+        async with self.session().get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            response.raise_for_status()
+            return await response.read()
+
+    async def probe(self, url):
+        """(size or 0, whether byte ranges are supported)"""
+        try:
+            async with self.session().get(url, headers={'Range': "bytes=0-0"}) as response:
+                response.raise_for_status()
+                if response.status == 206:
+                    total = response.headers.get('Content-Range', "").rpartition("/")[2]
+                    return (int(total) if total.isdigit() else 0), True
+                return int(response.headers.get('Content-Length', 0)), False
+        except aiohttp.ClientResponseError as e:
+            # 416 on an empty file; anything else is a real failure
+            if e.status == 416:
+                return 0, False
+            raise
+
+    async def download(self, url, path, progress_callback=None):
+        """Download url to path, awaiting progress_callback(downloaded, total) every progress_interval
+
+        Returns the number of bytes written; raises once retries are exhausted.
+        """
+        total, ranges = await self.probe(url)
+        parts = 1
+        if ranges and total:
+            parts = max(1, min(self.connections, total // Config.DOWNLOAD_MIN_PART_SIZE))
+
+        progress = {'done': 0}
+        ticker = None
+        if progress_callback:
+            ticker = asyncio.create_task(self._report(progress, total, progress_callback))
+
+        started = time.time()
+        try:
+            with open(path, 'wb') as f:
+                if ranges and total:
+                    # Preallocate so each part writes at its own offset
+                    f.truncate(total)
+            fd = os.open(path, os.O_WRONLY)
+            try:
+                try:
+                    await self._fetch_parts(url, fd, total, parts, progress, ranges)
+                except RangesIgnored as e:
+                    # Writing a full body at a part's offset would corrupt the file
+                    logger.warning(f"{e}; downloading {url} again over one connection without ranges")
+                    os.ftruncate(fd, 0)
+                    progress['done'] = 0
+                    parts = 1
+                    # With the size known, a body cut short is retried rather than accepted
+                    await self._fetch(url, fd, 0, total or None, progress, False)
+            finally:
+                os.close(fd)
+        finally:
+            if ticker:
+                ticker.cancel()
+
+        if progress_callback:
+            await progress_callback(progress['done'], total or progress['done'])
+        elapsed = max(time.time() - started, 1e-6)
+        logger.info(
+            f"Downloaded {progress['done']} bytes over {parts} connection(s) "
+            f"in {elapsed:.1f}s ({progress['done'] / elapsed / 1024 / 1024:.1f} MB/s)"
+        )
+        return progress['done']
+
+    async def _fetch_parts(self, url, fd, total, parts, progress, ranges):
+        """Fetch url as parts concurrent ranges, or in one go"""
+        if parts == 1:
+            return await self._fetch(url, fd, 0, total or None, progress, ranges)
+        size = -(-total // parts)
+        tasks = [
+            asyncio.create_task(self._fetch(url, fd, start, min(start + size, total), progress, ranges))
+            for start in range(0, total, size)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # One part failing (or ranges turning out unusable) stops the rest
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def _fetch(self, url, fd, start, end, progress, ranges):
+        """Write bytes [start, end) of url at the same offsets in fd, resuming after errors"""
+        offset = start
+        for attempt in range(self.retries + 1):
+            headers = {}
+            if ranges and (offset or end is not None):
+                headers['Range'] = f"bytes={offset}-{'' if end is None else end - 1}"
+            elif offset:
+                # No ranges: the only way to recover is from the top
+                progress['done'] -= offset - start
+                offset = start
+            try:
+                async with self.session().get(url, headers=headers) as response:
+                    response.raise_for_status()
+                    if offset:
+                        self._check_range(response, offset)
+                    async for chunk in response.content.iter_chunked(self.chunk_size):
+                        if end is not None:
+                            chunk = chunk[:end - offset]
+                        os.pwrite(fd, chunk, offset)
+                        offset += len(chunk)
+                        progress['done'] += len(chunk)
+                        if end is not None and offset >= end:
+                            break
+                if end is None or offset >= end:
+                    return
+                raise aiohttp.ClientPayloadError(f"connection closed at byte {offset} of {end}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if isinstance(e, aiohttp.ClientResponseError) and e.status < 500 and e.status != 429:
+                    raise
+                if attempt == self.retries:
+                    raise
+                logger.warning(f"Download interrupted at byte {offset} ({e}), resuming (attempt {attempt + 1})")
+                await asyncio.sleep(min(2 ** attempt, 30))
+
+    @staticmethod
+    def _check_range(response, offset):
+        """A body that doesn't start at offset must not be written there"""
+        if response.status != 206:
+            raise RangesIgnored(f"Server answered {response.status} to a Range request")
+        first = response.headers.get('Content-Range', "").partition(" ")[2].partition("-")[0]
+        if first.isdigit() and int(first) != offset:
+            raise RangesIgnored(f"Server sent bytes from {first} instead of {offset}")
+
+    async def _report(self, progress, total, progress_callback):
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            try:
+                await progress_callback(progress['done'], total)
+            except Exception as e:
+                logger.debug(f"Progress callback failed: {e}")
+
+
+downloader = Downloader(
+    chunk_size=Config.DOWNLOAD_CHUNK_SIZE,
+    connections=Config.DOWNLOAD_CONNECTIONS,
+    retries=Config.DOWNLOAD_RETRIES,
+    progress_interval=Config.DOWNLOAD_PROGRESS_INTERVAL,
+)
@@ -0,0 +1,704 @@
+from concurrent.futures import ProcessPoolExecutor
+from config import Config
+import multiprocessing
+import subprocess
+import traceback
+import shutil
+import asyncio
+import queue
+import time
+import os
+import cv2
+import numpy as np
+
+
+def log_step(step_name, details=""):
+    """Enhanced logging function"""
+    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+    log_msg = f"[{timestamp}] {step_name}"
+    if details:
+        log_msg += f" - {details}"
+    print(log_msg)
+    return log_msg
+
+
+def video_info(video_path):
+    """Return (fps, total_frames, duration) from the container headers"""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return 0, 0, 0
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    duration = total_frames / fps if fps > 0 else 0
+    return fps, total_frames, duration
+
+
+def analysis_size(frame):
+    """(width, height) frames are compared at: frame scaled down to AUTOTRIM_FRAME_WIDTH"""
+    height, width = frame.shape[:2]
+    target = min(width, Config.AUTOTRIM_FRAME_WIDTH)
+    return target, max(1, round(height * target / width))
+
+
+def build_fingerprint(template_path, frames=None):
+    """Sample K frames across the intro video into a compact fingerprint
+
+    Returns {'frames': (K, h, w) uint8, 'offsets': (K,) seconds from the
+    intro start, 'duration': intro length} or None.
+    """
+    try:
+        log_step("BUILD_FINGERPRINT", f"Template: {template_path}")
+
+        if not os.path.exists(template_path):
+            log_step("BUILD_FINGERPRINT", "❌ Template file not found")
+            return None
+
+        fps, total_frames, duration = video_info(template_path)
+        cap = cv2.VideoCapture(template_path)
+        if not cap.isOpened() or fps <= 0 or total_frames <= 0:
+            log_step("BUILD_FINGERPRINT", "❌ Failed to open video")
+            cap.release()
+            return None
+
+        k = max(1, min(frames or Config.AUTOTRIM_FINGERPRINT_FRAMES, total_frames))
+        size = None
+        picked, offsets = [], []
+        for i in range(k):
+            # Centre of each of K equal slices of the intro
+            index = min(total_frames - 1, int((i + 0.5) * total_frames / k)) if k > 1 else 0
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ret, frame = cap.read()
+            if not ret or frame is None:
+                continue
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            size = size or analysis_size(gray)
+            gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+            # Flat frames (fades, black) correlate with nothing useful
+            if gray.std() < 5 and k > 1:
+                continue
+            picked.append(gray)
+            offsets.append(index / fps)
+        cap.release()
+
+        if not picked:
+            log_step("BUILD_FINGERPRINT", "❌ No usable frames in template")
+            return None
+
+        fingerprint = {
+            'frames': np.stack(picked),
+            'offsets': np.array(offsets, np.float32),
+            'duration': float(duration),
+        }
+        log_step("BUILD_FINGERPRINT", f"✓ {len(picked)} frames at {size[0]}x{size[1]}, intro {duration:.1f}s")
+
+        # The jingle too, for the audio detector; silent or undecodable intros just go without
+        samples = decode_audio(template_path)
+        if samples is not None and len(samples):
+            peaks = audio_peaks(samples)
+            if len(peaks):
+                fingerprint['audio'] = peaks
+                log_step("BUILD_FINGERPRINT", f"✓ {len(peaks)} audio peaks")
+        return fingerprint
+    except Exception as e:
+        log_step("BUILD_FINGERPRINT", f"❌ ERROR: {e}")
+        print(traceback.format_exc())
+        return None
+
+
+def _sample_read(video_path, fps, sample_fps, size, start, end):
+    # Legacy path: decode and colour-convert every frame, keep every Nth
+    cap = cv2.VideoCapture(video_path)
+    step = max(1, round(fps / sample_fps))
+    frame_count = int(start * fps)
+    if frame_count:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count)
+    try:
+        while end is None or frame_count / fps < end:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if frame_count % step == 0:
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                yield frame_count / fps, cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+            frame_count += 1
+    finally:
+        cap.release()
+
+
+def _sample_grab(video_path, fps, sample_fps, size, start, end):
+    # grab() demuxes/decodes without the BGR conversion and copy; only sampled frames are retrieved
+    cap = cv2.VideoCapture(video_path)
+    step = max(1, round(fps / sample_fps))
+    frame_count = int(start * fps)
+    if frame_count:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count)
+    try:
+        while end is None or frame_count / fps < end:
+            if not cap.grab():
+                break
+            if frame_count % step == 0:
+                ret, frame = cap.retrieve()
+                if ret:
+                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                    yield frame_count / fps, cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+            frame_count += 1
+    finally:
+        cap.release()
+
+
+def _sample_ffmpeg(video_path, fps, sample_fps, size, start, end):
+    # ffmpeg drops frames, scales and converts to gray before anything reaches Python
+    width, height = size
+    cmd = ["ffmpeg", "-v", "error", "-nostdin"]
+    if start:
+        cmd += ["-ss", f"{start:.3f}"]
+    cmd += ["-i", video_path]
+    if end is not None:
+        cmd += ["-t", f"{end - start:.3f}"]
+    cmd += [
+        "-an", "-sn", "-dn",
+        "-vf", f"fps={sample_fps},scale={width}:{height}:flags=area,format=gray",
+        "-f", "rawvideo", "pipe:1",
+    ]
+    frame_bytes = width * height
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=frame_bytes * 8)
+    try:
+        index = 0
+        while True:
+            data = process.stdout.read(frame_bytes)
+            if len(data) < frame_bytes:
+                break
+            yield start + index / sample_fps, np.frombuffer(data, np.uint8).reshape(height, width)
+            index += 1
+    finally:
+        process.stdout.close()
+        process.kill()
+        process.wait()
+
+
+SAMPLERS = {
+    'read': _sample_read,
+    'grab': _sample_grab,
+    'ffmpeg': _sample_ffmpeg,
+}
+
+
+def sample_frames(video_path, size, sampler=None, sample_fps=None, start=0, end=None):
+    """Yield (timestamp, gray frame at size) at roughly sample_fps between start and end"""
+    fps, total_frames, duration = video_info(video_path)
+    sampler = sampler or Config.AUTOTRIM_SAMPLER
+    sample_fps = min(sample_fps or Config.AUTOTRIM_SAMPLE_FPS, fps or Config.AUTOTRIM_SAMPLE_FPS)
+    if sampler == "ffmpeg" and not shutil.which("ffmpeg"):
+        log_step("SAMPLE_FRAMES", "⚠️ ffmpeg not found, falling back to grab()")
+        sampler = "grab"
+    if sampler != "ffmpeg" and fps <= 0:
+        return
+    yield from SAMPLERS[sampler](video_path, fps, sample_fps, size, start, end)
+
+
+# ==================== MATCHERS ====================
+# A matcher scores a batch of sampled frames (N, h, w) against template
+# frames (K, h, w) and returns an (N, K) similarity matrix.
+
+def _normalize(stack):
+    """Flatten (N, h, w) frames to zero-mean, unit-norm rows"""
+    flat = stack.reshape(len(stack), -1).astype(np.float32)
+    flat -= flat.mean(axis=1, keepdims=True)
+    return flat / np.maximum(np.linalg.norm(flat, axis=1, keepdims=True), 1e-6)
+
+
+class TemplateMatcher:
+    """TM_CCOEFF_NORMED for every frame/template pair
+
+    Frames and templates share one size, where matchTemplate reduces to a
+    Pearson correlation, so the whole batch is one matrix product.
+    """
+
+    def __init__(self, templates):
+        self.templates = templates
+        self._normalized = _normalize(templates)
+
+    def scores(self, frames):
+        return _normalize(frames) @ self._normalized.T
+
+
+class MatchTemplateMatcher:
+    """cv2.matchTemplate (TM_CCOEFF_NORMED) called per frame/template pair
+
+    The original matcher, kept as the /autotrimbench baseline.
+    """
+
+    def __init__(self, templates):
+        self.templates = templates
+
+    def scores(self, frames):
+        out = np.empty((len(frames), len(self.templates)), np.float32)
+        for i, frame in enumerate(frames):
+            for k, template in enumerate(self.templates):
+                out[i, k] = cv2.matchTemplate(frame, template, cv2.TM_CCOEFF_NORMED).max()
+        return out
+
+
+def dhash(frames):
+    """64-bit difference hashes of an (N, h, w) uint8 stack, packed to (N, 8) bytes"""
+    small = np.stack([cv2.resize(f, (9, 8), interpolation=cv2.INTER_AREA) for f in frames]).astype(np.int16)
+    bits = small[:, :, 1:] > small[:, :, :-1]
+    return np.packbits(bits.reshape(len(frames), 64), axis=1)
+
+
+class DHashMatcher(TemplateMatcher):
+    """Hamming distance on dHashes for the whole batch, matchTemplate only on close candidates"""
+
+    def __init__(self, templates, max_distance=None):
+        super().__init__(templates)
+        self.max_distance = Config.AUTOTRIM_HASH_DISTANCE if max_distance is None else max_distance
+        self.hashes = dhash(templates)
+
+    def scores(self, frames):
+        # (N, 1, 8) ^ (1, K, 8) -> popcount over the 64 bits
+        distances = np.unpackbits(dhash(frames)[:, None, :] ^ self.hashes[None, :, :], axis=2).sum(axis=2)
+        candidates = distances <= self.max_distance
+        out = np.zeros(distances.shape, np.float32)
+        rows = np.nonzero(candidates.any(axis=1))[0]
+        if len(rows):
+            # Same TM_CCOEFF_NORMED value as the template matcher, for candidate frames only
+            out[rows] = np.where(candidates[rows], super().scores(frames[rows]), 0)
+        return out
+
+
+MATCHERS = {
+    'template': TemplateMatcher,
+    'dhash': DHashMatcher,
+    'matchtemplate': MatchTemplateMatcher,
+}
+
+
+def _batched(samples, batch_size=64):
+    timestamps, frames = [], []
+    for timestamp, frame in samples:
+        timestamps.append(timestamp)
+        frames.append(frame)
+        if len(frames) >= batch_size:
+            yield np.array(timestamps), np.stack(frames)
+            timestamps, frames = [], []
+    if frames:
+        yield np.array(timestamps), np.stack(frames)
+
+
+def align_appearances(timestamps, similarities, fingerprint, fps, threshold=None):
+    """Slide the fingerprint along the video and keep the well-aligned starts
+
+    similarities is (N, K): sampled frame n against fingerprint frame k.
+    A start at sample i scores the mean of similarities[i + shift_k, k],
+    where shift_k is fingerprint frame k's offset in samples, so one pass
+    gives both where the intro starts and where it ends.
+    """
+    threshold = Config.AUTOTRIM_MATCH_THRESHOLD if threshold is None else threshold
+    n, k = similarities.shape
+    if n == 0:
+        return []
+
+    interval = float(np.median(np.diff(timestamps))) if n > 1 else 1.0
+    shifts = np.rint((fingerprint['offsets'] - fingerprint['offsets'][0]) / interval).astype(int)
+    starts = n - shifts.max()
+    if starts <= 0:
+        return []
+
+    # (starts, K) gather, then average along the diagonal
+    rows = np.arange(starts)[:, None] + shifts[None, :]
+    scores = similarities[rows, np.arange(k)[None, :]].mean(axis=1)
+
+    # Non-maximum suppression: one appearance per intro length
+    min_gap = max(fingerprint['duration'], 1.0)
+    appearances = []
+    for i in np.argsort(-scores):
+        if scores[i] < threshold:
+            break
+        start = timestamps[i] - fingerprint['offsets'][0]
+        if any(abs(start - a['start']) < min_gap for a in appearances):
+            continue
+        appearances.append({
+            'frame': int(start * fps),
+            'timestamp': float(start),
+            'start': float(start),
+            'end': float(start + fingerprint['duration']),
+            'similarity': float(scores[i]),
+        })
+
+    appearances.sort(key=lambda a: a['start'])
+    for number, appearance in enumerate(appearances, 1):
+        log_step("FIND_INTRO_APPEARANCES", f"✓ Found intro #{number} at {appearance['start']:.1f}s - {appearance['end']:.1f}s (similarity: {appearance['similarity']:.3f})")
+    return appearances
+
+
+def find_intro_appearances(video_path, fingerprint, progress_callback=None, sampler=None, matcher=None, start=0, end=None):
+    """Find all appearances of intro title card in video, or in [start, end) seconds of it
+
+    progress_callback(progress, current_frame, total_frames) is called
+    synchronously, at most every 2 seconds, relative to the analysed range.
+    """
+    try:
+        log_step("FIND_INTRO_APPEARANCES", f"Video: {video_path}")
+
+        if not os.path.exists(video_path):
+            log_step("FIND_INTRO_APPEARANCES", "❌ Video file not found")
+            return [], 0, 0
+
+        fps, total_frames, duration = video_info(video_path)
+        if fps <= 0:
+            log_step("FIND_INTRO_APPEARANCES", "❌ Failed to open video")
+            return [], 0, 0
+
+        matcher = matcher or Config.AUTOTRIM_MATCHER
+        log_step("FIND_INTRO_APPEARANCES", f"Duration: {duration:.1f}s, Frames: {total_frames}, FPS: {fps:.1f}, Sampler: {sampler or Config.AUTOTRIM_SAMPLER}, Matcher: {matcher}")
+        window_end = duration if end is None else min(end, duration)
+        window_frames = max(1, int((window_end - start) * fps))
+        if start or end is not None:
+            log_step("FIND_INTRO_APPEARANCES", f"Window: {start:.1f}s - {window_end:.1f}s")
+
+        # Compare at the fingerprint's small size instead of full resolution
+        templates = fingerprint['frames']
+        size = (templates.shape[2], templates.shape[1])
+        scorer = MATCHERS[matcher](templates)
+        all_timestamps, all_scores = [], []
+        last_progress_update = 0
+
+        for timestamps, frames in _batched(sample_frames(video_path, size, sampler, start=start, end=end)):
+            all_timestamps.append(timestamps)
+            all_scores.append(scorer.scores(frames))
+
+            # Progress callback every 2 seconds
+            current_time = time.time()
+            if progress_callback and (current_time - last_progress_update) >= 2:
+                current_frame = min(window_frames, int((timestamps[-1] - start) * fps))
+                progress_callback(current_frame / window_frames * 100, current_frame, window_frames)
+                last_progress_update = current_time
+
+        if not all_timestamps:
+            return [], duration, fps
+
+        appearances = align_appearances(np.concatenate(all_timestamps), np.concatenate(all_scores), fingerprint, fps)
+        log_step("FIND_INTRO_APPEARANCES", f"✓ Analysis complete: {len(appearances)} appearances found")
+
+        return appearances, duration, fps
+
+    except Exception as e:
+        log_step("FIND_INTRO_APPEARANCES", f"❌ CRITICAL ERROR: {e}")
+        print(traceback.format_exc())
+        return [], 0, 0
+
+
+def benchmark_matchers(video_path, fingerprint, progress_callback=None, sampler=None):
+    """Decode once, score every batch with each matcher, and compare speed and results"""
+    fps, total_frames, duration = video_info(video_path)
+    templates = fingerprint['frames']
+    size = (templates.shape[2], templates.shape[1])
+
+    scorers = {name: cls(templates) for name, cls in MATCHERS.items()}
+    seconds = {name: 0.0 for name in MATCHERS}
+    scores = {name: [] for name in MATCHERS}
+    all_timestamps = []
+    decode_seconds = 0.0
+    frames_seen = 0
+    last_progress_update = 0
+
+    started = time.perf_counter()
+    for timestamps, frames in _batched(sample_frames(video_path, size, sampler)):
+        decode_seconds += time.perf_counter() - started
+        frames_seen += len(frames)
+        all_timestamps.append(timestamps)
+        for name, scorer in scorers.items():
+            t0 = time.perf_counter()
+            scores[name].append(scorer.scores(frames))
+            seconds[name] += time.perf_counter() - t0
+
+        current_time = time.time()
+        if progress_callback and (current_time - last_progress_update) >= 2:
+            current_frame = int(timestamps[-1] * fps)
+            progress_callback((current_frame / total_frames) * 100 if total_frames else 0, current_frame, total_frames)
+            last_progress_update = current_time
+        started = time.perf_counter()
+
+    found = {}
+    for name in MATCHERS:
+        appearances = align_appearances(
+            np.concatenate(all_timestamps), np.concatenate(scores[name]), fingerprint, fps
+        ) if all_timestamps else []
+        found[name] = [a['start'] for a in appearances]
+
+    # Accuracy relative to the original matchTemplate detector
+    reference = found['matchtemplate']
+    report = {'frames': frames_seen, 'duration': duration, 'decode_seconds': decode_seconds, 'matchers': {}}
+    for name in MATCHERS:
+        matched = sum(1 for t in found[name] if any(abs(t - r) <= 1.0 for r in reference))
+        report['matchers'][name] = {
+            'seconds': seconds[name],
+            'appearances': found[name],
+            'recall': matched / len(reference) if reference else 1.0,
+            'precision': matched / len(found[name]) if found[name] else 1.0,
+        }
+    return report
+
+
+# ==================== AUDIO ====================
+# The intro jingle is fingerprinted as its strongest spectrogram peaks
+# ("constellation" points). An episode is searched by sliding those points
+# along its spectrogram and measuring how loud the episode is at them.
+
+AUDIO_WINDOW = 512
+AUDIO_HOP = 256
+# Neighbourhood (frequency bins, time frames) a peak must dominate
+PEAK_NEIGHBOURHOOD = (15, 11)
+# STFT frames transformed at once, bounding memory to a few MB per block
+AUDIO_BLOCK_FRAMES = 4096
+
+
+def decode_audio(path, rate=None, start=0, end=None):
+    """Mono float32 samples at rate Hz through ffmpeg, or None if there is no audio/ffmpeg"""
+    rate = rate or Config.AUTOTRIM_AUDIO_RATE
+    if not shutil.which("ffmpeg"):
+        log_step("DECODE_AUDIO", "⚠️ ffmpeg not found")
+        return None
+    cmd = ["ffmpeg", "-v", "error", "-nostdin"]
+    if start:
+        cmd += ["-ss", f"{start:.3f}"]
+    cmd += ["-i", path]
+    if end is not None:
+        cmd += ["-t", f"{end - start:.3f}"]
+    cmd += ["-vn", "-sn", "-dn", "-ac", "1", "-ar", str(rate), "-f", "s16le", "pipe:1"]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        log_step("DECODE_AUDIO", f"❌ {result.stderr.decode(errors='ignore').strip()[-200:]}")
+        return None
+    return np.frombuffer(result.stdout, np.int16).astype(np.float32) / 32768
+
+
+def spectrogram(samples, progress=None):
+    """Log-magnitude STFT, (frames, AUDIO_WINDOW // 2 + 1)
+
+    Built AUDIO_BLOCK_FRAMES frames at a time, so a feature-length input never
+    holds more than one block of windowed frames and complex spectra.
+    progress(done_frames, total_frames) is called after every block.
+    """
+    if len(samples) < AUDIO_WINDOW:
+        samples = np.pad(samples, (0, AUDIO_WINDOW - len(samples)))
+    # A strided view: no copy of the overlapping frames
+    frames = np.lib.stride_tricks.sliding_window_view(samples, AUDIO_WINDOW)[::AUDIO_HOP]
+    window = np.hanning(AUDIO_WINDOW).astype(np.float32)
+    spec = np.empty((len(frames), AUDIO_WINDOW // 2 + 1), np.float32)
+    for block in range(0, len(frames), AUDIO_BLOCK_FRAMES):
+        spectrum = np.abs(np.fft.rfft(frames[block:block + AUDIO_BLOCK_FRAMES] * window, axis=1))
+        np.log1p(spectrum * 100, out=spec[block:block + len(spectrum)], casting='same_kind')
+        if progress:
+            progress(block + len(spectrum), len(frames))
+    return spec
+
+
+def audio_peaks(samples):
+    """(P, 2) int32 array of (time frame, frequency bin) spectrogram peaks"""
+    spec = spectrogram(samples)
+    local_max = spec >= cv2.dilate(spec, np.ones(PEAK_NEIGHBOURHOOD[::-1], np.uint8))
+    # Ignore the floor: silence and hiss produce plenty of tiny local maxima
+    return np.argwhere(local_max & (spec > spec.mean() + spec.std())).astype(np.int32)
+
+
+def correlate_peaks(spec, template_peaks):
+    """Score every time lag of spec against the template's peaks
+
+    Cross-correlation of the per-frame standardised spectrogram with the
+    template's sparse peak map: one shifted column sum per peak rather than
+    an FFT. Scores are relative to the median lag, so they read as "how much
+    louder than usual the episode is exactly where the jingle peaks".
+    """
+    z = (spec - spec.mean(axis=1, keepdims=True)) / np.maximum(spec.std(axis=1, keepdims=True), 1e-6)
+    # One bin/frame of slack for jitter from re-encoding and the hop grid
+    z = cv2.dilate(z, np.ones((3, 3), np.uint8))
+    length = int(template_peaks[:, 0].max()) + 1
+    lags = len(z) - length + 1
+    if lags <= 0:
+        return np.zeros(0, np.float32)
+    scores = np.zeros(lags, np.float32)
+    for t, f in template_peaks:
+        scores += z[t:t + lags, f]
+    scores /= len(template_peaks)
+    return scores - np.median(scores)
+
+
+def find_intro_appearances_audio(video_path, fingerprint, progress_callback=None, start=0, end=None):
+    """Find intro appearances by their jingle instead of their picture
+
+    Same return value as find_intro_appearances.
+    """
+    try:
+        log_step("FIND_INTRO_AUDIO", f"Video: {video_path}")
+        fps, total_frames, duration = video_info(video_path)
+        rate = Config.AUTOTRIM_AUDIO_RATE
+
+        samples = decode_audio(video_path, rate, start, end)
+        if samples is None or not len(samples):
+            log_step("FIND_INTRO_AUDIO", "❌ No audio decoded")
+            return [], duration, fps
+
+        def report(done, total):
+            # The STFT is the bulk of the work; map its blocks onto the video's frames
+            if progress_callback:
+                current_frame = int(total_frames * done / total)
+                progress_callback(done / total * 100, current_frame, total_frames)
+
+        scores = correlate_peaks(spectrogram(samples, report), fingerprint['audio'])
+
+        frame_seconds = AUDIO_HOP / rate
+        candidates = np.nonzero(scores >= Config.AUTOTRIM_AUDIO_THRESHOLD)[0]
+        appearances = merge_appearances([
+            {
+                'frame': int((start + lag * frame_seconds) * fps),
+                'timestamp': float(start + lag * frame_seconds),
+                'start': float(start + lag * frame_seconds),
+                'end': float(start + lag * frame_seconds + fingerprint['duration']),
+                'similarity': float(scores[lag]),
+            }
+            for lag in candidates
+        ], max(fingerprint['duration'], 1.0))
+
+        for number, appearance in enumerate(appearances, 1):
+            log_step("FIND_INTRO_AUDIO", f"✓ Found intro #{number} at {appearance['start']:.1f}s - {appearance['end']:.1f}s (score: {appearance['similarity']:.2f})")
+        log_step("FIND_INTRO_AUDIO", f"✓ Analysis complete: {len(appearances)} appearances found in {len(samples) / rate:.0f}s of audio")
+        return appearances, duration, fps
+
+    except Exception as e:
+        log_step("FIND_INTRO_AUDIO", f"❌ CRITICAL ERROR: {e}")
+        print(traceback.format_exc())
+        return [], 0, 0
+
+
+DETECTORS = ('video', 'audio')
+
+
+# ==================== PROCESS POOL ====================
+
+_pool = None
+_manager = None
+
+
+def _get_pool():
+    global _pool, _manager
+    if _pool is None:
+        # spawn, not fork: the bot process already runs Mongo/pyrogram threads
+        ctx = multiprocessing.get_context("spawn")
+        _pool = ProcessPoolExecutor(max_workers=Config.AUTOTRIM_WORKERS, mp_context=ctx)
+        _manager = ctx.Manager()
+    return _pool, _manager
+
+
+def _run_with_progress(func, progress_queue, args, kwargs):
+    """Worker-side entry point: run func, forwarding progress to the parent"""
+    def report(*progress):
+        progress_queue.put(progress)
+    return func(*args, progress_callback=report, **kwargs)
+
+
+async def run_in_pool(func, *args, progress_callback=None, poll_interval=1.0, **kwargs):
+    """Run a detector in the process pool, awaiting progress_callback for each update"""
+    pool, manager = _get_pool()
+    progress_queue = manager.Queue()
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(pool, _run_with_progress, func, progress_queue, args, kwargs)
+
+    while True:
+        done = future.done()
+        # Only the latest update matters for a status message
+        latest = None
+        try:
+            while True:
+                latest = progress_queue.get_nowait()
+        except queue.Empty:
+            pass
+        if latest is not None and progress_callback:
+            await progress_callback(*latest)
+        if done:
+            return future.result()
+        await asyncio.wait({future}, timeout=poll_interval)
+
+
+def analysis_windows(duration, intro_duration, workers=None):
+    """Split [0, duration) into up to AUTOTRIM_WORKERS overlapping (start, end) windows
+
+    Each window runs on past its nominal end by one intro length, so an intro
+    starting anywhere in it is seen whole by at least one window.
+    """
+    workers = workers or Config.AUTOTRIM_WORKERS
+    count = max(1, min(workers, int(duration // max(Config.AUTOTRIM_MIN_WINDOW, 1))))
+    if count == 1:
+        return [(0, None)]
+    length = duration / count
+    overlap = intro_duration + 1.0
+    return [
+        (i * length, None if i == count - 1 else (i + 1) * length + overlap)
+        for i in range(count)
+    ]
+
+
+def merge_appearances(appearances, min_gap):
+    """Union of per-window appearances, keeping the best match per intro length"""
+    merged = []
+    for appearance in sorted(appearances, key=lambda a: -a['similarity']):
+        if all(abs(appearance['start'] - a['start']) >= min_gap for a in merged):
+            merged.append(appearance)
+    return sorted(merged, key=lambda a: a['start'])
+
+
+async def find_intro_appearances_async(video_path, fingerprint, progress_callback=None, matcher=None, detector=None):
+    """find_intro_appearances across the process pool, one overlapping time window per worker
+
+    detector "audio" matches the intro jingle instead; it is a single cheap
+    pass, so it is not split into windows.
+    """
+    detector = detector or Config.AUTOTRIM_DETECTOR
+    if detector == "audio":
+        if 'audio' in fingerprint:
+            return await run_in_pool(
+                find_intro_appearances_audio, video_path, fingerprint,
+                progress_callback=progress_callback
+            )
+        log_step("FIND_INTRO_APPEARANCES", "⚠️ Intro template has no audio, using the video detector")
+
+    fps, total_frames, duration = video_info(video_path)
+    windows = analysis_windows(duration, fingerprint['duration'])
+    if len(windows) == 1:
+        return await run_in_pool(
+            find_intro_appearances, video_path, fingerprint,
+            progress_callback=progress_callback, matcher=matcher
+        )
+
+    log_step("FIND_INTRO_APPEARANCES", f"Analysing {duration:.1f}s in {len(windows)} parallel windows")
+    done = [0] * len(windows)
+    totals = [0] * len(windows)
+    last_progress_update = 0
+
+    async def window_progress(index, progress, current_frame, window_frames):
+        nonlocal last_progress_update
+        done[index], totals[index] = current_frame, window_frames
+        # Windows report independently; pass on one combined update every 2 seconds
+        if progress_callback and time.time() - last_progress_update >= 2:
+            last_progress_update = time.time()
+            current = min(sum(done), total_frames)
+            await progress_callback(current / total_frames * 100 if total_frames else 0, current, total_frames)
+
+    def reporter(index):
+        return lambda *progress: window_progress(index, *progress)
+
+    results = await asyncio.gather(*[
+        run_in_pool(
+            find_intro_appearances, video_path, fingerprint,
+            progress_callback=reporter(i), matcher=matcher, start=start, end=end
+        )
+        for i, (start, end) in enumerate(windows)
+    ])
+
+    appearances = merge_appearances(
+        [a for window_appearances, _, _ in results for a in window_appearances],
+        max(fingerprint['duration'], 1.0)
+    )
+    log_step("FIND_INTRO_APPEARANCES", f"✓ Merged {len(windows)} windows: {len(appearances)} appearances found")
+    return appearances, duration, fps
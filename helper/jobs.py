@@ -0,0 +1,161 @@
+from helper.database import pp_bots
+from config import Config
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Job name -> async handler(client, message, status_msg, params)
+JOB_HANDLERS = {}
+
+
+def job_handler(name):
+    """Register the coroutine that executes jobs of this name"""
+    def decorator(func):
+        JOB_HANDLERS[name] = func
+        return func
+    return decorator
+
+
+async def submit_job(client, name, message, status_msg, params=None):
+    """Persist a job, then run it here (or leave it for a worker node)"""
+    job = {
+        'name': name,
+        'status': "pending",
+        'user_id': message.from_user.id if message.from_user else message.chat.id,
+        'chat_id': message.chat.id,
+        'message_id': message.id,
+        'status_chat_id': status_msg.chat.id,
+        'status_message_id': status_msg.id,
+        'params': params or {},
+        'attempts': 0,
+        'created_at': time.time(),
+    }
+    job_id = await pp_bots.create_job(job)
+    if job_id is None:
+        # Mongo unavailable: still do the work, just without restart safety
+        logger.warning(f"Running {name} job without persistence")
+        return await JOB_HANDLERS[name](client, message, status_msg, job['params'])
+
+    if Config.RUN_MODE == "frontend":
+        # A worker process claims it from the shared queue
+        try:
+            await status_msg.edit("**⏳ Queued...**\n\nYour job will start automatically.")
+        except Exception:
+            pass
+        return
+
+    job = await pp_bots.claim_job(job_id, Config.WORKER_ID, Config.JOB_LEASE_SECONDS)
+    if job:
+        await run_job(client, job)
+
+
+async def _heartbeat(job, work):
+    """Renew the lease while work runs; stop work once the job is someone else's"""
+    while True:
+        await asyncio.sleep(Config.JOB_HEARTBEAT_SECONDS)
+        if not await pp_bots.heartbeat_job(job['_id'], Config.WORKER_ID, Config.JOB_LEASE_SECONDS):
+            # Another worker may already be running it: don't process it twice
+            logger.warning(f"Lost lease on job {job['_id']}, stopping it here")
+            work.cancel()
+            return
+
+
+async def _execute(client, job, handler):
+    message = await client.get_messages(job['chat_id'], job['message_id'])
+    if not message or message.empty:
+        raise ValueError("source message no longer exists")
+    status_msg = await client.get_messages(job['status_chat_id'], job['status_message_id'])
+    if not status_msg or status_msg.empty:
+        status_msg = await message.reply_text("**⏳ Resuming...**")
+
+    await handler(client, message, status_msg, job['params'])
+
+
+async def run_job(client, job):
+    """Execute a claimed job, keeping its lease alive until it finishes"""
+    handler = JOB_HANDLERS.get(job['name'])
+    if handler is None:
+        logger.error(f"No handler registered for job {job['_id']} ({job['name']})")
+        return await pp_bots.finish_job(job['_id'], Config.WORKER_ID, "failed", "unknown job type")
+
+    work = asyncio.create_task(_execute(client, job, handler))
+    heartbeat = asyncio.create_task(_heartbeat(job, work))
+    try:
+        await work
+        await pp_bots.finish_job(job['_id'], Config.WORKER_ID, "done")
+    except asyncio.CancelledError:
+        if heartbeat.done() and not heartbeat.cancelled():
+            # Lease lost: whoever claimed it next owns the outcome
+            return
+        # Shutting down: leave it running so the lease expires and it is retried
+        raise
+    except Exception as e:
+        logger.error(f"Job {job['_id']} ({job['name']}) failed: {e}")
+        await pp_bots.finish_job(job['_id'], Config.WORKER_ID, "failed", str(e))
+    finally:
+        heartbeat.cancel()
+
+
+async def _fail_exhausted_jobs():
+    failed = await pp_bots.fail_exhausted_jobs()
+    if failed:
+        logger.warning(f"Failed {failed} job(s) that crashed their worker {Config.JOB_MAX_ATTEMPTS} times")
+
+
+async def resume_jobs(client):
+    """Re-run jobs that were pending or in flight when the bot last stopped
+
+    Keeps polling every JOB_RECLAIM_SECONDS afterwards: jobs the previous
+    process left running only become claimable once their lease expires.
+    """
+    requeued = await pp_bots.requeue_worker_jobs(Config.WORKER_ID)
+    if requeued:
+        logger.info(f"Requeued {requeued} interrupted job(s)")
+
+    tasks = set()
+    while True:
+        await _fail_exhausted_jobs()
+        while True:
+            job = await pp_bots.claim_next_job(
+                Config.WORKER_ID, Config.JOB_LEASE_SECONDS, names=JOB_HANDLERS.keys()
+            )
+            if not job:
+                break
+            logger.info(f"Resuming job {job['_id']} ({job['name']}) for {job['user_id']}")
+            # The scheduler bounds how many of these actually run at once
+            task = asyncio.create_task(run_job(client, job))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.sleep(Config.JOB_RECLAIM_SECONDS)
+
+
+async def worker_loop(client):
+    """Worker mode: keep claiming jobs from the shared queue, up to WORKER_CONCURRENCY at once"""
+    requeued = await pp_bots.requeue_worker_jobs(Config.WORKER_ID)
+    if requeued:
+        logger.info(f"Requeued {requeued} interrupted job(s)")
+    logger.info(f"Worker {Config.WORKER_ID} polling for jobs: {', '.join(JOB_HANDLERS)}")
+
+    slots = asyncio.Semaphore(Config.WORKER_CONCURRENCY)
+
+    async def run(job):
+        try:
+            await run_job(client, job)
+        finally:
+            slots.release()
+
+    while True:
+        # Only claim what we can start, so idle nodes can take the rest
+        await slots.acquire()
+        job = await pp_bots.claim_next_job(
+            Config.WORKER_ID, Config.JOB_LEASE_SECONDS, names=JOB_HANDLERS.keys()
+        )
+        if not job:
+            slots.release()
+            await _fail_exhausted_jobs()
+            await asyncio.sleep(Config.WORKER_POLL_SECONDS)
+            continue
+        logger.info(f"Claimed job {job['_id']} ({job['name']}) for {job['user_id']}")
+        asyncio.create_task(run(job))
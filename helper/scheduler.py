@@ -0,0 +1,132 @@
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from config import Config
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# How often a queued job re-checks its position for the status message
+QUEUE_UPDATE_INTERVAL = 5
+
+
+class Job:
+    """Ticket for one media job waiting for, or holding, a scheduler slot"""
+
+    __slots__ = ('kind', 'user_id', 'future', 'released')
+
+    def __init__(self, kind, user_id):
+        self.kind = kind
+        self.user_id = user_id
+        self.released = False
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class JobScheduler:
+    """Global per-kind slot limits plus a per-user cap, granted in FIFO order"""
+
+    def __init__(self, limits, per_user):
+        self.limits = dict(limits)
+        self.per_user = per_user
+        self.running = {kind: 0 for kind in self.limits}
+        self.user_running = defaultdict(int)
+        self.waiting = {kind: [] for kind in self.limits}
+
+    def _can_start(self, job):
+        return (
+            self.running[job.kind] < self.limits[job.kind]
+            and self.user_running[job.user_id] < self.per_user
+        )
+
+    def _start(self, job):
+        self.running[job.kind] += 1
+        self.user_running[job.user_id] += 1
+        job.future.set_result(True)
+
+    def _wake(self):
+        # A user at their cap doesn't block the users queued behind them
+        for kind, queue in self.waiting.items():
+            for job in list(queue):
+                if self.running[kind] >= self.limits[kind]:
+                    break
+                if self._can_start(job):
+                    queue.remove(job)
+                    self._start(job)
+
+    def position(self, job):
+        try:
+            return self.waiting[job.kind].index(job) + 1
+        except ValueError:
+            return 0
+
+    async def acquire(self, kind, user_id, status_msg=None):
+        """Wait for a slot, showing the queue position on status_msg meanwhile"""
+        job = Job(kind, user_id)
+        self.waiting[kind].append(job)
+        self._wake()
+        if job.future.done():
+            return job
+
+        logger.info(f"Queued {kind} job for {user_id} at position {self.position(job)}")
+
+        shown = None
+        try:
+            while True:
+                position = self.position(job)
+                if status_msg and position and position != shown:
+                    shown = position
+                    try:
+                        await status_msg.edit(
+                            f"**⏳ Queued...**\n\n"
+                            f"**Position:** `{position}` in {kind} queue\n"
+                            f"Your job will start automatically."
+                        )
+                    except Exception:
+                        pass
+                try:
+                    await asyncio.wait_for(asyncio.shield(job.future), QUEUE_UPDATE_INTERVAL)
+                    return job
+                except asyncio.TimeoutError:
+                    continue
+        except asyncio.CancelledError:
+            if job.future.done():
+                self.release(job)
+            else:
+                self.waiting[kind].remove(job)
+                job.future.cancel()
+            raise
+
+    def release(self, job):
+        if job is None or job.released or not job.future.done() or job.future.cancelled():
+            return
+        job.released = True
+        self.running[job.kind] -= 1
+        self.user_running[job.user_id] -= 1
+        if not self.user_running[job.user_id]:
+            del self.user_running[job.user_id]
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self, kind, user_id, status_msg=None):
+        job = await self.acquire(kind, user_id, status_msg)
+        try:
+            yield job
+        finally:
+            self.release(job)
+
+    def stats(self):
+        return {
+            kind: {
+                'running': self.running[kind],
+                'limit': self.limits[kind],
+                'queued': len(self.waiting[kind]),
+            }
+            for kind in self.limits
+        }
+
+
+# "encode" jobs burn CPU in ffmpeg, "rename" jobs are mostly download/upload I/O
+scheduler = JobScheduler(
+    {'encode': Config.MAX_ENCODE_JOBS, 'rename': Config.MAX_RENAME_JOBS},
+    per_user=Config.MAX_JOBS_PER_USER
+)
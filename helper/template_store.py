@@ -0,0 +1,194 @@
+from helper.intro_detection import log_step, build_fingerprint
+from helper.cache import TTLCache
+from helper.downloader import downloader
+from config import Config
+import traceback
+import hashlib
+import asyncio
+import uuid
+import json
+import time
+import os
+import numpy as np
+
+
+class TemplateStore:
+    """Intro fingerprints on disk, keyed by template URL and content SHA-256
+
+    templates/index.json maps each URL to the SHA-256 of the video it served,
+    and each SHA-256 to a fingerprint saved as <sha>.npz. The template video
+    itself is only kept long enough to fingerprint it. Least recently used
+    fingerprints are evicted past max_entries, and recently used ones are
+    also held in memory so a repeat /autotrim touches neither disk nor network.
+    """
+
+    def __init__(self, root, max_entries, memory_ttl=3600):
+        self.root = root
+        self.max_entries = max_entries
+        self.index_path = os.path.join(root, "index.json")
+        self.memory = TTLCache(maxsize=max(1, min(max_entries, 32)), ttl=memory_ttl)
+        self._locks = {}
+        self._index = None
+
+    # ---------- index ----------
+
+    def _load_index(self):
+        if self._index is None:
+            try:
+                with open(self.index_path) as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+            self._index.setdefault('urls', {})
+            self._index.setdefault('entries', {})
+        return self._index
+
+    def _save_index(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self.index_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _params(self):
+        # A fingerprint built with other settings is not reusable
+        return {
+            'frames': Config.AUTOTRIM_FINGERPRINT_FRAMES,
+            'width': Config.AUTOTRIM_FRAME_WIDTH,
+            'audio_rate': Config.AUTOTRIM_AUDIO_RATE,
+        }
+
+    def _fingerprint_path(self, sha):
+        return os.path.join(self.root, f"{sha}.npz")
+
+    def _lookup(self, sha):
+        entry = self._load_index()['entries'].get(sha)
+        if not entry or entry.get('params') != self._params():
+            return None
+        try:
+            with np.load(self._fingerprint_path(sha)) as data:
+                fingerprint = {
+                    'frames': data['frames'],
+                    'offsets': data['offsets'],
+                    'duration': float(data['duration']),
+                }
+                if 'audio' in data.files:
+                    fingerprint['audio'] = data['audio']
+        except (OSError, KeyError, ValueError):
+            return None
+        entry['last_used'] = time.time()
+        return fingerprint
+
+    def _store(self, url, sha, fingerprint):
+        index = self._load_index()
+        np.savez(self._fingerprint_path(sha), **fingerprint)
+        index['urls'][url] = sha
+        index['entries'][sha] = {'params': self._params(), 'last_used': time.time()}
+        self._evict()
+        self._save_index()
+
+    def _evict(self):
+        index = self._load_index()
+        entries = index['entries']
+        excess = len(entries) - self.max_entries
+        if excess <= 0:
+            return
+        for sha in sorted(entries, key=lambda s: entries[s]['last_used'])[:excess]:
+            del entries[sha]
+            try:
+                os.remove(self._fingerprint_path(sha))
+            except OSError:
+                pass
+            log_step("TEMPLATE_STORE", f"Evicted {sha[:12]}")
+        for url in [u for u, s in index['urls'].items() if s not in entries]:
+            del index['urls'][url]
+            self.memory.invalidate(url)
+
+    # ---------- download ----------
+
+    async def _download(self, url):
+        """Fetch the template to a private temp file and hash it"""
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, f"download_{uuid.uuid4().hex}.mp4")
+        try:
+            await downloader.download(url, path)
+        except Exception:
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        return path, await asyncio.to_thread(self._sha256, path)
+
+    @staticmethod
+    def _sha256(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    # ---------- public ----------
+
+    async def get(self, url):
+        """Fingerprint for the intro video at url, or None if it can't be built"""
+        fingerprint = self.memory.get(url)
+        if fingerprint is not None:
+            log_step("TEMPLATE_STORE", "✓ Fingerprint from memory")
+            return fingerprint
+
+        # One download per URL even if several users start at once
+        lock = self._locks.setdefault(url, asyncio.Lock())
+        async with lock:
+            fingerprint = self.memory.get(url)
+            if fingerprint is None:
+                fingerprint = await self._get_or_build(url)
+                if fingerprint is not None:
+                    self.memory.set(url, fingerprint)
+        if not lock.locked():
+            self._locks.pop(url, None)
+        return fingerprint
+
+    async def _get_or_build(self, url):
+        sha = self._load_index()['urls'].get(url)
+        if sha:
+            fingerprint = self._lookup(sha)
+            if fingerprint is not None:
+                self._save_index()
+                log_step("TEMPLATE_STORE", f"✓ Fingerprint from disk ({sha[:12]})")
+                return fingerprint
+
+        path = None
+        try:
+            log_step("TEMPLATE_STORE", f"Downloading template: {url}")
+            path, sha = await self._download(url)
+            log_step("TEMPLATE_STORE", f"✓ Downloaded, sha256 {sha[:12]}")
+
+            # Same video behind a different URL
+            fingerprint = self._lookup(sha)
+            if fingerprint is None:
+                fingerprint = await asyncio.to_thread(build_fingerprint, path)
+                if fingerprint is None:
+                    return None
+                self._store(url, sha, fingerprint)
+            else:
+                self._load_index()['urls'][url] = sha
+                self._save_index()
+            return fingerprint
+        except Exception as e:
+            log_step("TEMPLATE_STORE", f"❌ ERROR: {e}")
+            print(traceback.format_exc())
+            return None
+        finally:
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    def stats(self):
+        index = self._load_index()
+        return {
+            'urls': len(index['urls']),
+            'fingerprints': len(index['entries']),
+            'max_entries': self.max_entries,
+            'memory': self.memory.stats(),
+        }
+
+
+template_store = TemplateStore(Config.AUTOTRIM_TEMPLATE_DIR, Config.AUTOTRIM_TEMPLATE_CACHE)
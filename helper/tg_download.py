@@ -0,0 +1,233 @@
+from pyrogram import raw
+from pyrogram.errors import AuthBytesInvalid
+from pyrogram.file_id import FileId, FileType
+from pyrogram.session import Auth, Session
+from config import Config
+import asyncio
+import logging
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+# upload.GetFile: offset must be a multiple of limit, limit at most 1 MiB
+PART_SIZE = 1024 * 1024
+
+MEDIA_KINDS = ("document", "video", "audio", "animation", "voice", "video_note")
+
+
+class MediaSessionPool:
+    """Extra media-DC sessions per client, so one file can be fetched over several connections
+
+    Pyrogram keeps a single media session per DC. These are additional ones,
+    sharing one authorization per (client, DC), opened on first use and kept
+    for later downloads.
+    """
+
+    def __init__(self):
+        self.sessions = {}
+        self.auth_keys = {}
+        self.lock = asyncio.Lock()
+
+    async def _auth_key(self, client, dc_id):
+        key = (id(client), dc_id)
+        if key in self.auth_keys:
+            return self.auth_keys[key], False
+        test_mode = await client.storage.test_mode()
+        if dc_id == await client.storage.dc_id():
+            auth_key = await client.storage.auth_key()
+            self.auth_keys[key] = auth_key
+            return auth_key, False
+        # Foreign DC: a fresh key that still has to be authorized below
+        auth_key = await Auth(client, dc_id, test_mode).create()
+        self.auth_keys[key] = auth_key
+        return auth_key, True
+
+    async def get(self, client, dc_id, count):
+        """Up to count started media sessions for client on dc_id"""
+        key = (id(client), dc_id)
+        async with self.lock:
+            sessions = self.sessions.setdefault(key, [])
+            while len(sessions) < count:
+                auth_key, needs_import = await self._auth_key(client, dc_id)
+                session = Session(client, dc_id, auth_key, await client.storage.test_mode(), is_media=True)
+                await session.start()
+                if needs_import:
+                    try:
+                        await self._import_authorization(client, session, dc_id)
+                    except Exception:
+                        await session.stop()
+                        del self.auth_keys[key]
+                        raise
+                sessions.append(session)
+            return sessions[:count]
+
+    @staticmethod
+    async def _import_authorization(client, session, dc_id):
+        for _ in range(3):
+            exported = await client.invoke(raw.functions.auth.ExportAuthorization(dc_id=dc_id))
+            try:
+                await session.invoke(raw.functions.auth.ImportAuthorization(id=exported.id, bytes=exported.bytes))
+                return
+            except AuthBytesInvalid:
+                continue
+        raise AuthBytesInvalid
+
+    async def close(self, client=None):
+        for key in [k for k in self.sessions if client is None or k[0] == id(client)]:
+            for session in self.sessions.pop(key):
+                try:
+                    await session.stop()
+                except Exception:
+                    pass
+
+
+session_pool = MediaSessionPool()
+
+
+def _media(message):
+    for kind in MEDIA_KINDS:
+        media = getattr(message, kind, None)
+        if media is not None:
+            return media
+    return None
+
+
+def _location(file_id):
+    if file_id.file_type in (FileType.PHOTO, FileType.CHAT_PHOTO, FileType.THUMBNAIL):
+        return None
+    return raw.types.InputDocumentFileLocation(
+        id=file_id.media_id,
+        access_hash=file_id.access_hash,
+        file_reference=file_id.file_reference,
+        thumb_size=file_id.thumbnail_size
+    )
+
+
+def _resolve_path(client, file_name):
+    # Same base directory download_media uses for relative paths
+    if not os.path.isabs(file_name):
+        file_name = os.path.join(str(client.PARENT_DIR), file_name)
+    os.makedirs(os.path.dirname(file_name) or ".", exist_ok=True)
+    return file_name
+
+
+class CdnRedirect(Exception):
+    """The file lives on a CDN DC; leave it to download_media"""
+
+
+async def _fetch_parts(session, location, fd, parts, progress_state, client_name):
+    """Worker: take part indices off the queue and write each at its offset"""
+    while True:
+        try:
+            index = parts.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        for attempt in range(Config.TG_DOWNLOAD_RETRIES + 1):
+            try:
+                r = await session.invoke(
+                    raw.functions.upload.GetFile(location=location, offset=index * PART_SIZE, limit=PART_SIZE),
+                    sleep_threshold=30
+                )
+                if isinstance(r, raw.types.upload.FileCdnRedirect):
+                    raise CdnRedirect()
+                os.pwrite(fd, r.bytes, index * PART_SIZE)
+                progress_state['done'] += len(r.bytes)
+                break
+            except CdnRedirect:
+                raise
+            except Exception as e:
+                if attempt == Config.TG_DOWNLOAD_RETRIES:
+                    # Hand the part back for a worker on another session or client
+                    parts.put_nowait(index)
+                    logger.warning(f"{client_name} session gave up on part {index}: {e}")
+                    raise
+                await asyncio.sleep(1 + attempt)
+
+
+async def download_media_parallel(client, message, file_name, progress=None, progress_args=(), extra_clients=()):
+    """download_media, but with concurrent upload.GetFile calls over several media sessions
+
+    Parts are spread across TG_DOWNLOAD_CONNECTIONS sessions of client and of
+    every client in extra_clients (e.g. the premium user), written into a
+    preallocated file with os.pwrite. Small files, photos and CDN-hosted
+    files use plain download_media. Returns the file path, or None.
+    """
+    media = _media(message)
+    file_size = getattr(media, "file_size", 0) or 0
+    if (
+        media is None or not Config.TG_DOWNLOAD_PARALLEL
+        or file_size < Config.TG_DOWNLOAD_MIN_SIZE or Config.TG_DOWNLOAD_CONNECTIONS <= 1
+    ):
+        return await client.download_media(message, file_name=file_name, progress=progress, progress_args=progress_args)
+
+    file_id = FileId.decode(media.file_id)
+    location = _location(file_id)
+    if location is None:
+        return await client.download_media(message, file_name=file_name, progress=progress, progress_args=progress_args)
+
+    path = _resolve_path(client, file_name)
+    total_parts = -(-file_size // PART_SIZE)
+    parts = asyncio.Queue()
+    for index in range(total_parts):
+        parts.put_nowait(index)
+
+    workers = []
+    for c in (client, *[c for c in extra_clients if c and c is not client]):
+        try:
+            sessions = await session_pool.get(c, file_id.dc_id, Config.TG_DOWNLOAD_CONNECTIONS)
+        except Exception as e:
+            logger.warning(f"No extra media sessions for {c.name} on DC {file_id.dc_id}: {e}")
+            continue
+        workers += [(session, c.name) for session in sessions]
+    if not workers:
+        return await client.download_media(message, file_name=file_name, progress=progress, progress_args=progress_args)
+
+    progress_state = {'done': 0}
+    session_count = len(workers)
+    started = time.time()
+
+    async def report():
+        while True:
+            await asyncio.sleep(1)
+            try:
+                await progress(min(progress_state['done'], file_size), file_size, *progress_args)
+            except Exception:
+                pass
+
+    reporter = asyncio.create_task(report()) if progress else None
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    errors = []
+    try:
+        os.ftruncate(fd, file_size)
+        # Parts handed back by a failing session go to the sessions still working
+        while workers and not parts.empty():
+            results = await asyncio.gather(
+                *[_fetch_parts(session, location, fd, parts, progress_state, name) for session, name in workers],
+                return_exceptions=True
+            )
+            if any(isinstance(r, asyncio.CancelledError) for r in results):
+                raise asyncio.CancelledError()
+            errors += [r for r in results if isinstance(r, BaseException)]
+            if any(isinstance(r, CdnRedirect) for r in results):
+                break
+            workers = [w for w, r in zip(workers, results) if not isinstance(r, BaseException)]
+    finally:
+        os.close(fd)
+        if reporter:
+            reporter.cancel()
+
+    if not parts.empty() or progress_state['done'] < file_size:
+        # Every worker failed (or the file is on a CDN): fall back to the sequential path
+        logger.warning(f"Parallel download incomplete ({errors[:1]}), falling back to download_media")
+        os.remove(path)
+        return await client.download_media(message, file_name=file_name, progress=progress, progress_args=progress_args)
+
+    if progress:
+        await progress(file_size, file_size, *progress_args)
+    elapsed = max(time.time() - started, 1e-6)
+    logger.info(
+        f"Downloaded {file_size} bytes over {session_count} sessions in {elapsed:.1f}s "
+        f"({file_size / elapsed / 1024 / 1024:.1f} MB/s)"
+    )
+    return path
@@ -0,0 +1,223 @@
+from contextlib import asynccontextmanager
+from helper.cache import TTLCache
+from aiohttp import web
+import asyncio
+import logging
+import uuid
+import os
+
+logger = logging.getLogger(__name__)
+
+# stream_media always works in whole 1 MiB parts
+CHUNK_SIZE = 1024 * 1024
+
+
+class StreamedFile:
+    """One Telegram file exposed over HTTP, with a small cache of recently fetched parts"""
+
+    def __init__(self, client, message, size, on_fetch=None):
+        self.client = client
+        self.message = message
+        self.size = size
+        self.fetched = 0
+        self.on_fetch = on_fetch
+        # Demuxers re-read the index and packet boundaries; don't refetch those parts
+        self.parts = TTLCache(maxsize=16, ttl=600)
+
+    async def iter_range(self, start, end):
+        """Yield bytes [start, end] (inclusive), fetching only the parts that cover them"""
+        first, last = start // CHUNK_SIZE, end // CHUNK_SIZE
+        index = first
+        while index <= last:
+            part = self.parts.get(index)
+            if part is None:
+                # Stream the uncached run in one request, up to the next cached part
+                run_end = index
+                while run_end < last and self.parts.get(run_end + 1) is None:
+                    run_end += 1
+                async for part in self.client.stream_media(self.message, offset=index, limit=run_end - index + 1):
+                    self.parts.set(index, part)
+                    self.fetched += len(part)
+                    if self.on_fetch:
+                        await self.on_fetch(min(self.fetched, self.size), self.size)
+                    yield self._slice(part, index, start, end)
+                    index += 1
+                if index <= run_end:
+                    raise IOError(f"Telegram returned no data for part {index}")
+                continue
+            yield self._slice(part, index, start, end)
+            index += 1
+
+    @staticmethod
+    def _slice(part, index, start, end):
+        base = index * CHUNK_SIZE
+        return part[max(start - base, 0):end - base + 1]
+
+
+class MediaStreamServer:
+    """Loopback HTTP server that serves Telegram media with byte ranges
+
+    ffmpeg given one of these URLs reads the container index and seeks
+    straight to the packets it needs, so only the Telegram parts covering
+    those bytes are downloaded instead of the whole file.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.port = None
+        self._runner = None
+
+    async def start(self):
+        if self._runner:
+            return
+        app = web.Application()
+        app.router.add_get("/{token}", self.handle, allow_head=True)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        logger.info(f"Media stream server listening on 127.0.0.1:{self.port}")
+
+    async def handle(self, request):
+        streamed = self.files.get(request.match_info['token'])
+        if streamed is None:
+            raise web.HTTPNotFound()
+
+        size = streamed.size
+        start, end = 0, size - 1
+        status = 200
+        if request.http_range.start is not None or request.http_range.stop is not None:
+            range_ = request.http_range
+            start = range_.start if range_.start is not None else 0
+            if start < 0:
+                start = max(size + start, 0)
+            end = min(range_.stop - 1, size - 1) if range_.stop is not None else size - 1
+            if start >= size or start > end:
+                raise web.HTTPRequestRangeNotSatisfiable(headers={'Content-Range': f"bytes */{size}"})
+            status = 206
+
+        response = web.StreamResponse(status=status)
+        response.content_type = "application/octet-stream"
+        response.content_length = end - start + 1
+        response.headers['Accept-Ranges'] = "bytes"
+        if status == 206:
+            response.headers['Content-Range'] = f"bytes {start}-{end}/{size}"
+        await response.prepare(request)
+        if request.method == "HEAD":
+            return response
+
+        chunks = streamed.iter_range(start, end)
+        try:
+            async for data in chunks:
+                await response.write(data)
+        except (ConnectionResetError, ConnectionError):
+            # ffmpeg drops the connection whenever it seeks elsewhere
+            pass
+        finally:
+            await chunks.aclose()
+        return response
+
+    @asynccontextmanager
+    async def serve(self, client, message, file_size, on_fetch=None):
+        """Expose message's media at a local URL for the duration of the block"""
+        await self.start()
+        token = uuid.uuid4().hex
+        streamed = StreamedFile(client, message, file_size, on_fetch)
+        self.files[token] = streamed
+        try:
+            yield f"http://127.0.0.1:{self.port}/{token}", streamed
+        finally:
+            self.files.pop(token, None)
+
+
+media_server = MediaStreamServer()
+
+
+# Containers ffmpeg can only demux with seeking (index possibly at the end)
+SEEKABLE_CONTAINERS = ('.mp4', '.m4v', '.mov', '.3gp')
+SEEKABLE_MIME_TYPES = ('video/mp4', 'video/x-m4v', 'video/quicktime', 'video/3gpp', 'audio/mp4', 'audio/x-m4a')
+# ffmpeg errors (lowercased) meaning the input needed seeking, not that the job is impossible
+SEEK_FAILURES = ("moov atom not found", "invalid data found", "could not seek", "cannot seek", "not seekable")
+
+
+def _needs_seeking(message, filename):
+    """By the media's mime type, falling back to the extension when Telegram has none"""
+    media = message.video or message.document or message.audio
+    mime_type = (getattr(media, "mime_type", None) or "").lower()
+    if mime_type:
+        return mime_type in SEEKABLE_MIME_TYPES
+    return os.path.splitext(filename or "")[1].lower() in SEEKABLE_CONTAINERS
+
+
+async def run_ffmpeg_on_media(client, message, file_size, filename, output_args, progress=None, progress_args=()):
+    """Run ffmpeg over Telegram media without saving the input first
+
+    Streamable containers are fed into ffmpeg's stdin as stream_media yields
+    them; MP4/MOV go through the range server, since their index may sit at
+    the end of the file. Either way download and processing overlap. A pipe
+    run that failed for want of seeking is retried over the range server;
+    any other failure (missing stream, bad map, full disk) is returned as is.
+    progress(current, total, *progress_args) works like pyrogram's.
+    Returns (returncode, stderr).
+    """
+    async def report(current, total):
+        if progress:
+            try:
+                await progress(current, total, *progress_args)
+            except Exception:
+                pass
+
+    if not _needs_seeking(message, filename):
+        returncode, stderr = await _ffmpeg_over_pipe(client, message, file_size, output_args, report)
+        error = stderr.decode(errors='ignore').lower()
+        if returncode == 0 or not any(failure in error for failure in SEEK_FAILURES):
+            return returncode, stderr
+        logger.warning(f"ffmpeg needed to seek in {filename}, retrying over the range server")
+    return await _ffmpeg_over_range(client, message, file_size, output_args, report)
+
+
+async def _ffmpeg_over_range(client, message, file_size, output_args, report):
+    async with media_server.serve(client, message, file_size, report) as (url, streamed):
+        process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-y", "-i", url, *output_args,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await process.communicate()
+    logger.info(f"ffmpeg read {streamed.fetched} of {file_size} bytes over the range server")
+    return process.returncode, stderr
+
+
+async def _ffmpeg_over_pipe(client, message, file_size, output_args, report):
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-y", "-i", "pipe:0", *output_args,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    # Drain stderr alongside, or a chatty ffmpeg blocks and stops reading stdin
+    stderr_task = asyncio.create_task(process.stderr.read())
+    fed = 0
+    chunks = client.stream_media(message)
+    try:
+        async for chunk in chunks:
+            process.stdin.write(chunk)
+            await process.stdin.drain()
+            fed += len(chunk)
+            await report(fed, file_size or fed)
+    except (BrokenPipeError, ConnectionResetError):
+        # ffmpeg exited early: it already has everything it needed, or failed
+        pass
+    except BaseException:
+        process.kill()
+        raise
+    finally:
+        try:
+            process.stdin.close()
+        except Exception:
+            pass
+        # Left suspended after an early exit, it would hold its download session
+        await chunks.aclose()
+    await process.wait()
+    return process.returncode, await stderr_task
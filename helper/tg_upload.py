@@ -0,0 +1,353 @@
+from pyrogram import raw, types, utils
+from pyrogram.errors import FilePartMissing, FloodWait
+from pyrogram.file_id import FileId
+from helper.tg_download import session_pool, CdnRedirect, PART_SIZE as FETCH_PART_SIZE, _media, _location
+from config import Config
+import asyncio
+import logging
+import mmap
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+# upload.SaveBigFilePart: parts of exactly 512 KiB (except the last); same size
+# save_file uses, so a part Telegram reports missing can be re-sent through it
+PART_SIZE = 512 * 1024
+
+SEND_METHODS = ("video", "document", "audio")
+
+
+async def _save_parts(session, file_id, total_parts, data, parts, progress_state):
+    """Worker: take part indices off the queue and upload each from the mapped file"""
+    attempt = 0
+    while True:
+        try:
+            index = parts.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        chunk = data[index * PART_SIZE:(index + 1) * PART_SIZE]
+        try:
+            ok = await session.invoke(
+                raw.functions.upload.SaveBigFilePart(
+                    file_id=file_id,
+                    file_part=index,
+                    file_total_parts=total_parts,
+                    bytes=chunk
+                ),
+                sleep_threshold=0
+            )
+            if not ok:
+                raise IOError(f"Telegram refused part {index}")
+            progress_state['done'] += len(chunk)
+            attempt = 0
+        except FloodWait as e:
+            # Other sessions keep going while this one waits
+            parts.put_nowait(index)
+            logger.warning(f"Upload session flood-waited for {e.value}s at part {index}")
+            await asyncio.sleep(e.value)
+        except Exception as e:
+            parts.put_nowait(index)
+            if attempt == Config.TG_UPLOAD_RETRIES:
+                logger.warning(f"Upload session gave up on part {index}: {e}")
+                raise
+            attempt += 1
+            await asyncio.sleep(attempt)
+
+
+async def upload_file_parallel(client, path, progress=None, progress_args=()):
+    """save_file for big files, with concurrent upload.SaveBigFilePart calls
+
+    Parts are read straight from an mmap of the file and spread across
+    TG_UPLOAD_CONNECTIONS media sessions of client (upload parts belong to the
+    uploading account, so other clients can't help). Returns the
+    InputFileBig, or None if the upload should go through save_file instead.
+    """
+    file_size = os.path.getsize(path)
+    limit_mib = 4000 if getattr(client.me, "is_premium", False) else 2000
+    if (
+        not Config.TG_UPLOAD_PARALLEL or Config.TG_UPLOAD_CONNECTIONS <= 1
+        or file_size < Config.TG_UPLOAD_MIN_SIZE or file_size > limit_mib * 1024 * 1024
+    ):
+        return None
+
+    try:
+        sessions = await session_pool.get(client, await client.storage.dc_id(), Config.TG_UPLOAD_CONNECTIONS)
+    except Exception as e:
+        logger.warning(f"No extra media sessions for {client.name}: {e}")
+        return None
+
+    file_id = client.rnd_id()
+    total_parts = -(-file_size // PART_SIZE)
+    parts = asyncio.Queue()
+    for index in range(total_parts):
+        parts.put_nowait(index)
+
+    progress_state = {'done': 0}
+    started = time.time()
+
+    async def report():
+        while True:
+            await asyncio.sleep(1)
+            try:
+                await progress(min(progress_state['done'], file_size), file_size, *progress_args)
+            except Exception:
+                pass
+
+    reporter = asyncio.create_task(report()) if progress else None
+    errors = []
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            # Parts handed back by a failing session go to the sessions still working
+            while sessions and not parts.empty():
+                results = await asyncio.gather(
+                    *[_save_parts(s, file_id, total_parts, data, parts, progress_state) for s in sessions],
+                    return_exceptions=True
+                )
+                if any(isinstance(r, asyncio.CancelledError) for r in results):
+                    raise asyncio.CancelledError()
+                errors += [r for r in results if isinstance(r, BaseException)]
+                sessions = [s for s, r in zip(sessions, results) if not isinstance(r, BaseException)]
+    finally:
+        if reporter:
+            reporter.cancel()
+
+    if not parts.empty():
+        logger.warning(f"Parallel upload incomplete ({errors[:1]}), falling back to save_file")
+        return None
+
+    if progress:
+        await progress(file_size, file_size, *progress_args)
+    elapsed = max(time.time() - started, 1e-6)
+    logger.info(
+        f"Uploaded {file_size} bytes in {total_parts} parts in {elapsed:.1f}s "
+        f"({file_size / elapsed / 1024 / 1024:.1f} MB/s)"
+    )
+    return raw.types.InputFileBig(id=file_id, parts=total_parts, name=os.path.basename(path))
+
+
+def _input_media(client, kind, path, file, thumb, duration, file_name):
+    name = file_name or os.path.basename(path)
+    if kind == "video":
+        mime_type = client.guess_mime_type(path) or "video/mp4"
+        attributes = [
+            raw.types.DocumentAttributeVideo(supports_streaming=True, duration=duration, w=0, h=0),
+            raw.types.DocumentAttributeFilename(file_name=name)
+        ]
+    elif kind == "audio":
+        mime_type = client.guess_mime_type(path) or "audio/mpeg"
+        attributes = [
+            raw.types.DocumentAttributeAudio(duration=duration),
+            raw.types.DocumentAttributeFilename(file_name=name)
+        ]
+    else:
+        mime_type = client.guess_mime_type(path) or "application/zip"
+        attributes = [raw.types.DocumentAttributeFilename(file_name=name)]
+    return raw.types.InputMediaUploadedDocument(
+        mime_type=mime_type,
+        file=file,
+        thumb=thumb,
+        attributes=attributes
+    )
+
+
+async def send_media_parallel(
+    client, kind, chat_id, path, caption="", thumb=None, duration=0, file_name=None,
+    progress=None, progress_args=()
+):
+    """send_video / send_document / send_audio with the file uploaded by upload_file_parallel
+
+    Small files, or uploads the parallel path can't finish, go through the
+    regular pyrogram method with the same arguments. Returns the sent Message.
+    """
+    if kind not in SEND_METHODS:
+        raise ValueError(f"Unsupported media kind: {kind}")
+
+    file = await upload_file_parallel(client, path, progress, progress_args)
+    if file is None:
+        kwargs = {kind: path, 'caption': caption, 'thumb': thumb, 'file_name': file_name}
+        if kind != "document":
+            kwargs['duration'] = duration
+        return await getattr(client, f"send_{kind}")(
+            chat_id, progress=progress, progress_args=progress_args, **kwargs
+        )
+
+    async def repair(part):
+        await client.save_file(path, file_id=file.id, file_part=part)
+
+    return await _send_uploaded(client, kind, chat_id, path, file, caption, thumb, duration, file_name, repair)
+
+
+async def _send_uploaded(client, kind, chat_id, path, file, caption, thumb, duration, file_name, repair):
+    """messages.SendMedia for an already uploaded file; repair(part) re-sends a part Telegram lost"""
+    media = _input_media(client, kind, path, file, await client.save_file(thumb), duration, file_name)
+    repairs = 0
+    while True:
+        try:
+            r = await client.invoke(
+                raw.functions.messages.SendMedia(
+                    peer=await client.resolve_peer(chat_id),
+                    media=media,
+                    random_id=client.rnd_id(),
+                    **await utils.parse_text_entities(client, caption, None, None)
+                )
+            )
+        except FilePartMissing as e:
+            # A part that keeps going missing would loop forever
+            if repairs == Config.TG_UPLOAD_RETRIES:
+                logger.warning(f"Telegram still misses part {e.value} after {repairs} repairs")
+                raise
+            repairs += 1
+            await repair(e.value)
+        else:
+            for update in r.updates:
+                if isinstance(update, (raw.types.UpdateNewMessage, raw.types.UpdateNewChannelMessage)):
+                    return await types.Message._parse(
+                        client, update.message,
+                        {u.id: u for u in r.users},
+                        {c.id: c for c in r.chats}
+                    )
+            return None
+
+
+async def _relay_parts(fetch_session, save_session, location, file_id, total_parts, parts, progress_state):
+    """Worker: fetch 1 MiB parts of the old file and save each as two 512 KiB parts of the new one"""
+    attempt = 0
+    while True:
+        try:
+            index = parts.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        try:
+            r = await fetch_session.invoke(
+                raw.functions.upload.GetFile(location=location, offset=index * FETCH_PART_SIZE, limit=FETCH_PART_SIZE),
+                sleep_threshold=30
+            )
+            if isinstance(r, raw.types.upload.FileCdnRedirect):
+                raise CdnRedirect()
+            for half in range(FETCH_PART_SIZE // PART_SIZE):
+                part = index * (FETCH_PART_SIZE // PART_SIZE) + half
+                if part >= total_parts:
+                    break
+                await save_session.invoke(
+                    raw.functions.upload.SaveBigFilePart(
+                        file_id=file_id,
+                        file_part=part,
+                        file_total_parts=total_parts,
+                        bytes=r.bytes[half * PART_SIZE:(half + 1) * PART_SIZE]
+                    ),
+                    sleep_threshold=30
+                )
+            progress_state['done'] += len(r.bytes)
+            attempt = 0
+        except CdnRedirect:
+            raise
+        except FloodWait as e:
+            parts.put_nowait(index)
+            logger.warning(f"Relay session flood-waited for {e.value}s at part {index}")
+            await asyncio.sleep(e.value)
+        except Exception as e:
+            parts.put_nowait(index)
+            if attempt == Config.TG_UPLOAD_RETRIES:
+                logger.warning(f"Relay session gave up on part {index}: {e}")
+                raise
+            attempt += 1
+            await asyncio.sleep(attempt)
+
+
+async def relay_media(
+    download_client, message, upload_client, kind, chat_id, file_name, caption="", thumb=None, duration=0,
+    progress=None, progress_args=()
+):
+    """Send message's media again under a new name, without a local copy
+
+    Telegram has no way to rename a stored file, and a new upload needs every
+    part again. Here each part goes straight from upload.GetFile on
+    download_client's sessions into upload.SaveBigFilePart on upload_client's,
+    so fetching and uploading overlap and nothing is written to disk.
+    Returns the sent Message, or None if the caller should download and
+    upload the file the regular way.
+    """
+    media = _media(message)
+    file_size = getattr(media, "file_size", 0) or 0
+    limit_mib = 4000 if getattr(upload_client.me, "is_premium", False) else 2000
+    if (
+        media is None or kind not in SEND_METHODS or not Config.TG_UPLOAD_PARALLEL
+        or file_size <= 10 * 1024 * 1024 or file_size > limit_mib * 1024 * 1024
+    ):
+        # Below 10 MB Telegram wants upload.SaveFilePart with an md5 instead
+        return None
+    source = FileId.decode(media.file_id)
+    location = _location(source)
+    if location is None:
+        return None
+
+    try:
+        fetch_sessions = await session_pool.get(download_client, source.dc_id, Config.TG_DOWNLOAD_CONNECTIONS)
+        save_sessions = await session_pool.get(
+            upload_client, await upload_client.storage.dc_id(), Config.TG_UPLOAD_CONNECTIONS
+        )
+    except Exception as e:
+        logger.warning(f"No media sessions for relaying: {e}")
+        return None
+
+    file_id = upload_client.rnd_id()
+    total_parts = -(-file_size // PART_SIZE)
+    parts = asyncio.Queue()
+    for index in range(-(-file_size // FETCH_PART_SIZE)):
+        parts.put_nowait(index)
+
+    progress_state = {'done': 0}
+    started = time.time()
+
+    async def report():
+        while True:
+            await asyncio.sleep(1)
+            try:
+                await progress(min(progress_state['done'], file_size), file_size, *progress_args)
+            except Exception:
+                pass
+
+    # Each worker pairs one fetch session with one upload session
+    workers = [
+        (fetch_sessions[i % len(fetch_sessions)], save_sessions[i % len(save_sessions)])
+        for i in range(max(len(fetch_sessions), len(save_sessions)))
+    ]
+    reporter = asyncio.create_task(report()) if progress else None
+    errors = []
+    try:
+        while workers and not parts.empty():
+            results = await asyncio.gather(
+                *[_relay_parts(f, u, location, file_id, total_parts, parts, progress_state) for f, u in workers],
+                return_exceptions=True
+            )
+            if any(isinstance(r, asyncio.CancelledError) for r in results):
+                raise asyncio.CancelledError()
+            errors += [r for r in results if isinstance(r, BaseException)]
+            if any(isinstance(r, CdnRedirect) for r in results):
+                break
+            workers = [w for w, r in zip(workers, results) if not isinstance(r, BaseException)]
+    finally:
+        if reporter:
+            reporter.cancel()
+
+    if not parts.empty() or progress_state['done'] < file_size:
+        logger.warning(f"Relay incomplete ({errors[:1]}), falling back to download and upload")
+        return None
+
+    if progress:
+        await progress(file_size, file_size, *progress_args)
+    elapsed = max(time.time() - started, 1e-6)
+    logger.info(
+        f"Relayed {file_size} bytes in {elapsed:.1f}s ({file_size / elapsed / 1024 / 1024:.1f} MB/s)"
+    )
+
+    file = raw.types.InputFileBig(id=file_id, parts=total_parts, name=file_name)
+
+    async def repair(part):
+        index = part // (FETCH_PART_SIZE // PART_SIZE)
+        retry = asyncio.Queue()
+        retry.put_nowait(index)
+        await _relay_parts(fetch_sessions[0], save_sessions[0], location, file_id, total_parts, retry, {'done': 0})
+
+    return await _send_uploaded(upload_client, kind, chat_id, file_name, file, caption, thumb, duration, file_name, repair)
@@ -3,7 +3,7 @@ from datetime import datetime
 from pytz import timezone
 from config import Config, Txt 
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
-import requests
+from helper.downloader import downloader
 import logging
 
 
@@ -125,15 +125,13 @@ def get_disk_space():
         return 0
 
 
-def download_thumbnail(url, save_path):
+async def download_thumbnail(url, save_path):
     """Download thumbnail from URL"""
     try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            with open(save_path, 'wb') as f:
-                f.write(response.content)
-            return True
-        return False
+        data = await downloader.fetch_bytes(url, timeout=10)
+        with open(save_path, 'wb') as f:
+            f.write(data)
+        return True
     except Exception as e:
         logging.error(f"Thumbnail download error: {e}")
         return False
@@ -2,8 +2,11 @@ from config import Config, Txt
 from helper.database import pp_bots
 from pyrogram.types import Message
 from pyrogram import Client, filters
-from pyrogram.errors import FloodWait, InputUserDeactivated, UserIsBlocked, PeerIdInvalid
-import os, sys, time, asyncio, logging, datetime
+from helper.broadcast import Broadcast
+from helper.scheduler import scheduler
+from helper.tg_download import download_media_parallel
+from helper.utils import humanbytes
+import os, sys, time, asyncio, logging
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 
 logger = logging.getLogger(__name__)
@@ -88,6 +91,8 @@ async def get_stats(bot, message):
         disk_used_percent = 0
     
     premium_status = "✅ Active (4GB)" if Config.STRING_SESSION else "❌ Not Active (2GB)"
+    cache = pp_bots.cache_stats()
+    jobs = scheduler.stats()
     
     await st.edit(
         f"**📊 BOT STATISTICS**\n\n"
@@ -99,6 +104,13 @@ async def get_stats(bot, message):
         f"├ Free: `{disk_free:.2f} GB`\n"
         f"├ Total: `{disk_total:.2f} GB`\n"
         f"└ Used: `{disk_used_percent}%`\n\n"
+        f"**🗄️ Settings Cache:**\n"
+        f"├ Cached Users: `{cache['size']}/{cache['maxsize']}`\n"
+        f"├ Hits: `{cache['hits']}` | Misses: `{cache['misses']}`\n"
+        f"└ Hit Rate: `{cache['hit_rate']:.1f}%`\n\n"
+        f"**⚙️ Job Slots:**\n"
+        f"├ Encode: `{jobs['encode']['running']}/{jobs['encode']['limit']}` | Queued: `{jobs['encode']['queued']}`\n"
+        f"└ Rename: `{jobs['rename']['running']}/{jobs['rename']['limit']}` | Queued: `{jobs['rename']['queued']}`\n\n"
         f"**🎬 Features Active:**\n"
         f"├ Rename ✅\n"
         f"├ Trim ✅\n"
@@ -113,69 +125,59 @@ async def get_stats(bot, message):
 @Client.on_message(filters.command("broadcast") & filters.user(Config.ADMIN) & filters.reply)
 async def broadcast_handler(bot: Client, m: Message):
     """Broadcast message to all users (Admin only)"""
-    all_users = await pp_bots.get_all_users()
     broadcast_msg = m.reply_to_message
     
+    if await pp_bots.get_unfinished_broadcasts():
+        return await m.reply_text(
+            "**⚠️ A broadcast is already running!**\n\n"
+            "Wait for it to finish before starting another."
+        )
+    
     sts_msg = await m.reply_text(
         "**📢 Broadcast Started!**\n\n"
         "Preparing to send messages..."
     )
     
-    done = 0
-    failed = 0
-    success = 0
-    start_time = time.time()
-    total_users = await pp_bots.total_users_count()
-    
-    async for user in all_users:
-        sts = await send_msg(user["_id"], broadcast_msg)
-        if sts == 200:
-            success += 1
-        else:
-            failed += 1
-        if sts == 400:
-            await pp_bots.delete_user(user["_id"])
-        
-        done += 1
-        
-        # Update status every 20 users
-        if done % 20 == 0:
-            try:
-                await sts_msg.edit(
-                    f"**📢 Broadcast In Progress**\n\n"
-                    f"**Total Users:** `{total_users}`\n"
-                    f"**Completed:** `{done}/{total_users}`\n"
-                    f"**Success:** `{success}` ✅\n"
-                    f"**Failed:** `{failed}` ❌\n"
-                    f"**Progress:** `{(done/total_users)*100:.1f}%`"
-                )
-            except:
-                pass
-    
-    completed_in = datetime.timedelta(seconds=int(time.time() - start_time))
-    
-    await sts_msg.edit(
-        f"**✅ Broadcast Completed!**\n\n"
-        f"**Total Users:** `{total_users}`\n"
-        f"**Completed:** `{done}/{total_users}`\n"
-        f"**Success:** `{success}` ✅\n"
-        f"**Failed:** `{failed}` ❌\n"
-        f"**Time Taken:** `{completed_in}`\n\n"
-        f"**Powered by @pp_bots**"
-    )
+    broadcast = await Broadcast.create(bot, broadcast_msg, sts_msg)
+    await broadcast.run()
 
 
-async def send_msg(user_id, message):
-    """Helper function to send broadcast messages"""
-    try:
-        await message.copy(chat_id=int(user_id))
-        return 200
-    except FloodWait as e:
-        await asyncio.sleep(e.value)
-        return await send_msg(user_id, message)
-    except InputUserDeactivated:
-        logger.info(f"{user_id}: Deactivated")
-        return 400
-    except UserIsBlocked:
-        logger.info(f"{user_id}: Blocked")
-        return 400
+@Client.on_message(filters.command("dlbench") & filters.user(Config.ADMIN) & filters.reply)
+async def download_benchmark(bot: Client, m: Message):
+    """Time plain download_media against the parallel downloader on one file (Admin only)"""
+    from bot import app
+    target = m.reply_to_message
+    media = target.document or target.video or target.audio
+    if not media:
+        return await m.reply_text("**⚠️ Reply to a document, video or audio file.**")
+    
+    st = await m.reply_text("**🧪 Download Benchmark**\n\n⏳ download_media...")
+    extra = (app,) if app and Config.STRING_SESSION else ()
+    results = []
+    for name, download in (
+        ("download_media", lambda path: bot.download_media(target, file_name=path)),
+        ("parallel", lambda path: download_media_parallel(bot, target, path, extra_clients=extra)),
+    ):
+        path = os.path.join("downloads", f"dlbench_{name}_{m.id}")
+        await st.edit(f"**🧪 Download Benchmark**\n\n⏳ {name}...")
+        start_t = time.time()
+        try:
+            result = await download(path)
+            elapsed = time.time() - start_t
+            results.append((name, elapsed, bool(result)))
+            if result and os.path.exists(result):
+                os.remove(result)
+        except Exception as e:
+            logger.error(f"dlbench {name} failed: {e}")
+            results.append((name, time.time() - start_t, False))
+    
+    size = media.file_size or 0
+    lines = [
+        "**🧪 Download Benchmark**\n",
+        f"**File:** `{humanbytes(size)}`",
+        f"**Connections:** `{Config.TG_DOWNLOAD_CONNECTIONS}` per client × `{1 + len(extra)}` client(s)\n",
+    ]
+    for name, elapsed, ok in results:
+        speed = size / elapsed / 1024 / 1024 if ok and elapsed else 0
+        lines.append(f"**{name}:** `{elapsed:.1f}s` ({speed:.1f} MB/s){'' if ok else ' ❌ failed'}")
+    await st.edit("\n".join(lines))
@@ -3,12 +3,19 @@ from pyrogram.types import Message, ForceReply
 from PIL import Image, ImageDraw, ImageFont
 from helper.utils import progress_for_pyrogram, humanbytes, convert
 from helper.database import AshutoshGoswami24
+from helper.intro_detection import (
+    log_step, find_intro_appearances_async, benchmark_matchers, run_in_pool, MATCHERS, DETECTORS
+)
+from helper.template_store import template_store
+from helper.downloader import downloader
 from config import Config
+import io
 import os
 import time
 import re
+import shutil
+import tempfile
 import traceback
-import requests
 import asyncio
 import cv2
 import numpy as np
@@ -23,166 +30,12 @@ JAI_BAJARANGABALI_THUMB_BASE = "https://envs.sh/zcf.jpg"
 autotrim_states = {}
 
 
-def log_step(step_name, details=""):
-    """Enhanced logging function"""
-    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-    log_msg = f"[{timestamp}] {step_name}"
-    if details:
-        log_msg += f" - {details}"
-    print(log_msg)
-    return log_msg
-
-
-def download_intro_template(custom_url=None):
-    """Download intro title template video"""
-    try:
-        intro_url = custom_url or INTRO_TITLE_VIDEO_URL
-        log_step("DOWNLOAD_INTRO_TEMPLATE", f"URL: {intro_url}")
-        
-        template_path = "templates/intro_title.mp4"
-        os.makedirs("templates", exist_ok=True)
-        
-        if not os.path.exists(template_path) or custom_url:
-            log_step("DOWNLOAD_INTRO_TEMPLATE", "Starting download...")
-            response = requests.get(intro_url, timeout=60, stream=True)
-            response.raise_for_status()
-            
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded = 0
-            
-            with open(template_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-            
-            file_size = os.path.getsize(template_path)
-            log_step("DOWNLOAD_INTRO_TEMPLATE", f"✓ Downloaded {humanbytes(file_size)}")
-        else:
-            log_step("DOWNLOAD_INTRO_TEMPLATE", "✓ Using cached template")
-        
-        return template_path
-    except Exception as e:
-        log_step("DOWNLOAD_INTRO_TEMPLATE", f"❌ ERROR: {e}")
-        print(traceback.format_exc())
-        return None
-
-
-def extract_intro_frame(template_path):
-    """Extract a frame from intro video for matching"""
-    try:
-        log_step("EXTRACT_INTRO_FRAME", f"Template: {template_path}")
-        
-        if not os.path.exists(template_path):
-            log_step("EXTRACT_INTRO_FRAME", "❌ Template file not found")
-            return None
-        
-        cap = cv2.VideoCapture(template_path)
-        if not cap.isOpened():
-            log_step("EXTRACT_INTRO_FRAME", "❌ Failed to open video")
-            return None
-        
-        ret, frame = cap.read()
-        cap.release()
-        
-        if ret and frame is not None:
-            # Convert to grayscale for better matching
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            log_step("EXTRACT_INTRO_FRAME", f"✓ Frame extracted: {gray.shape}")
-            return gray
-        else:
-            log_step("EXTRACT_INTRO_FRAME", "❌ Failed to read frame")
-            return None
-    except Exception as e:
-        log_step("EXTRACT_INTRO_FRAME", f"❌ ERROR: {e}")
-        print(traceback.format_exc())
-        return None
-
-
-def find_intro_appearances(video_path, template_frame, progress_callback=None):
-    """Find all appearances of intro title card in video"""
-    try:
-        log_step("FIND_INTRO_APPEARANCES", f"Video: {video_path}")
-        
-        if not os.path.exists(video_path):
-            log_step("FIND_INTRO_APPEARANCES", "❌ Video file not found")
-            return [], 0, 0
-        
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            log_step("FIND_INTRO_APPEARANCES", "❌ Failed to open video")
-            return [], 0, 0
-        
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        duration = total_frames / fps if fps > 0 else 0
-        
-        log_step("FIND_INTRO_APPEARANCES", f"Duration: {duration:.1f}s, Frames: {total_frames}, FPS: {fps:.1f}")
-        
-        appearances = []
-        frame_count = 0
-        last_match_frame = -100
-        
-        # Check every 5th frame for performance
-        skip_frames = 5
-        threshold = 0.70  # Lowered threshold for better detection
-        
-        last_progress_update = 0
-        
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            if frame_count % skip_frames == 0:
-                try:
-                    # Convert to grayscale
-                    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                    
-                    # Resize to match template size
-                    if gray.shape != template_frame.shape:
-                        gray = cv2.resize(gray, (template_frame.shape[1], template_frame.shape[0]))
-                    
-                    # Calculate similarity
-                    result = cv2.matchTemplate(gray, template_frame, cv2.TM_CCOEFF_NORMED)
-                    min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
-                    
-                    # If similarity is high and not too close to last match
-                    if max_val >= threshold and (frame_count - last_match_frame) > (fps * 3):
-                        timestamp = frame_count / fps
-                        appearances.append({
-                            'frame': frame_count,
-                            'timestamp': timestamp,
-                            'similarity': max_val
-                        })
-                        last_match_frame = frame_count
-                        log_step("FIND_INTRO_APPEARANCES", f"✓ Found intro #{len(appearances)} at {timestamp:.1f}s (similarity: {max_val:.3f})")
-                    
-                    # Progress callback every 2 seconds
-                    current_time = time.time()
-                    if progress_callback and (current_time - last_progress_update) >= 2:
-                        progress = (frame_count / total_frames) * 100
-                        asyncio.create_task(progress_callback(progress, frame_count, total_frames))
-                        last_progress_update = current_time
-                
-                except Exception as frame_error:
-                    log_step("FIND_INTRO_APPEARANCES", f"Frame {frame_count} error: {frame_error}")
-            
-            frame_count += 1
-        
-        cap.release()
-        log_step("FIND_INTRO_APPEARANCES", f"✓ Analysis complete: {len(appearances)} appearances found")
-        
-        return appearances, duration, fps
-    
-    except Exception as e:
-        log_step("FIND_INTRO_APPEARANCES", f"❌ CRITICAL ERROR: {e}")
-        print(traceback.format_exc())
-        return [], 0, 0
-
-
 def calculate_trim_segments(appearances, duration):
-    """Calculate video segments to keep based on intro appearances"""
+    """Calculate video segments to keep based on intro appearances
+
+    Each appearance carries the aligned 'start' and 'end' of the intro, so
+    cuts land exactly on the intro boundaries.
+    """
     log_step("CALCULATE_TRIM_SEGMENTS", f"Input: {len(appearances)} appearances, {duration:.1f}s duration")
     
     if len(appearances) < 2:
@@ -193,25 +46,25 @@ def calculate_trim_segments(appearances, duration):
     
     # Keep from start to before 2nd appearance
     if len(appearances) >= 2:
-        segment = (0, appearances[1]['timestamp'] - 0.5)
+        segment = (0, appearances[1]['start'])
         segments.append(segment)
         log_step("CALCULATE_TRIM_SEGMENTS", f"Segment 1: {segment[0]:.1f}s - {segment[1]:.1f}s")
     
     # Keep from after 3rd to before 4th appearance
     if len(appearances) >= 4:
-        segment = (appearances[2]['timestamp'] + 5.0, appearances[3]['timestamp'] - 0.5)
+        segment = (appearances[2]['end'], appearances[3]['start'])
         segments.append(segment)
         log_step("CALCULATE_TRIM_SEGMENTS", f"Segment 2: {segment[0]:.1f}s - {segment[1]:.1f}s")
     
     # Keep from after 5th to before 6th appearance
     if len(appearances) >= 6:
-        segment = (appearances[4]['timestamp'] + 5.0, appearances[5]['timestamp'] - 0.5)
+        segment = (appearances[4]['end'], appearances[5]['start'])
         segments.append(segment)
         log_step("CALCULATE_TRIM_SEGMENTS", f"Segment 3: {segment[0]:.1f}s - {segment[1]:.1f}s")
     
     # If only 4 appearances, keep from after 3rd to end
     elif len(appearances) == 4:
-        segment = (appearances[2]['timestamp'] + 5.0, duration)
+        segment = (appearances[2]['end'], duration)
         segments.append(segment)
         log_step("CALCULATE_TRIM_SEGMENTS", f"Segment 2 (to end): {segment[0]:.1f}s - {segment[1]:.1f}s")
     
@@ -221,82 +74,82 @@ def calculate_trim_segments(appearances, duration):
     return segments
 
 
-async def trim_and_merge_video(video_path, segments, output_path, progress_callback=None):
-    """Trim video into segments and merge them"""
+def concat_list(video_path, segments):
+    """concat demuxer script that plays the kept segments of one file back to back"""
+    path = os.path.abspath(video_path).replace("'", "'\\''")
+    return "".join(
+        f"file '{path}'\ninpoint {start:.3f}\noutpoint {end:.3f}\n"
+        for start, end in segments
+    )
+
+
+def select_filters(segments):
+    """select/aselect filters keeping only the segments, with timestamps closed up"""
+    keep = "+".join(f"between(t,{start:.3f},{end:.3f})" for start, end in segments)
+    return (
+        f"select='{keep}',setpts=N/FRAME_RATE/TB",
+        f"aselect='{keep}',asetpts=N/SR/TB",
+    )
+
+
+async def trim_and_merge_video(video_path, segments, output_path, progress_callback=None, mode=None):
+    """Cut the segments out of video_path and join them in one ffmpeg run
+
+    "copy" (default) reads each segment once through the concat demuxer and
+    stream-copies it, so cuts snap to keyframes. "reencode" decodes the input
+    once and keeps frame-accurate segments with select/aselect.
+    """
+    mode = mode or Config.AUTOTRIM_TRIM_MODE
+    # Per-job scratch space: concurrent trims never share file names
+    os.makedirs("downloads", exist_ok=True)
+    job_dir = tempfile.mkdtemp(prefix="trim_", dir="downloads")
     try:
         log_step("TRIM_AND_MERGE", f"Input: {video_path}, Output: {output_path}")
-        log_step("TRIM_AND_MERGE", f"Segments: {len(segments)}")
-        
-        segment_files = []
-        segments_dir = "downloads/segments"
-        os.makedirs(segments_dir, exist_ok=True)
-        
-        # Create segment files
+        log_step("TRIM_AND_MERGE", f"Segments: {len(segments)}, Mode: {mode}")
         for i, (start, end) in enumerate(segments, 1):
-            segment_file = os.path.join(segments_dir, f"segment_{i}.mp4")
-            
-            log_step("TRIM_AND_MERGE", f"Extracting segment {i}: {start:.1f}s - {end:.1f}s")
-            
-            # FFmpeg command to extract segment
-            cmd = f'ffmpeg -i "{video_path}" -ss {start} -to {end} -c copy -avoid_negative_ts 1 "{segment_file}" -y -loglevel error'
-            
-            process = await asyncio.create_subprocess_shell(
-                cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
-                log_step("TRIM_AND_MERGE", f"❌ Segment {i} failed: {stderr.decode()}")
-            elif os.path.exists(segment_file):
-                size = os.path.getsize(segment_file)
-                log_step("TRIM_AND_MERGE", f"✓ Segment {i} created: {humanbytes(size)}")
-                segment_files.append(segment_file)
-                
-                if progress_callback:
-                    progress = (i / len(segments)) * 50
-                    await progress_callback(progress)
-            else:
-                log_step("TRIM_AND_MERGE", f"❌ Segment {i} not created")
-        
-        if not segment_files:
-            log_step("TRIM_AND_MERGE", "❌ No segments created")
-            return False
-        
-        # Create concat file for ffmpeg
-        concat_file = os.path.join(segments_dir, "concat.txt")
-        with open(concat_file, 'w') as f:
-            for seg_file in segment_files:
-                f.write(f"file '{os.path.abspath(seg_file)}'\n")
-        
-        log_step("TRIM_AND_MERGE", f"Merging {len(segment_files)} segments...")
-        
-        # Merge segments
-        merge_cmd = f'ffmpeg -f concat -safe 0 -i "{concat_file}" -c copy "{output_path}" -y -loglevel error'
-        
-        process = await asyncio.create_subprocess_shell(
-            merge_cmd,
+            log_step("TRIM_AND_MERGE", f"Segment {i}: {start:.1f}s - {end:.1f}s")
+        
+        cmd = ["ffmpeg", "-v", "error", "-nostdin", "-y", "-progress", "pipe:1", "-nostats"]
+        if mode == "reencode":
+            video_filter, audio_filter = select_filters(segments)
+            cmd += [
+                "-i", video_path,
+                "-vf", video_filter, "-af", audio_filter,
+                "-c:v", "libx264", "-preset", "veryfast", "-crf", "20", "-c:a", "aac",
+            ]
+        else:
+            concat_file = os.path.join(job_dir, "concat.txt")
+            with open(concat_file, 'w') as f:
+                f.write(concat_list(video_path, segments))
+            cmd += [
+                "-f", "concat", "-safe", "0", "-i", concat_file,
+                "-map", "0", "-c", "copy", "-avoid_negative_ts", "make_zero",
+            ]
+        cmd.append(output_path)
+        
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE
         )
-        stdout, stderr = await process.communicate()
         
-        if process.returncode != 0:
-            log_step("TRIM_AND_MERGE", f"❌ Merge failed: {stderr.decode()}")
+        # -progress reports out_time_us for the output, i.e. against the kept duration
+        kept = sum(end - start for start, end in segments) or 1
+        last_progress_update = 0
+        async for line in process.stdout:
+            key, _, value = line.decode(errors='ignore').strip().partition("=")
+            if key == "out_time_us" and value.isdigit() and progress_callback:
+                if time.time() - last_progress_update >= 3:
+                    last_progress_update = time.time()
+                    await progress_callback(min(100.0, int(value) / 1e6 / kept * 100))
         
-        # Cleanup segment files
-        for seg_file in segment_files:
-            try:
-                os.remove(seg_file)
-            except:
-                pass
-        try:
-            os.remove(concat_file)
-        except:
-            pass
+        stderr = await process.stderr.read()
+        await process.wait()
+        
+        if process.returncode != 0:
+            log_step("TRIM_AND_MERGE", f"❌ ffmpeg failed: {stderr.decode(errors='ignore')}")
         
-        if os.path.exists(output_path):
+        if process.returncode == 0 and os.path.exists(output_path):
             size = os.path.getsize(output_path)
             log_step("TRIM_AND_MERGE", f"✓ Final video created: {humanbytes(size)}")
             return True
@@ -308,21 +161,20 @@ async def trim_and_merge_video(video_path, segments, output_path, progress_callb
         log_step("TRIM_AND_MERGE", f"❌ ERROR: {e}")
         print(traceback.format_exc())
         return False
+    finally:
+        shutil.rmtree(job_dir, ignore_errors=True)
 
 
-def generate_thumbnail_with_episode(base_thumb_url, episode_number, output_path):
+async def generate_thumbnail_with_episode(base_thumb_url, episode_number, output_path):
     """Generate thumbnail with episode number overlay"""
     try:
         log_step("GENERATE_THUMBNAIL", f"Episode: {episode_number}")
         
         # Download base thumbnail
-        response = requests.get(base_thumb_url, timeout=10)
-        thumb_path = "temp_thumb.jpg"
-        with open(thumb_path, 'wb') as f:
-            f.write(response.content)
+        thumb_data = await downloader.fetch_bytes(base_thumb_url)
         
         # Open image
-        img = Image.open(thumb_path)
+        img = Image.open(io.BytesIO(thumb_data))
         draw = ImageDraw.Draw(img)
         
         # Calculate font size based on image dimensions
@@ -362,9 +214,6 @@ def generate_thumbnail_with_episode(base_thumb_url, episode_number, output_path)
         img = img.resize((320, 320), Image.Resampling.LANCZOS)
         img.save(output_path, "JPEG", quality=90)
         
-        # Cleanup
-        os.remove(thumb_path)
-        
         log_step("GENERATE_THUMBNAIL", f"✓ Thumbnail created: {output_path}")
         return True
     except Exception as e:
@@ -372,6 +221,40 @@ def generate_thumbnail_with_episode(base_thumb_url, episode_number, output_path)
         return False
 
 
+async def download_video(video_url, video_path, status_msg, header):
+    """Download a video URL to disk, editing status_msg as it goes"""
+    async def progress(downloaded, total_size):
+        if not total_size:
+            return
+        try:
+            await status_msg.edit(
+                f"{header}\n"
+                f"Progress: {downloaded / total_size * 100:.1f}% ({humanbytes(downloaded)}/{humanbytes(total_size)})"
+            )
+        except:
+            pass
+    
+    try:
+        log_step("DOWNLOAD_VIDEO", f"Starting download from: {video_url}")
+        await downloader.download(video_url, video_path, progress)
+        log_step("DOWNLOAD_VIDEO", f"✓ Downloaded: {humanbytes(os.path.getsize(video_path))}")
+    except Exception as e:
+        log_step("DOWNLOAD_VIDEO", f"❌ ERROR: {e}")
+        raise
+
+
+def pop_option(parts, option, choices):
+    """Remove a --<option>=<name> option from the command parts, returning the name"""
+    for part in list(parts):
+        if part.startswith(f"--{option}="):
+            parts.remove(part)
+            name = part.split("=", 1)[1].lower()
+            if name not in choices:
+                raise ValueError(f"Unknown {option} '{name}'. Use one of: {', '.join(choices)}")
+            return name
+    return None
+
+
 @Client.on_message(filters.private & filters.command(["autotrim"]))
 async def autotrim_command(client, message: Message):
     """Handle autotrim command"""
@@ -380,14 +263,21 @@ async def autotrim_command(client, message: Message):
     try:
         log_step("AUTOTRIM_COMMAND", f"User: {user_id}, Message: {message.text}")
         
-        # Extract video link and optional intro link
+        # Extract video link, optional intro link and --matcher/--detector options
         parts = message.text.split()
+        try:
+            matcher = pop_option(parts, "matcher", MATCHERS)
+            detector = pop_option(parts, "detector", DETECTORS)
+        except ValueError as e:
+            return await message.reply_text(f"❌ {e}")
         if len(parts) < 2:
             return await message.reply_text(
                 "**Usage:**\n"
                 "`/autotrim <video_link>`\n"
                 "OR\n"
-                "`/autotrim <video_link> <intro_title_link>`\n\n"
+                "`/autotrim <video_link> <intro_title_link>`\n"
+                "Add `--matcher=template` or `--matcher=dhash` to pick the frame matcher,\n"
+                "or `--detector=audio` to find intros by their jingle instead.\n\n"
                 "**Example:**\n"
                 "`/autotrim https://example.com/jai-bajarangabali-ep11.mp4`\n"
                 "`/autotrim https://example.com/video.mp4 https://example.com/intro.mp4`\n\n"
@@ -414,24 +304,12 @@ async def autotrim_command(client, message: Message):
             "⏳ Step 1/6: Preparing intro template..."
         )
         
-        # Download intro template
-        log_step("MAIN_PROCESS", "Step 1/6: Downloading intro template")
-        template_path = download_intro_template(intro_url)
-        if not template_path:
-            log_step("MAIN_PROCESS", "❌ Step 1 failed")
-            return await status_msg.edit("❌ Failed to download intro template!")
-        
-        # Extract intro frame
-        log_step("MAIN_PROCESS", "Step 2/6: Extracting intro frame")
-        await status_msg.edit(
-            "🔧 **Auto-Trim Started!**\n\n"
-            "⏳ Step 2/6: Extracting intro frame..."
-        )
-        
-        template_frame = extract_intro_frame(template_path)
-        if template_frame is None:
+        # Intro fingerprint: cached per template URL, downloaded only on a miss
+        log_step("MAIN_PROCESS", "Step 1-2/6: Loading intro fingerprint")
+        fingerprint = await template_store.get(intro_url or INTRO_TITLE_VIDEO_URL)
+        if fingerprint is None:
             log_step("MAIN_PROCESS", "❌ Step 2 failed")
-            return await status_msg.edit("❌ Failed to extract intro frame!")
+            return await status_msg.edit("❌ Failed to download or fingerprint intro template!")
         
         # Download video
         log_step("MAIN_PROCESS", "Step 3/6: Downloading video")
@@ -442,40 +320,12 @@ async def autotrim_command(client, message: Message):
         
         downloads_dir = "downloads"
         os.makedirs(downloads_dir, exist_ok=True)
-        video_filename = f"autotrim_{int(time.time())}.mp4"
+        video_filename = f"autotrim_{user_id}_{int(time.time())}.mp4"
         video_path = os.path.join(downloads_dir, video_filename)
         
-        # Download video using requests
         try:
-            log_step("DOWNLOAD_VIDEO", f"Starting download from: {video_url}")
-            response = requests.get(video_url, stream=True, timeout=60)
-            response.raise_for_status()
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded = 0
-            last_update = 0
-            
-            with open(video_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        
-                        # Update every 5MB
-                        if total_size > 0 and (downloaded - last_update) >= (5 * 1024 * 1024):
-                            progress = (downloaded / total_size) * 100
-                            last_update = downloaded
-                            try:
-                                await status_msg.edit(
-                                    f"🔧 **Auto-Trim Started!**\n\n"
-                                    f"📥 Step 3/6: Downloading video...\n"
-                                    f"Progress: {progress:.1f}% ({humanbytes(downloaded)}/{humanbytes(total_size)})"
-                                )
-                            except:
-                                pass
-            
-            log_step("DOWNLOAD_VIDEO", f"✓ Downloaded: {humanbytes(os.path.getsize(video_path))}")
+            await download_video(video_url, video_path, status_msg, "🔧 **Auto-Trim Started!**\n\n📥 Step 3/6: Downloading video...")
         except Exception as e:
-            log_step("DOWNLOAD_VIDEO", f"❌ ERROR: {e}")
             return await status_msg.edit(f"❌ Download failed: {str(e)}")
         
         if not os.path.exists(video_path):
@@ -501,7 +351,8 @@ async def autotrim_command(client, message: Message):
             except Exception as e:
                 log_step("ANALYSIS_PROGRESS", f"Update failed: {e}")
         
-        appearances, duration, fps = find_intro_appearances(video_path, template_frame, analysis_progress)
+        # Runs in the process pool so other users still get replies meanwhile
+        appearances, duration, fps = await find_intro_appearances_async(video_path, fingerprint, analysis_progress, matcher, detector)
         
         log_step("MAIN_PROCESS", f"Analysis complete: {len(appearances)} appearances")
         
@@ -529,7 +380,7 @@ async def autotrim_command(client, message: Message):
         segments = calculate_trim_segments(appearances, duration)
         
         # Trim and merge
-        output_filename = f"trimmed_{int(time.time())}.mp4"
+        output_filename = f"trimmed_{user_id}_{int(time.time())}.mp4"
         output_path = os.path.join(downloads_dir, output_filename)
         
         async def trim_progress(progress):
@@ -606,7 +457,7 @@ async def handle_filename_response(client, message: Message):
         await status_msg.edit("🎨 Generating custom thumbnail...")
         
         thumb_path = os.path.join("downloads", f"thumb_{int(time.time())}.jpg")
-        thumb_success = generate_thumbnail_with_episode(
+        thumb_success = await generate_thumbnail_with_episode(
             JAI_BAJARANGABALI_THUMB_BASE,
             episode_number,
             thumb_path
@@ -717,7 +568,7 @@ OR
 <code>/autotrim https://example.com/video.mp4 https://example.com/intro.mp4</code>
 
 <b>Process:</b>
-1. Bot downloads the intro template (default or custom)
+1. Bot loads the intro fingerprint (cached per template URL, downloaded on first use)
 2. Bot downloads the video
 3. Detects all intro title card appearances
 4. Trims video to remove unnecessary cards
@@ -727,7 +578,7 @@ OR
 8. Uploads to Jai Bajarangabali channel
 
 <b>Features:</b>
-✓ Automatic intro detection using template matching
+✓ Automatic intro detection by aligning a multi-frame intro fingerprint
 ✓ Smart trimming (keeps 1st intro, removes others)
 ✓ Custom intro template support
 ✓ Episode number extraction from filename
@@ -761,9 +612,9 @@ If analysis gets stuck at Step 4:
 
 <b>Debug Mode:</b>
 All operations are logged with timestamps in the console. Check logs for:
-• DOWNLOAD_INTRO_TEMPLATE
-• EXTRACT_INTRO_FRAME
-• FIND_INTRO_APPEARANCES
+• TEMPLATE_STORE
+• BUILD_FINGERPRINT
+• FIND_INTRO_APPEARANCES / FIND_INTRO_AUDIO
 • CALCULATE_TRIM_SEGMENTS
 • TRIM_AND_MERGE
 • HANDLE_FILENAME
@@ -772,7 +623,9 @@ All operations are logged with timestamps in the console. Check logs for:
 This feature is specifically designed for Jai Bajarangabali serial episodes but can be adapted for any video with repetitive intro cards.
 
 <b>Performance:</b>
-• Analysis checks every 5th frame for efficiency
+• Analysis samples low-res grayscale frames (~5 per second)
+• Matchers: correlation (default) or dHash prefilter, pick with <code>--matcher=</code>
+• Audio mode: <code>--detector=audio</code> matches the intro jingle's spectrogram peaks, much faster than decoding video
 • Similarity threshold: 70% (adjustable)
 • Progress updates every 2 seconds
 • Automatic cleanup of temporary files
@@ -838,6 +691,57 @@ async def autotrim_cancel(client, message: Message):
         )
 
 
+@Client.on_message(filters.private & filters.command(["autotrimbench"]) & filters.user(Config.ADMIN))
+async def autotrim_bench(client, message: Message):
+    """Compare intro matchers on one video: speed and agreement with matchTemplate"""
+    parts = message.text.split()
+    if len(parts) < 2 or not parts[1].startswith('http'):
+        return await message.reply_text(
+            "**Usage:** `/autotrimbench <video_link> [intro_title_link]`\n\n"
+            "Decodes the video once and times every matcher on the same frames."
+        )
+    
+    status_msg = await message.reply_text("🧪 **Matcher Benchmark**\n\n⏳ Preparing intro template...")
+    video_path = os.path.join("downloads", f"autotrimbench_{int(time.time())}.mp4")
+    os.makedirs("downloads", exist_ok=True)
+    
+    try:
+        fingerprint = await template_store.get(parts[2] if len(parts) >= 3 else INTRO_TITLE_VIDEO_URL)
+        if fingerprint is None:
+            return await status_msg.edit("❌ Failed to prepare intro template!")
+        
+        await download_video(parts[1], video_path, status_msg, "🧪 **Matcher Benchmark**\n\n📥 Downloading video...")
+        
+        async def bench_progress(progress, current_frame, total_frames):
+            try:
+                await status_msg.edit(f"🧪 **Matcher Benchmark**\n\n🔍 Analyzing... {progress:.1f}%")
+            except:
+                pass
+        
+        report = await run_in_pool(benchmark_matchers, video_path, fingerprint, progress_callback=bench_progress)
+        
+        lines = [
+            "🧪 **Matcher Benchmark**\n",
+            f"**Frames sampled:** `{report['frames']}` over `{report['duration']:.0f}s`",
+            f"**Decode time:** `{report['decode_seconds']:.2f}s`\n",
+        ]
+        for name, result in report['matchers'].items():
+            per_frame = result['seconds'] / report['frames'] * 1000 if report['frames'] else 0
+            lines.append(
+                f"**{name}:** `{result['seconds']:.2f}s` ({per_frame:.2f} ms/frame)\n"
+                f"├ Found: `{len(result['appearances'])}` at "
+                f"{', '.join(f'{t:.1f}s' for t in result['appearances'][:8]) or 'none'}\n"
+                f"└ Recall: `{result['recall']*100:.0f}%` | Precision: `{result['precision']*100:.0f}%`\n"
+            )
+        await status_msg.edit("\n".join(lines))
+    except Exception as e:
+        log_step("AUTOTRIM_BENCH", f"❌ ERROR: {e}")
+        await status_msg.edit(f"❌ **Benchmark failed:** `{e}`")
+    finally:
+        if os.path.exists(video_path):
+            os.remove(video_path)
+
+
 # Startup log
 log_step("MODULE_LOADED", "Auto-Trim module initialized successfully")
 log_step("CONFIG", f"Intro template URL: {INTRO_TITLE_VIDEO_URL}")
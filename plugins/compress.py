@@ -2,6 +2,10 @@ from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from helper.database import pp_bots
 from helper.utils import progress_for_pyrogram, humanbytes, clean_file
+from helper.scheduler import scheduler
+from helper.tg_download import download_media_parallel
+from helper.tg_upload import send_media_parallel
+from helper.jobs import job_handler, submit_job
 from config import Config
 from bot import app
 import os
@@ -64,12 +68,14 @@ async def compress_command(client, message):
         await message.reply_text(f"**❌ Error:** `{e}`")
 
 
-async def handle_compress_mode_media(client, message, file, filename, file_size):
+async def handle_compress_mode_media(client, message, file, filename, file_size, settings=None):
     """Handle compress mode when user sends video"""
     user_id = message.from_user.id
+    if settings is None:
+        settings = await pp_bots.get_user_settings(user_id)
     
     # Check saved qualities
-    saved_qualities = await pp_bots.get_compression_qualities(user_id)
+    saved_qualities = settings.compression_qualities
     
     if saved_qualities:
         # Use saved qualities
@@ -103,12 +109,24 @@ async def handle_compress_mode_media(client, message, file, filename, file_size)
 
 
 async def compress_video(client, message, file, filename, file_size, qualities):
+    """Queue a persistent compression job so a restart doesn't drop it"""
+    ms = await message.reply_text("**📥 Downloading video...**")
+    await submit_job(client, "compress", message, ms, {'qualities': list(qualities)})
+
+
+@job_handler("compress")
+async def compress_job(client, message, ms, params):
     """Compress video to specified qualities"""
     user_id = message.from_user.id
+    file = message.video or message.document
+    filename = file.file_name or "video.mp4"
+    qualities = params['qualities']
     
-    ms = await message.reply_text("**📥 Downloading video...**")
+    job = await scheduler.acquire("encode", user_id, ms)
     
     try:
+        settings = await pp_bots.get_user_settings(user_id)
+        
         downloads_dir = "downloads"
         os.makedirs(downloads_dir, exist_ok=True)
         
@@ -117,11 +135,13 @@ async def compress_video(client, message, file, filename, file_size, qualities):
         upload_client = app if (app and Config.STRING_SESSION) else client
         
         # Download video
-        await upload_client.download_media(
+        await download_media_parallel(
+            upload_client,
             message,
-            file_name=video_path,
+            video_path,
             progress=progress_for_pyrogram,
-            progress_args=("📥 Downloading...", ms, time.time())
+            progress_args=("📥 Downloading...", ms, time.time()),
+            extra_clients=(client,)
         )
         
         # Compress each quality
@@ -148,7 +168,7 @@ async def compress_video(client, message, file, filename, file_size, qualities):
                 await ms.edit(f"**📤 Uploading {quality}... ({idx}/{len(qualities)})**")
                 
                 # Get caption
-                c_caption = await pp_bots.get_caption(user_id)
+                c_caption = settings.caption
                 caption = c_caption.format(
                     filename=output_name,
                     filesize=humanbytes(os.path.getsize(output_path)),
@@ -163,17 +183,19 @@ async def compress_video(client, message, file, filename, file_size, qualities):
                 
                 # Get thumbnail
                 ph_path = None
-                c_thumb = await pp_bots.get_thumbnail(user_id)
+                c_thumb = settings.thumbnail
                 if c_thumb:
                     ph_path = await client.download_media(c_thumb)
                 
                 # Check channel
-                upload_channel = await pp_bots.get_upload_channel(user_id)
+                upload_channel = settings.upload_channel
                 upload_to = upload_channel if upload_channel else message.chat.id
                 
-                await upload_client.send_video(
+                await send_media_parallel(
+                    upload_client,
+                    "video",
                     upload_to,
-                    video=output_path,
+                    output_path,
                     caption=caption,
                     thumb=ph_path,
                     progress=progress_for_pyrogram,
@@ -194,6 +216,8 @@ async def compress_video(client, message, file, filename, file_size, qualities):
     except Exception as e:
         await ms.edit(f"**❌ Error:** `{e}`")
         logging.error(f"Compression error: {e}")
+    finally:
+        scheduler.release(job)
 
 
 @Client.on_callback_query(filters.regex("^comp_single_"))
@@ -2,11 +2,13 @@ from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from helper.database import pp_bots
 from helper.utils import progress_for_pyrogram, humanbytes, clean_file
+from helper.scheduler import scheduler
+from helper.jobs import job_handler, submit_job
+from helper.tg_stream import run_ffmpeg_on_media
 from config import Config
 from bot import app
 import os
 import time
-import asyncio
 import logging
 
 
@@ -36,14 +38,22 @@ async def handle_extract_mode_media(client, message, file, filename, file_size):
 @Client.on_callback_query(filters.regex("^extract_audio_"))
 async def extract_audio_callback(client, query: CallbackQuery):
     """Extract audio from video"""
-    file_id = query.data.split("_")[-1]
-    user_id = query.from_user.id
+    file_msg = query.message.reply_to_message
+    if not file_msg:
+        return await query.message.edit_text("**❌ Original file not found!**")
     
     await query.message.edit_text("**🎵 Extracting audio...**")
+    # Runs here, or on a worker node when RUN_MODE=frontend
+    await submit_job(client, "extract_audio", file_msg, query.message)
+
+
+@job_handler("extract_audio")
+async def extract_audio_job(client, file_msg, status_msg, params):
+    """Extract audio from video"""
+    user_id = file_msg.from_user.id
     
+    job = None
     try:
-        file_msg = query.message.reply_to_message
-        
         if file_msg.video:
             file = file_msg.video
             filename = file.file_name or "video.mp4"
@@ -51,42 +61,34 @@ async def extract_audio_callback(client, query: CallbackQuery):
             file = file_msg.document
             filename = file.file_name
         else:
-            return await query.message.edit_text("**❌ Invalid file type!**")
+            return await status_msg.edit_text("**❌ Invalid file type!**")
         
         downloads_dir = "downloads"
         os.makedirs(downloads_dir, exist_ok=True)
         
-        video_path = os.path.join(downloads_dir, filename)
         audio_path = os.path.join(downloads_dir, f"{os.path.splitext(filename)[0]}.mp3")
         
-        await query.message.edit_text("**📥 Downloading video...**")
+        job = await scheduler.acquire("encode", user_id, status_msg)
         
         upload_client = app if (app and Config.STRING_SESSION) else client
         
-        await upload_client.download_media(
-            file_msg,
-            file_name=video_path,
-            progress=progress_for_pyrogram,
-            progress_args=("📥 Downloading...", query.message, time.time())
-        )
-        
-        # Extract audio using FFmpeg
-        await query.message.edit_text("**🎵 Extracting audio...**")
-        
-        cmd = f'ffmpeg -i "{video_path}" -vn -acodec libmp3lame -q:a 2 "{audio_path}"'
+        # Extract audio using FFmpeg, fed straight from Telegram (no full download first)
+        await status_msg.edit_text("**🎵 Extracting audio...**")
         
-        process = await asyncio.create_subprocess_shell(
-            cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+        returncode, stderr = await run_ffmpeg_on_media(
+            upload_client, file_msg, file.file_size, filename,
+            ["-vn", "-acodec", "libmp3lame", "-q:a", "2", audio_path],
+            progress=progress_for_pyrogram,
+            progress_args=("📥 Streaming & processing...", status_msg, time.time())
         )
-        stdout, stderr = await process.communicate()
         
-        if process.returncode == 0 and os.path.exists(audio_path):
-            await query.message.edit_text("**📤 Uploading audio...**")
+        if returncode == 0 and os.path.exists(audio_path):
+            await status_msg.edit_text("**📤 Uploading audio...**")
+            
+            settings = await pp_bots.get_user_settings(user_id)
             
             # Get caption
-            c_caption = await pp_bots.get_caption(user_id)
+            c_caption = settings.caption
             caption = c_caption.format(
                 filename=os.path.basename(audio_path),
                 filesize=humanbytes(os.path.getsize(audio_path)),
@@ -99,42 +101,51 @@ async def extract_audio_callback(client, query: CallbackQuery):
             )
             
             # Check channel
-            upload_channel = await pp_bots.get_upload_channel(user_id)
-            upload_to = upload_channel if upload_channel else query.message.chat.id
+            upload_channel = settings.upload_channel
+            upload_to = upload_channel if upload_channel else status_msg.chat.id
             
             await upload_client.send_audio(
                 upload_to,
                 audio=audio_path,
                 caption=caption,
                 progress=progress_for_pyrogram,
-                progress_args=("📤 Uploading...", query.message, time.time())
+                progress_args=("📤 Uploading...", status_msg, time.time())
             )
             
-            await query.message.edit_text("**✅ Audio extracted successfully!**")
+            await status_msg.edit_text("**✅ Audio extracted successfully!**")
         else:
             error_msg = stderr.decode()[:200] if stderr else "Unknown error"
-            await query.message.edit_text(f"**❌ Extraction failed!**\n\n`{error_msg}`")
+            await status_msg.edit_text(f"**❌ Extraction failed!**\n\n`{error_msg}`")
         
         # Cleanup
-        clean_file(video_path)
         clean_file(audio_path)
         
     except Exception as e:
-        await query.message.edit_text(f"**❌ Error:** `{e}`")
+        await status_msg.edit_text(f"**❌ Error:** `{e}`")
         logging.error(f"Extract audio error: {e}")
+    finally:
+        scheduler.release(job)
 
 
 @Client.on_callback_query(filters.regex("^extract_subs_"))
 async def extract_subs_callback(client, query: CallbackQuery):
     """Extract subtitles from video"""
-    file_id = query.data.split("_")[-1]
-    user_id = query.from_user.id
+    file_msg = query.message.reply_to_message
+    if not file_msg:
+        return await query.message.edit_text("**❌ Original file not found!**")
     
     await query.message.edit_text("**📝 Extracting subtitles...**")
+    # Runs here, or on a worker node when RUN_MODE=frontend
+    await submit_job(client, "extract_subs", file_msg, query.message)
+
+
+@job_handler("extract_subs")
+async def extract_subs_job(client, file_msg, status_msg, params):
+    """Extract subtitles from video"""
+    user_id = file_msg.from_user.id
     
+    job = None
     try:
-        file_msg = query.message.reply_to_message
-        
         if file_msg.video:
             file = file_msg.video
             filename = file.file_name or "video.mp4"
@@ -142,45 +153,35 @@ async def extract_subs_callback(client, query: CallbackQuery):
             file = file_msg.document
             filename = file.file_name
         else:
-            return await query.message.edit_text("**❌ Invalid file type!**")
+            return await status_msg.edit_text("**❌ Invalid file type!**")
         
         downloads_dir = "downloads"
         os.makedirs(downloads_dir, exist_ok=True)
         
-        video_path = os.path.join(downloads_dir, filename)
         subs_path = os.path.join(downloads_dir, f"{os.path.splitext(filename)[0]}.srt")
         
-        await query.message.edit_text("**📥 Downloading video...**")
+        job = await scheduler.acquire("rename", user_id, status_msg)
         
         upload_client = app if (app and Config.STRING_SESSION) else client
         
-        await upload_client.download_media(
-            file_msg,
-            file_name=video_path,
-            progress=progress_for_pyrogram,
-            progress_args=("📥 Downloading...", query.message, time.time())
-        )
-        
-        # Extract subtitles using FFmpeg
-        await query.message.edit_text("**📝 Extracting subtitles...**")
+        # Extract subtitles using FFmpeg, fed straight from Telegram (no full download first)
+        await status_msg.edit_text("**📝 Extracting subtitles...**")
         
-        cmd = f'ffmpeg -i "{video_path}" -map 0:s:0 "{subs_path}"'
-        
-        process = await asyncio.create_subprocess_shell(
-            cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+        returncode, stderr = await run_ffmpeg_on_media(
+            upload_client, file_msg, file.file_size, filename,
+            ["-map", "0:s:0", subs_path],
+            progress=progress_for_pyrogram,
+            progress_args=("📥 Streaming & processing...", status_msg, time.time())
         )
-        stdout, stderr = await process.communicate()
         
-        if process.returncode == 0 and os.path.exists(subs_path):
-            await query.message.edit_text("**📤 Uploading subtitles...**")
+        if returncode == 0 and os.path.exists(subs_path):
+            await status_msg.edit_text("**📤 Uploading subtitles...**")
             
             caption = f"**📝 Extracted Subtitles**\n\nFrom: {filename}\n\n@pp_bots"
             
             # Check channel
             upload_channel = await pp_bots.get_upload_channel(user_id)
-            upload_to = upload_channel if upload_channel else query.message.chat.id
+            upload_to = upload_channel if upload_channel else status_msg.chat.id
             
             await client.send_document(
                 upload_to,
@@ -188,20 +189,21 @@ async def extract_subs_callback(client, query: CallbackQuery):
                 caption=caption
             )
             
-            await query.message.edit_text("**✅ Subtitles extracted successfully!**")
+            await status_msg.edit_text("**✅ Subtitles extracted successfully!**")
         else:
-            await query.message.edit_text(
+            await status_msg.edit_text(
                 "**❌ No subtitles found in video!**\n\n"
                 "This video doesn't contain embedded subtitles."
             )
         
         # Cleanup
-        clean_file(video_path)
         clean_file(subs_path)
         
     except Exception as e:
-        await query.message.edit_text(f"**❌ Error:** `{e}`")
+        await status_msg.edit_text(f"**❌ Error:** `{e}`")
         logging.error(f"Extract subtitles error: {e}")
+    finally:
+        scheduler.release(job)
 
 
 # ==================== COMMAND HANDLER ====================
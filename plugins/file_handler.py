@@ -1,6 +1,10 @@
 from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from helper.database import pp_bots
+from helper.scheduler import scheduler
+from helper.jobs import job_handler, submit_job
+from helper.tg_download import download_media_parallel
+from helper.tg_upload import send_media_parallel, relay_media
 from helper.utils import (
     progress_for_pyrogram, humanbytes, convert,
     sanitize_filename, apply_word_removal, apply_word_replacement,
@@ -39,7 +43,8 @@ async def handle_media_files(client, message: Message):
     print(f"[MAIN HANDLER] New media file received from user {user_id}")
     
     # Get user settings
-    media_mode = await pp_bots.get_media_mode(user_id)
+    settings = await pp_bots.get_user_settings(user_id)
+    media_mode = settings.media_mode
     print(f"[MAIN HANDLER] Media mode: {media_mode}")
     
     # Get file info
@@ -75,7 +80,7 @@ async def handle_media_files(client, message: Message):
     try:
         if media_mode == "rename":
             print(f"[MAIN HANDLER] Routing to RENAME mode")
-            await handle_rename_mode(client, message, file, filename, file_size, media_type)
+            await handle_rename_mode(client, message, file, filename, file_size, media_type, settings)
         
         elif media_mode == "trim":
             print(f"[MAIN HANDLER] Routing to TRIM mode")
@@ -108,7 +113,7 @@ async def handle_media_files(client, message: Message):
         
         elif media_mode == "compress":
             print(f"[MAIN HANDLER] Routing to COMPRESS mode")
-            await handle_compress_mode_media(client, message, file, filename, file_size)
+            await handle_compress_mode_media(client, message, file, filename, file_size, settings)
         
         elif media_mode == "autotrim":
             print(f"[MAIN HANDLER] AUTOTRIM mode (not implemented)")
@@ -120,7 +125,7 @@ async def handle_media_files(client, message: Message):
         
         else:
             print(f"[MAIN HANDLER] Unknown mode, defaulting to RENAME")
-            await handle_rename_mode(client, message, file, filename, file_size, media_type)
+            await handle_rename_mode(client, message, file, filename, file_size, media_type, settings)
             
     except Exception as e:
         logging.error(f"Error in media handler: {e}")
@@ -157,28 +162,164 @@ async def show_remove_options_callback(client, query):
     )
 
 
-async def handle_rename_mode(client, message, file, filename, file_size, media_type):
+async def premium_ready():
+    """True if the premium session is configured and answering"""
+    if premium_client and Config.STRING_SESSION:
+        try:
+            me = await premium_client.get_me()
+            if me:
+                print(f"[RENAME MODE] Premium client available: {me.first_name}")
+                return True
+        except Exception as e:
+            print(f"[RENAME MODE] Premium client not available: {e}")
+    return False
+
+
+async def prepare_thumbnail(client, settings, message, media_type):
+    """The custom thumbnail, else the video's own, as a 320x320 JPEG path (or None)"""
+    ph_path = None
+    c_thumb = settings.thumbnail
+
+    if c_thumb:
+        try:
+            print(f"[STEP 11] Downloading custom thumbnail...")
+            ph_path = await client.download_media(c_thumb)
+            print(f"[STEP 11] Custom thumbnail downloaded")
+        except Exception as e:
+            print(f"[STEP 11] Custom thumbnail failed: {e}")
+            ph_path = None
+    elif media_type == "video" and message.video and message.video.thumbs:
+        try:
+            print(f"[STEP 11] Downloading video thumbnail...")
+            ph_path = await client.download_media(message.video.thumbs[0].file_id)
+            print(f"[STEP 11] Video thumbnail downloaded")
+        except Exception as e:
+            print(f"[STEP 11] Video thumbnail failed: {e}")
+            ph_path = None
+
+    if ph_path:
+        try:
+            print(f"[STEP 11] Processing thumbnail...")
+            img = Image.open(ph_path).convert("RGB")
+            img = img.resize((320, 320))
+            img.save(ph_path, "JPEG")
+            print(f"[STEP 11] Thumbnail processed")
+        except Exception as e:
+            print(f"[STEP 11] Thumbnail processing failed: {e}")
+            clean_file(ph_path)
+            ph_path = None
+    else:
+        print(f"[STEP 11] No thumbnail available")
+    return ph_path
+
+
+async def confirm_upload(client, upload_msg, upload_channel, new_filename, file_size):
+    """Final status: summary for channel uploads, otherwise remove the status message
+
+    The file is already sent by now, so a failure here is only logged: it
+    must not look like a failed upload (or start the rename over).
+    """
+    try:
+        if upload_channel:
+            try:
+                channel_info = await client.get_chat(upload_channel)
+                await upload_msg.edit(
+                    f"**✅ Upload Complete!**\n\n"
+                    f"**Uploaded to:** {channel_info.title}\n"
+                    f"**File:** {new_filename}\n"
+                    f"**Size:** {humanbytes(file_size)}"
+                )
+            except:
+                await upload_msg.edit("**✅ Upload Complete!**")
+        else:
+            await upload_msg.delete()
+    except Exception as e:
+        logging.warning(f"Couldn't update the upload status message: {e}")
+
+
+async def rename_without_download(client, message, status_msg, settings, new_filename, media_type, use_premium):
+    """Rename fast paths for when the file's bytes stay the same (no metadata to write)
+
+    Telegram can't rename a stored file: a reused file_id keeps its original
+    name and thumbnail. So the file_id is sent again as-is only when name,
+    type and thumbnail are unchanged, i.e. just the caption is new. Anything
+    else is relayed part by part from the old file into a new upload with no
+    local copy. Returns False if the regular download/upload path is needed.
+    """
+    file = message.document or message.video or message.audio
+    file_size = file.file_size
+    final_media_type = settings.media_preference or media_type
+    upload_channel = settings.upload_channel
+    upload_to = upload_channel if upload_channel else message.chat.id
+    duration = getattr(file, "duration", 0) or 0
+    caption = settings.caption.format(
+        filename=new_filename,
+        filesize=humanbytes(file_size),
+        duration=convert(duration)
+    ) if settings.caption else f"**{new_filename}**"
+    
+    if (
+        Config.RENAME_REUSE_FILE_ID and new_filename == file.file_name
+        and not settings.thumbnail and getattr(message, final_media_type, None) is file
+    ):
+        print(f"[FAST PATH] Name unchanged - resending file_id")
+        await client.send_cached_media(upload_to, file.file_id, caption=caption)
+        await confirm_upload(client, status_msg, upload_channel, new_filename, file_size)
+        return True
+    
+    if not Config.RENAME_RELAY:
+        return False
+    if file_size > Config.MAX_FILE_SIZE_NON_PREMIUM:
+        if not use_premium:
+            return False
+        upload_client = premium_client
+    else:
+        upload_client = client
+    
+    job = await scheduler.acquire("rename", message.from_user.id, status_msg)
+    ph_path = None
+    try:
+        ph_path = await prepare_thumbnail(client, settings, message, media_type)
+        await status_msg.edit("📤 Uploading...")
+        print(f"[FAST PATH] Relaying parts as {final_media_type}")
+        sent = await relay_media(
+            client,
+            message,
+            upload_client,
+            final_media_type,
+            upload_to,
+            new_filename,
+            caption=caption,
+            thumb=ph_path,
+            duration=duration,
+            progress=progress_for_pyrogram,
+            progress_args=("📤 Uploading...", status_msg, time.time())
+        )
+        if sent is None:
+            return False
+        await confirm_upload(client, status_msg, upload_channel, new_filename, file_size)
+        return True
+    finally:
+        clean_file(ph_path)
+        scheduler.release(job)
+
+
+async def handle_rename_mode(client, message, file, filename, file_size, media_type, settings=None):
     """Handle file renaming with new advanced caption logic"""
     print(f"\n{'='*60}")
     print(f"[RENAME MODE] Started")
     
     user_id = message.from_user.id
-    media_preference = await pp_bots.get_media_preference(user_id)
-    upload_channel = await pp_bots.get_upload_channel(user_id)
+    if settings is None:
+        settings = await pp_bots.get_user_settings(user_id)
+    media_preference = settings.media_preference
+    upload_channel = settings.upload_channel
     
     print(f"[RENAME MODE] Media preference: {media_preference}")
     print(f"[RENAME MODE] Upload channel: {upload_channel}")
     
     # ✅ Check if premium client is available
-    use_premium = False
-    if premium_client and Config.STRING_SESSION:
-        try:
-            me = await premium_client.get_me()
-            if me:
-                use_premium = True
-                print(f"[RENAME MODE] Premium client available: {me.first_name}")
-        except Exception as e:
-            print(f"[RENAME MODE] Premium client not available: {e}")
+    use_premium = await premium_ready()
     
     # Check file size
     max_size = Config.MAX_FILE_SIZE if use_premium else Config.MAX_FILE_SIZE_NON_PREMIUM
@@ -209,8 +350,8 @@ async def handle_rename_mode(client, message, file, filename, file_size, media_t
     print(f"[STEP 1] File extension: {file_extension}")
     
     # Get remove and replace words
-    remove_words = await pp_bots.get_remove_words(user_id)
-    replace_words = await pp_bots.get_replace_words(user_id)
+    remove_words = settings.remove_words
+    replace_words = settings.replace_words
     
     print(f"[STEP 2] Remove words: {remove_words}")
     print(f"[STEP 2] Replace words: {replace_words}")
@@ -343,9 +484,6 @@ async def handle_rename_mode(client, message, file, filename, file_size, media_t
                 pass
             
             # ✅ NEW: After user provides name, apply remove/replace
-            remove_words = await pp_bots.get_remove_words(user_id)
-            replace_words = await pp_bots.get_replace_words(user_id)
-            
             if remove_words or replace_words:
                 print(f"[STEP 2] Applying remove/replace after user input")
                 name_without_ext = os.path.splitext(new_filename)[0]
@@ -375,8 +513,8 @@ async def handle_rename_mode(client, message, file, filename, file_size, media_t
     name_without_ext = os.path.splitext(new_filename)[0]
     
     # Get prefix and suffix
-    prefix = await pp_bots.get_prefix(user_id)
-    suffix = await pp_bots.get_suffix(user_id)
+    prefix = settings.prefix
+    suffix = settings.suffix
     
     print(f"[STEP 3] Prefix: {prefix}")
     print(f"[STEP 3] Suffix: {suffix}")
@@ -405,6 +543,30 @@ async def handle_rename_mode(client, message, file, filename, file_size, media_t
     new_filename = sanitize_filename(new_filename)
     print(f"[STEP 3] Final filename: {new_filename}")
     
+    # Download/upload runs as a persistent job so a restart resumes it
+    download_msg = await message.reply_text("📥 Downloading...")
+    await submit_job(client, "rename", message, download_msg, {
+        'new_filename': new_filename,
+        'media_type': media_type,
+    })
+
+
+@job_handler("rename")
+async def rename_job(client, message, download_msg, params):
+    """Download, tag and re-upload a file under its already resolved name"""
+    user_id = message.from_user.id
+    settings = await pp_bots.get_user_settings(user_id)
+    media_preference = settings.media_preference
+    upload_channel = settings.upload_channel
+    use_premium = await premium_ready()
+    
+    new_filename = params['new_filename']
+    media_type = params['media_type']
+    file = message.document or message.video or message.audio
+    file_id = file.file_id
+    file_size = file.file_size
+    _, file_extension = os.path.splitext(new_filename)
+    
     # Setup paths
     downloads_dir = "downloads"
     metadata_dir = "Metadata"
@@ -423,279 +585,257 @@ async def handle_rename_mode(client, message, file, filename, file_size, media_t
     print(f"[STEP 4] Final path: {renamed_file_path}")
     print(f"[STEP 4] Metadata path: {metadata_file_path}")
     
-    # Download
-    download_msg = await message.reply_text("📥 Downloading...")
+    # Nothing to write into the file: skip the local copy if possible
+    if not (settings.metadata and settings.metadata_code):
+        try:
+            if await rename_without_download(client, message, download_msg, settings, new_filename, media_type, use_premium):
+                if file_id in renaming_operations:
+                    del renaming_operations[file_id]
+                return
+        except Exception as e:
+            logging.warning(f"Rename fast path failed, downloading instead: {e}")
     
+    # Download
+    job = await scheduler.acquire("rename", user_id, download_msg)
     try:
-        # ✅ Smart client selection for download
-        if file_size > Config.MAX_FILE_SIZE_NON_PREMIUM and use_premium:
-            download_client = premium_client
-            print(f"[STEP 5] Using PREMIUM client for download (large file)")
-        else:
-            download_client = client
-            print(f"[STEP 5] Using BOT client for download")
-        
-        print(f"[STEP 5] Starting download...")
-        print(f"[STEP 5] File ID: {file.file_id}")
-        
-        # Download
-        temp_path = await download_client.download_media(
-            message,
-            file_name=temp_file_path,
-            progress=progress_for_pyrogram,
-            progress_args=("📥 Downloading...", download_msg, time.time())
-        )
+        try:
+            # ✅ Smart client selection for download
+            if file_size > Config.MAX_FILE_SIZE_NON_PREMIUM and use_premium:
+                download_client = premium_client
+                print(f"[STEP 5] Using PREMIUM client for download (large file)")
+            else:
+                download_client = client
+                print(f"[STEP 5] Using BOT client for download")
         
-        print(f"[STEP 6] Download result: {temp_path}")
+            print(f"[STEP 5] Starting download...")
+            print(f"[STEP 5] File ID: {file.file_id}")
         
-        # Fallback to premium if bot failed
-        if temp_path is None and download_client != premium_client and use_premium:
-            print(f"[STEP 6] Bot client failed, trying premium client...")
-            download_client = premium_client
-            
-            temp_path = await download_client.download_media(
+            # Download, with parts spread over both clients' sessions when premium is on
+            temp_path = await download_media_parallel(
+                download_client,
                 message,
-                file_name=temp_file_path,
+                temp_file_path,
                 progress=progress_for_pyrogram,
-                progress_args=("📥 Downloading (premium)...", download_msg, time.time())
+                progress_args=("📥 Downloading...", download_msg, time.time()),
+                extra_clients=(premium_client,) if use_premium else ()
             )
+        
+            print(f"[STEP 6] Download result: {temp_path}")
+        
+            # Fallback to premium if bot failed
+            if temp_path is None and download_client != premium_client and use_premium:
+                print(f"[STEP 6] Bot client failed, trying premium client...")
+                download_client = premium_client
             
-            print(f"[STEP 6] Premium download result: {temp_path}")
+                temp_path = await download_client.download_media(
+                    message,
+                    file_name=temp_file_path,
+                    progress=progress_for_pyrogram,
+                    progress_args=("📥 Downloading (premium)...", download_msg, time.time())
+                )
+            
+                print(f"[STEP 6] Premium download result: {temp_path}")
         
-        if temp_path is None:
-            raise ValueError("Download failed - returned None")
+            if temp_path is None:
+                raise ValueError("Download failed - returned None")
         
-        # Verify file
-        if not os.path.exists(temp_path):
-            raise FileNotFoundError(f"Downloaded file not found at: {temp_path}")
+            # Verify file
+            if not os.path.exists(temp_path):
+                raise FileNotFoundError(f"Downloaded file not found at: {temp_path}")
         
-        file_stat = os.stat(temp_path)
-        print(f"[STEP 6] ✅ File verified - Size: {humanbytes(file_stat.st_size)}")
+            file_stat = os.stat(temp_path)
+            print(f"[STEP 6] ✅ File verified - Size: {humanbytes(file_stat.st_size)}")
         
-        # Rename to final filename
-        if temp_path != renamed_file_path:
-            print(f"[STEP 6] Renaming file...")
+            # Rename to final filename
+            if temp_path != renamed_file_path:
+                print(f"[STEP 6] Renaming file...")
             
-            if os.path.exists(renamed_file_path):
-                os.remove(renamed_file_path)
+                if os.path.exists(renamed_file_path):
+                    os.remove(renamed_file_path)
             
-            shutil.move(temp_path, renamed_file_path)
-            path = renamed_file_path
-            print(f"[STEP 6] ✅ File renamed")
-        else:
-            path = temp_path
+                shutil.move(temp_path, renamed_file_path)
+                path = renamed_file_path
+                print(f"[STEP 6] ✅ File renamed")
+            else:
+                path = temp_path
         
-        print(f"[STEP 6] Final path: {path}")
+            print(f"[STEP 6] Final path: {path}")
         
-    except Exception as e:
-        print(f"[ERROR STEP 5/6] Download failed: {type(e).__name__}: {e}")
-        logging.error(f"Download error: {e}", exc_info=True)
-        if file_id in renaming_operations:
-            del renaming_operations[file_id]
-        return await download_msg.edit(f"**❌ Download Error:** `{e}`")
+        except Exception as e:
+            print(f"[ERROR STEP 5/6] Download failed: {type(e).__name__}: {e}")
+            logging.error(f"Download error: {e}", exc_info=True)
+            if file_id in renaming_operations:
+                del renaming_operations[file_id]
+            return await download_msg.edit(f"**❌ Download Error:** `{e}`")
     
-    # Add metadata
-    await download_msg.edit("🔄 Processing...")
+        # Add metadata
+        await download_msg.edit("🔄 Processing...")
     
-    metadata_added = False
-    _bool_metadata = await pp_bots.get_metadata(user_id)
+        metadata_added = False
+        _bool_metadata = settings.metadata
     
-    print(f"[STEP 7] Metadata enabled: {_bool_metadata}")
+        print(f"[STEP 7] Metadata enabled: {_bool_metadata}")
     
-    if _bool_metadata:
-        metadata = await pp_bots.get_metadata_code(user_id)
-        if metadata:
-            print(f"[STEP 7] Adding metadata: {metadata}")
+        if _bool_metadata:
+            metadata = settings.metadata_code
+            if metadata:
+                print(f"[STEP 7] Adding metadata: {metadata}")
             
-            metadata_escaped = metadata.replace('"', '\\"').replace("'", "\\'")
+                metadata_escaped = metadata.replace('"', '\\"').replace("'", "\\'")
             
-            cmd = f'ffmpeg -i "{renamed_file_path}" -map 0 -c:s copy -c:a copy -c:v copy -metadata title="{metadata_escaped}" -metadata author="{metadata_escaped}" -metadata:s:s title="{metadata_escaped}" -metadata:s:a title="{metadata_escaped}" -metadata:s:v title="{metadata_escaped}" "{metadata_file_path}"'
+                cmd = f'ffmpeg -i "{renamed_file_path}" -map 0 -c:s copy -c:a copy -c:v copy -metadata title="{metadata_escaped}" -metadata author="{metadata_escaped}" -metadata:s:s title="{metadata_escaped}" -metadata:s:a title="{metadata_escaped}" -metadata:s:v title="{metadata_escaped}" "{metadata_file_path}"'
             
-            print(f"[STEP 7] Running FFmpeg...")
+                print(f"[STEP 7] Running FFmpeg...")
             
-            try:
-                process = await asyncio.create_subprocess_shell(
-                    cmd,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
-                )
-                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=300)
+                try:
+                    process = await asyncio.create_subprocess_shell(
+                        cmd,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.PIPE
+                    )
+                    stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=300)
                 
-                print(f"[STEP 7] FFmpeg return code: {process.returncode}")
+                    print(f"[STEP 7] FFmpeg return code: {process.returncode}")
                 
-                if process.returncode == 0 and os.path.exists(metadata_file_path):
-                    metadata_added = True
-                    path = metadata_file_path
-                    print(f"[STEP 7] ✅ Metadata added")
-                else:
-                    print(f"[STEP 7] ❌ Metadata failed")
-            except asyncio.TimeoutError:
-                logging.warning("Metadata addition timed out")
-                print(f"[ERROR STEP 7] Timeout")
-            except Exception as e:
-                logging.error(f"Metadata error: {e}")
-                print(f"[ERROR STEP 7] {e}")
-    
-    if not metadata_added:
-        path = renamed_file_path
-        print(f"[STEP 7] No metadata added")
+                    if process.returncode == 0 and os.path.exists(metadata_file_path):
+                        metadata_added = True
+                        path = metadata_file_path
+                        print(f"[STEP 7] ✅ Metadata added")
+                    else:
+                        print(f"[STEP 7] ❌ Metadata failed")
+                except asyncio.TimeoutError:
+                    logging.warning("Metadata addition timed out")
+                    print(f"[ERROR STEP 7] Timeout")
+                except Exception as e:
+                    logging.error(f"Metadata error: {e}")
+                    print(f"[ERROR STEP 7] {e}")
+    
+        if not metadata_added:
+            path = renamed_file_path
+            print(f"[STEP 7] No metadata added")
     
-    # Upload
-    upload_msg = await download_msg.edit("📤 Uploading...")
+        # Upload
+        upload_msg = await download_msg.edit("📤 Uploading...")
     
-    try:
-        # Get caption
-        c_caption = await pp_bots.get_caption(user_id)
-        
-        # Get duration
-        duration = 0
-        if media_type == "video":
-            try:
-                metadata = extractMetadata(createParser(path))
-                if metadata and metadata.has("duration"):
-                    duration = metadata.get('duration').seconds
-                print(f"[STEP 9] Video duration: {duration}s")
-            except:
-                pass
-        
-        caption = c_caption.format(
-            filename=new_filename,
-            filesize=humanbytes(file_size),
-            duration=convert(duration)
-        ) if c_caption else f"**{new_filename}**"
-        
-        print(f"[STEP 10] Caption ready")
-        
-        # Get thumbnail
-        ph_path = None
-        c_thumb = await pp_bots.get_thumbnail(user_id)
+        try:
+            # Get caption
+            c_caption = settings.caption
+        
+            # Get duration
+            duration = 0
+            if media_type == "video":
+                try:
+                    metadata = extractMetadata(createParser(path))
+                    if metadata and metadata.has("duration"):
+                        duration = metadata.get('duration').seconds
+                    print(f"[STEP 9] Video duration: {duration}s")
+                except:
+                    pass
+        
+            caption = c_caption.format(
+                filename=new_filename,
+                filesize=humanbytes(file_size),
+                duration=convert(duration)
+            ) if c_caption else f"**{new_filename}**"
+        
+            print(f"[STEP 10] Caption ready")
+        
+            # Get thumbnail
+            ph_path = await prepare_thumbnail(client, settings, message, media_type)
+        
+            # ✅ CRITICAL: Smart client selection for upload
+            upload_to = upload_channel if upload_channel else message.chat.id
+        
+            # Use premium client for large files
+            if file_size > Config.MAX_FILE_SIZE_NON_PREMIUM:
+                if use_premium:
+                    upload_client = premium_client
+                    print(f"[STEP 12] Using PREMIUM client for upload (file > 2GB)")
+                else:
+                    raise Exception("File larger than 2GB but premium client not available")
+            else:
+                upload_client = client
+                print(f"[STEP 12] Using BOT client for upload (file <= 2GB)")
         
-        if c_thumb:
+            # Verify upload client is ready
             try:
-                print(f"[STEP 11] Downloading custom thumbnail...")
-                ph_path = await client.download_media(c_thumb)
-                print(f"[STEP 11] Custom thumbnail downloaded")
+                await upload_client.get_me()
+                print(f"[STEP 12] Upload client verified and ready")
             except Exception as e:
-                print(f"[STEP 11] Custom thumbnail failed: {e}")
-                ph_path = None
-        elif media_type == "video" and message.video and message.video.thumbs:
-            try:
-                print(f"[STEP 11] Downloading video thumbnail...")
-                ph_path = await client.download_media(message.video.thumbs[0].file_id)
-                print(f"[STEP 11] Video thumbnail downloaded")
-            except Exception as e:
-                print(f"[STEP 11] Video thumbnail failed: {e}")
-                ph_path = None
+                print(f"[STEP 12] Upload client verification failed: {e}")
+                if upload_client == premium_client and client:
+                    print(f"[STEP 12] Falling back to bot client")
+                    upload_client = client
+                else:
+                    raise Exception(f"Upload client not ready: {e}")
+        
+            final_media_type = media_preference or media_type
+        
+            print(f"[STEP 13] Uploading as {final_media_type}...")
+            print(f"[STEP 13] File size: {humanbytes(file_size)}")
+            print(f"[STEP 13] Upload to: {upload_to}")
+        
+            # Upload
+            if final_media_type == "document":
+                sent = await send_media_parallel(
+                    upload_client,
+                    "document",
+                    upload_to,
+                    path,
+                    thumb=ph_path,
+                    caption=caption,
+                    progress=progress_for_pyrogram,
+                    progress_args=("📤 Uploading...", upload_msg, time.time())
+                )
+            elif final_media_type == "video":
+                sent = await send_media_parallel(
+                    upload_client,
+                    "video",
+                    upload_to,
+                    path,
+                    caption=caption,
+                    thumb=ph_path,
+                    duration=duration,
+                    progress=progress_for_pyrogram,
+                    progress_args=("📤 Uploading...", upload_msg, time.time())
+                )
+            elif final_media_type == "audio":
+                sent = await send_media_parallel(
+                    upload_client,
+                    "audio",
+                    upload_to,
+                    path,
+                    caption=caption,
+                    thumb=ph_path,
+                    duration=duration,
+                    progress=progress_for_pyrogram,
+                    progress_args=("📤 Uploading...", upload_msg, time.time())
+                )
         
-        if ph_path:
-            try:
-                print(f"[STEP 11] Processing thumbnail...")
-                img = Image.open(ph_path).convert("RGB")
-                img = img.resize((320, 320))
-                img.save(ph_path, "JPEG")
-                print(f"[STEP 11] Thumbnail processed")
-            except Exception as e:
-                print(f"[STEP 11] Thumbnail processing failed: {e}")
-                clean_file(ph_path)
-                ph_path = None
-        else:
-            print(f"[STEP 11] No thumbnail available")
+            print(f"[STEP 14] ✅ Upload complete!")
         
-        # ✅ CRITICAL: Smart client selection for upload
-        upload_to = upload_channel if upload_channel else message.chat.id
+            # Confirmation
+            await confirm_upload(client, upload_msg, upload_channel, new_filename, file_size)
         
-        # Use premium client for large files
-        if file_size > Config.MAX_FILE_SIZE_NON_PREMIUM:
-            if use_premium:
-                upload_client = premium_client
-                print(f"[STEP 12] Using PREMIUM client for upload (file > 2GB)")
-            else:
-                raise Exception("File larger than 2GB but premium client not available")
-        else:
-            upload_client = client
-            print(f"[STEP 12] Using BOT client for upload (file <= 2GB)")
+            # Cleanup thumbnail
+            clean_file(ph_path)
         
-        # Verify upload client is ready
-        try:
-            await upload_client.get_me()
-            print(f"[STEP 12] Upload client verified and ready")
         except Exception as e:
-            print(f"[STEP 12] Upload client verification failed: {e}")
-            if upload_client == premium_client and client:
-                print(f"[STEP 12] Falling back to bot client")
-                upload_client = client
-            else:
-                raise Exception(f"Upload client not ready: {e}")
-        
-        final_media_type = media_preference or media_type
-        
-        print(f"[STEP 13] Uploading as {final_media_type}...")
-        print(f"[STEP 13] File size: {humanbytes(file_size)}")
-        print(f"[STEP 13] Upload to: {upload_to}")
-        
-        # Upload
-        if final_media_type == "document":
-            sent = await upload_client.send_document(
-                upload_to,
-                document=path,
-                thumb=ph_path,
-                caption=caption,
-                progress=progress_for_pyrogram,
-                progress_args=("📤 Uploading...", upload_msg, time.time())
-            )
-        elif final_media_type == "video":
-            sent = await upload_client.send_video(
-                upload_to,
-                video=path,
-                caption=caption,
-                thumb=ph_path,
-                duration=duration,
-                progress=progress_for_pyrogram,
-                progress_args=("📤 Uploading...", upload_msg, time.time())
-            )
-        elif final_media_type == "audio":
-            sent = await upload_client.send_audio(
-                upload_to,
-                audio=path,
-                caption=caption,
-                thumb=ph_path,
-                duration=duration,
-                progress=progress_for_pyrogram,
-                progress_args=("📤 Uploading...", upload_msg, time.time())
-            )
-        
-        print(f"[STEP 14] ✅ Upload complete!")
-        
-        # Confirmation
-        if upload_channel:
-            try:
-                channel_info = await client.get_chat(upload_channel)
-                await upload_msg.edit(
-                    f"**✅ Upload Complete!**\n\n"
-                    f"**Uploaded to:** {channel_info.title}\n"
-                    f"**File:** {new_filename}\n"
-                    f"**Size:** {humanbytes(file_size)}"
-                )
-            except:
-                await upload_msg.edit("**✅ Upload Complete!**")
-        else:
-            await upload_msg.delete()
-        
-        # Cleanup thumbnail
-        clean_file(ph_path)
-        
-    except Exception as e:
-        await upload_msg.edit(f"**❌ Upload Error:** `{e}`")
-        logging.error(f"Upload error: {e}", exc_info=True)
-        print(f"[ERROR STEP 12-15] {e}")
-    
+            await upload_msg.edit(f"**❌ Upload Error:** `{e}`")
+            logging.error(f"Upload error: {e}", exc_info=True)
+            print(f"[ERROR STEP 12-15] {e}")
+    
+        finally:
+            # Cleanup
+            print(f"[CLEANUP] Cleaning up...")
+            clean_file(renamed_file_path)
+            clean_file(metadata_file_path)
+            if file_id in renaming_operations:
+                del renaming_operations[file_id]
+        
+            print(f"[RENAME MODE] Completed")
+            print(f"{'='*60}\n")
     finally:
-        # Cleanup
-        print(f"[CLEANUP] Cleaning up...")
-        clean_file(renamed_file_path)
-        clean_file(metadata_file_path)
-        if file_id in renaming_operations:
-            del renaming_operations[file_id]
-        
-        print(f"[RENAME MODE] Completed")
-        print(f"{'='*60}\n")
+        # Also reached when a status edit raises or the job is cancelled
+        renaming_operations.pop(file_id, None)
+        scheduler.release(job)
@@ -3,10 +3,16 @@ from pyrogram import Client, filters
 from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, CallbackQuery
 from pyrogram.errors import UserNotParticipant, UsernameNotOccupied, PeerIdInvalid, ChannelPrivate
 from config import Config
+from helper.cache import TTLCache
+import asyncio
 import logging
 
 FORCE_SUB_CHANNELS = Config.FORCE_SUB_CHANNELS
 
+# (user_id, channel) -> True joined / False not joined / None channel can't be checked
+membership_cache = TTLCache(maxsize=Config.FSUB_CACHE_SIZE, ttl=Config.FSUB_CACHE_TTL)
+_MISSING = object()
+
 # Check if force sub is actually enabled
 FORCE_SUB_ENABLED = False
 if FORCE_SUB_CHANNELS:
@@ -28,6 +34,45 @@ EXEMPT_COMMANDS = [
     'settings', 'restart'
 ]
 
+async def check_channel_membership(client, channel, user_id, use_cache=True):
+    """Check one channel, caching joined users for longer than non-members"""
+    key = (user_id, channel)
+    if use_cache:
+        cached = membership_cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+    
+    try:
+        user = await client.get_chat_member(channel, user_id)
+        joined = user.status not in {"kicked", "left"}
+        if not joined:
+            logging.info(f"[Force Sub] User {user_id} not subscribed to {channel}")
+    except UserNotParticipant:
+        logging.info(f"[Force Sub] User {user_id} not participant in {channel}")
+        joined = False
+    except (UsernameNotOccupied, PeerIdInvalid, ChannelPrivate) as e:
+        logging.warning(f"[Force Sub] Invalid channel '{channel}': {e}")
+        logging.warning(f"[Force Sub] Bot will work without this channel")
+        joined = None
+    except Exception as e:
+        logging.error(f"[Force Sub] Error checking channel '{channel}': {e}")
+        # Don't block user if there's an error, and retry next time
+        return None
+    
+    ttl = Config.FSUB_NEGATIVE_TTL if joined is False else Config.FSUB_CACHE_TTL
+    membership_cache.set(key, joined, ttl)
+    return joined
+
+
+async def get_not_joined_channels(client, user_id, use_cache=True):
+    """Return the channels the user still has to join, checking all of them concurrently"""
+    results = await asyncio.gather(*(
+        check_channel_membership(client, channel, user_id, use_cache)
+        for channel in FORCE_SUB_CHANNELS
+    ))
+    return [channel for channel, joined in zip(FORCE_SUB_CHANNELS, results) if joined is False]
+
+
 async def not_subscribed(_, client, message):
     """Check if user is subscribed to all required channels"""
     
@@ -46,26 +91,9 @@ async def not_subscribed(_, client, message):
     if hasattr(message, 'data'):
         return False
     
-    # Check each channel
-    for channel in FORCE_SUB_CHANNELS:
-        try:
-            user = await client.get_chat_member(channel, message.from_user.id)
-            if user.status in {"kicked", "left"}:
-                logging.info(f"[Force Sub] User {message.from_user.id} not subscribed to {channel}")
-                return True
-        except UserNotParticipant:
-            logging.info(f"[Force Sub] User {message.from_user.id} not participant in {channel}")
-            return True
-        except (UsernameNotOccupied, PeerIdInvalid, ChannelPrivate) as e:
-            logging.warning(f"[Force Sub] Invalid channel '{channel}': {e}")
-            logging.warning(f"[Force Sub] Bot will work without this channel")
-            continue
-        except Exception as e:
-            logging.error(f"[Force Sub] Error checking channel '{channel}': {e}")
-            # Don't block user if there's an error
-            continue
-    
-    return False
+    # Check all channels (cached per user)
+    not_joined_channels = await get_not_joined_channels(client, message.from_user.id)
+    return bool(not_joined_channels)
 
 
 # Only register force sub handler if enabled
@@ -73,21 +101,8 @@ if FORCE_SUB_ENABLED:
     @Client.on_message(filters.private & filters.create(not_subscribed), group=-1)
     async def forces_sub(client, message):
         """Send force subscription message"""
-        not_joined_channels = []
-        
-        for channel in FORCE_SUB_CHANNELS:
-            try:
-                user = await client.get_chat_member(channel, message.from_user.id)
-                if user.status in {"kicked", "left"}:
-                    not_joined_channels.append(channel)
-            except UserNotParticipant:
-                not_joined_channels.append(channel)
-            except (UsernameNotOccupied, PeerIdInvalid, ChannelPrivate) as e:
-                logging.warning(f"[Force Sub] Invalid channel '{channel}': {e}")
-                continue
-            except Exception as e:
-                logging.error(f"[Force Sub] Error checking channel '{channel}': {e}")
-                continue
+        # Served from the cache the filter just filled
+        not_joined_channels = await get_not_joined_channels(client, message.from_user.id)
         
         # If no valid channels to join, skip force sub
         if not not_joined_channels:
@@ -151,19 +166,8 @@ if FORCE_SUB_ENABLED:
     async def check_subscription(client, callback_query: CallbackQuery):
         """Check if user has joined all channels"""
         user_id = callback_query.from_user.id
-        not_joined_channels = []
-        
-        for channel in FORCE_SUB_CHANNELS:
-            try:
-                user = await client.get_chat_member(channel, user_id)
-                if user.status in {"kicked", "left"}:
-                    not_joined_channels.append(channel)
-            except UserNotParticipant:
-                not_joined_channels.append(channel)
-            except (UsernameNotOccupied, PeerIdInvalid, ChannelPrivate):
-                continue
-            except Exception:
-                continue
+        # User says they just joined, so skip any cached "not joined" answer
+        not_joined_channels = await get_not_joined_channels(client, user_id, use_cache=False)
         
         if not not_joined_channels:
             try:
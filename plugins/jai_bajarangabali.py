@@ -5,6 +5,8 @@ from helper.utils import (
     progress_for_pyrogram, humanbytes, convert, 
     sanitize_filename, download_thumbnail, clean_file
 )
+from helper.tg_download import download_media_parallel
+from helper.tg_upload import send_media_parallel
 from hachoir.metadata import extractMetadata
 from hachoir.parser import createParser
 from bot import app  # Premium client
@@ -100,11 +102,13 @@ async def handle_jai_bajarangabali(client, message: Message):
         
         # Download file
         try:
-            await upload_client.download_media(
-                message=message,
-                file_name=file_path,
+            await download_media_parallel(
+                upload_client,
+                message,
+                file_path,
                 progress=progress_for_pyrogram,
-                progress_args=("📥 Downloading...", ms, time.time())
+                progress_args=("📥 Downloading...", ms, time.time()),
+                extra_clients=(client,)
             )
         except Exception as e:
             await ms.edit(f"❌ **Download Failed!**\n\n`{str(e)}`")
@@ -130,7 +134,7 @@ async def handle_jai_bajarangabali(client, message: Message):
         ph_path = None
         try:
             await ms.edit("🎨 Preparing thumbnail...")
-            if download_thumbnail(Config.JAI_BAJARANGABALI_THUMB, thumb_path):
+            if await download_thumbnail(Config.JAI_BAJARANGABALI_THUMB, thumb_path):
                 ph_path = thumb_path
         except Exception as e:
             logging.error(f"Thumbnail error: {e}")
@@ -149,9 +153,11 @@ async def handle_jai_bajarangabali(client, message: Message):
         await ms.edit("📤 Uploading to channel...")
         
         try:
-            await upload_client.send_video(
+            await send_media_parallel(
+                upload_client,
+                "video",
                 Config.JAI_BAJARANGABALI_CHANNEL,
-                video=file_path,
+                file_path,
                 caption=caption,
                 thumb=ph_path,
                 duration=duration,
@@ -2,6 +2,10 @@ from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from helper.database import pp_bots
 from helper.utils import progress_for_pyrogram, humanbytes, clean_file
+from helper.scheduler import scheduler
+from helper.jobs import job_handler, submit_job
+from helper.tg_download import download_media_parallel
+from helper.tg_upload import send_media_parallel
 from config import Config
 from bot import app
 import os
@@ -25,8 +29,7 @@ async def handle_merge_mode_media(client, message, file, filename, file_size, me
         'message_id': message.id
     }
     
-    await pp_bots.add_to_merge_queue(user_id, file_info)
-    queue = await pp_bots.get_merge_queue(user_id)
+    queue = await pp_bots.add_to_merge_queue(user_id, file_info)
     
     # Count different types
     videos = sum(1 for f in queue if f['type'] == 'video' or f['type'] == 'document')
@@ -42,7 +45,10 @@ async def handle_merge_mode_media(client, message, file, filename, file_size, me
     
     keyboard = InlineKeyboardMarkup([
         [InlineKeyboardButton("✅ Done - Merge Now", callback_data="merge_now")],
-        [InlineKeyboardButton("🗑️ Clear Queue", callback_data="clear_merge_queue")],
+        [
+            InlineKeyboardButton("↩️ Remove Last", callback_data="merge_undo_last"),
+            InlineKeyboardButton("🗑️ Clear Queue", callback_data="clear_merge_queue")
+        ],
         [InlineKeyboardButton("❌ Cancel", callback_data="close")]
     ])
     
@@ -76,6 +82,22 @@ async def merge_now_callback(client, query: CallbackQuery):
         "**🔗 Analyzing files...**\n\n"
         "Determining merge type..."
     )
+    # The job works on this snapshot, so later queue edits don't affect it
+    source = await client.get_messages(query.message.chat.id, queue[0]['message_id'])
+    if not source or source.empty:
+        return await query.message.edit_text(
+            "**❌ The first queued file was deleted!**\n\n"
+            "Remove it with /mergeremove 1 and try again."
+        )
+    await submit_job(client, "merge", source, query.message, {'queue': queue})
+
+
+@job_handler("merge")
+async def merge_job(client, message, status_msg, params):
+    """Download, merge and upload the files queued when Merge Now was pressed"""
+    user_id = message.from_user.id
+    queue = params['queue']
+    job = await scheduler.acquire("encode", user_id, status_msg)
     
     try:
         downloads_dir = "downloads"
@@ -88,22 +110,24 @@ async def merge_now_callback(client, query: CallbackQuery):
         
         # Download all files
         for idx, file_info in enumerate(queue):
-            await query.message.edit_text(
+            await status_msg.edit_text(
                 f"**📥 Downloading file {idx+1}/{len(queue)}...**\n\n"
                 f"`{file_info['filename']}`"
             )
             
             try:
-                file_msg = await client.get_messages(query.message.chat.id, file_info['message_id'])
+                file_msg = await client.get_messages(status_msg.chat.id, file_info['message_id'])
                 file_path = os.path.join(downloads_dir, f"merge_{idx}_{file_info['filename']}")
                 
                 upload_client = app if (app and Config.STRING_SESSION) else client
                 
-                await upload_client.download_media(
+                await download_media_parallel(
+                    upload_client,
                     file_msg,
-                    file_name=file_path,
+                    file_path,
                     progress=progress_for_pyrogram,
-                    progress_args=(f"📥 File {idx+1}/{len(queue)}", query.message, time.time())
+                    progress_args=(f"📥 File {idx+1}/{len(queue)}", status_msg, time.time()),
+                    extra_clients=(client,)
                 )
                 
                 # Categorize by type
@@ -121,25 +145,25 @@ async def merge_now_callback(client, query: CallbackQuery):
                 continue
         
         if not video_files and not audio_files:
-            await query.message.edit_text("**❌ No valid video or audio files found!**")
+            await status_msg.edit_text("**❌ No valid video or audio files found!**")
             return
         
         # Determine merge type and execute
         if len(video_files) > 1 and not audio_files and not subtitle_files:
             # Multiple videos - Concatenate
-            result_path = await merge_multiple_videos(query, video_files, downloads_dir)
+            result_path = await merge_multiple_videos(status_msg, video_files, downloads_dir)
         elif len(video_files) == 1 and audio_files and not subtitle_files:
             # Video + Audio(s)
-            result_path = await merge_video_with_audio(query, video_files[0], audio_files, downloads_dir)
+            result_path = await merge_video_with_audio(status_msg, video_files[0], audio_files, downloads_dir)
         elif len(video_files) == 1 and subtitle_files and not audio_files:
             # Video + Subtitle(s)
-            result_path = await merge_video_with_subtitles(query, video_files[0], subtitle_files, downloads_dir)
+            result_path = await merge_video_with_subtitles(status_msg, video_files[0], subtitle_files, downloads_dir)
         elif len(video_files) == 1 and audio_files and subtitle_files:
             # Video + Audio + Subtitles (All in one)
-            result_path = await merge_video_audio_subtitles(query, video_files[0], audio_files, subtitle_files, downloads_dir)
+            result_path = await merge_video_audio_subtitles(status_msg, video_files[0], audio_files, subtitle_files, downloads_dir)
         else:
             # Complex merge with multiple videos and other files
-            await query.message.edit_text(
+            await status_msg.edit_text(
                 "**❌ Unsupported merge combination!**\n\n"
                 "**Supported:**\n"
                 "• Multiple videos only\n"
@@ -150,7 +174,7 @@ async def merge_now_callback(client, query: CallbackQuery):
             return
         
         if result_path and os.path.exists(result_path):
-            await upload_merged_file(client, query, result_path, user_id, len(queue))
+            await upload_merged_file(client, status_msg, result_path, user_id, len(queue))
             clean_file(result_path)
         
         # Cleanup all downloaded files
@@ -158,13 +182,15 @@ async def merge_now_callback(client, query: CallbackQuery):
             clean_file(path)
         
     except Exception as e:
-        await query.message.edit_text(f"**❌ Error:** `{e}`")
+        await status_msg.edit_text(f"**❌ Error:** `{e}`")
         logging.error(f"Merge error: {e}")
+    finally:
+        scheduler.release(job)
 
 
-async def merge_multiple_videos(query, video_files, downloads_dir):
+async def merge_multiple_videos(status_msg, video_files, downloads_dir):
     """Merge multiple video files into one"""
-    await query.message.edit_text(
+    await status_msg.edit_text(
         f"**🔗 Merging {len(video_files)} videos...**\n\n"
         "Please wait..."
     )
@@ -189,7 +215,7 @@ async def merge_multiple_videos(query, video_files, downloads_dir):
     
     # If fails, try filter_complex
     if process.returncode != 0 or not os.path.exists(output_path):
-        await query.message.edit_text("**🔗 Re-encoding and merging...**")
+        await status_msg.edit_text("**🔗 Re-encoding and merging...**")
         
         inputs = " ".join([f'-i "{path}"' for path in video_files])
         filters = "".join([f"[{i}:v][{i}:a]" for i in range(len(video_files))])
@@ -210,13 +236,13 @@ async def merge_multiple_videos(query, video_files, downloads_dir):
         return output_path
     else:
         error_msg = stderr.decode()[:200] if stderr else "Unknown error"
-        await query.message.edit_text(f"**❌ Merge failed!**\n\n`{error_msg}`")
+        await status_msg.edit_text(f"**❌ Merge failed!**\n\n`{error_msg}`")
         return None
 
 
-async def merge_video_with_audio(query, video_path, audio_files, downloads_dir):
+async def merge_video_with_audio(status_msg, video_path, audio_files, downloads_dir):
     """Merge video with audio tracks"""
-    await query.message.edit_text(
+    await status_msg.edit_text(
         "**🎵 Adding audio to video...**\n\n"
         "Please wait..."
     )
@@ -246,13 +272,13 @@ async def merge_video_with_audio(query, video_path, audio_files, downloads_dir):
         return output_path
     else:
         error_msg = stderr.decode()[:200] if stderr else "Unknown error"
-        await query.message.edit_text(f"**❌ Audio merge failed!**\n\n`{error_msg}`")
+        await status_msg.edit_text(f"**❌ Audio merge failed!**\n\n`{error_msg}`")
         return None
 
 
-async def merge_video_with_subtitles(query, video_path, subtitle_files, downloads_dir):
+async def merge_video_with_subtitles(status_msg, video_path, subtitle_files, downloads_dir):
     """Merge video with subtitle tracks"""
-    await query.message.edit_text(
+    await status_msg.edit_text(
         "**📝 Adding subtitles to video...**\n\n"
         "Please wait..."
     )
@@ -282,13 +308,13 @@ async def merge_video_with_subtitles(query, video_path, subtitle_files, download
         return output_path
     else:
         error_msg = stderr.decode()[:200] if stderr else "Unknown error"
-        await query.message.edit_text(f"**❌ Subtitle merge failed!**\n\n`{error_msg}`")
+        await status_msg.edit_text(f"**❌ Subtitle merge failed!**\n\n`{error_msg}`")
         return None
 
 
-async def merge_video_audio_subtitles(query, video_path, audio_files, subtitle_files, downloads_dir):
+async def merge_video_audio_subtitles(status_msg, video_path, audio_files, subtitle_files, downloads_dir):
     """Merge video with audio and subtitle tracks"""
-    await query.message.edit_text(
+    await status_msg.edit_text(
         "**🎬 Combining video, audio & subtitles...**\n\n"
         "Please wait..."
     )
@@ -326,16 +352,18 @@ async def merge_video_audio_subtitles(query, video_path, audio_files, subtitle_f
         return output_path
     else:
         error_msg = stderr.decode()[:200] if stderr else "Unknown error"
-        await query.message.edit_text(f"**❌ Complete merge failed!**\n\n`{error_msg}`")
+        await status_msg.edit_text(f"**❌ Complete merge failed!**\n\n`{error_msg}`")
         return None
 
 
-async def upload_merged_file(client, query, file_path, user_id, total_files):
+async def upload_merged_file(client, status_msg, file_path, user_id, total_files):
     """Upload the merged file"""
-    await query.message.edit_text("**📤 Uploading merged file...**")
+    await status_msg.edit_text("**📤 Uploading merged file...**")
+    
+    settings = await pp_bots.get_user_settings(user_id)
     
     # Get caption
-    c_caption = await pp_bots.get_caption(user_id)
+    c_caption = settings.caption
     caption = c_caption.format(
         filename=os.path.basename(file_path),
         filesize=humanbytes(os.path.getsize(file_path)),
@@ -349,26 +377,28 @@ async def upload_merged_file(client, query, file_path, user_id, total_files):
     
     # Get thumbnail
     ph_path = None
-    c_thumb = await pp_bots.get_thumbnail(user_id)
+    c_thumb = settings.thumbnail
     if c_thumb:
         ph_path = await client.download_media(c_thumb)
     
     # Check channel
-    upload_channel = await pp_bots.get_upload_channel(user_id)
-    upload_to = upload_channel if upload_channel else query.message.chat.id
+    upload_channel = settings.upload_channel
+    upload_to = upload_channel if upload_channel else status_msg.chat.id
     
     upload_client = app if (app and Config.STRING_SESSION) else client
     
-    await upload_client.send_video(
+    await send_media_parallel(
+        upload_client,
+        "video",
         upload_to,
-        video=file_path,
+        file_path,
         caption=caption,
         thumb=ph_path,
         progress=progress_for_pyrogram,
-        progress_args=("📤 Uploading...", query.message, time.time())
+        progress_args=("📤 Uploading...", status_msg, time.time())
     )
     
-    await query.message.edit_text(
+    await status_msg.edit_text(
         f"**✅ Merge complete!**\n\n"
         f"**Merged {total_files} files successfully!**"
     )
@@ -391,6 +421,14 @@ async def clear_merge_callback(client, query: CallbackQuery):
     )
 
 
+@Client.on_callback_query(filters.regex("^merge_undo_last$"))
+async def merge_undo_last_callback(client, query: CallbackQuery):
+    """Remove the most recently added file from the merge queue"""
+    user_id = query.from_user.id
+    queue = await pp_bots.pop_merge_queue(user_id)
+    await query.answer(f"✅ Removed! {len(queue)} file(s) left in queue", show_alert=True)
+
+
 # ==================== COMMAND HANDLER ====================
 
 @Client.on_message(filters.private & filters.command("merge"))
@@ -433,3 +471,48 @@ async def merge_command(client, message):
                 [InlineKeyboardButton("🔗 Enable Merge Mode", callback_data="mode_merge")]
             ])
         )
+
+
+@Client.on_message(filters.private & filters.command("mergeremove"))
+async def merge_remove_command(client, message):
+    """Remove a file from the merge queue by its position"""
+    user_id = message.from_user.id
+    parts = message.text.split()
+    
+    if len(parts) != 2 or not parts[1].isdigit():
+        return await message.reply_text(
+            "**Usage:** <code>/mergeremove 2</code>\n\n"
+            "Removes file #2 from your merge queue. Use /merge to see positions."
+        )
+    
+    queue = await pp_bots.get_merge_queue(user_id)
+    index = int(parts[1]) - 1
+    if not 0 <= index < len(queue):
+        return await message.reply_text(f"**❌ Invalid position!** Queue has {len(queue)} file(s).")
+    
+    removed = queue[index]
+    queue = await pp_bots.remove_from_merge_queue(user_id, removed)
+    await message.reply_text(
+        f"**✅ Removed from queue:** `{removed['filename']}`\n\n"
+        f"**Files left:** {len(queue)}"
+    )
+
+
+@Client.on_message(filters.private & filters.command("mergemove"))
+async def merge_move_command(client, message):
+    """Reorder the merge queue"""
+    user_id = message.from_user.id
+    parts = message.text.split()
+    
+    if len(parts) != 3 or not (parts[1].isdigit() and parts[2].isdigit()):
+        return await message.reply_text(
+            "**Usage:** <code>/mergemove 3 1</code>\n\n"
+            "Moves file #3 to position #1. Use /merge to see positions."
+        )
+    
+    queue = await pp_bots.move_in_merge_queue(user_id, int(parts[1]) - 1, int(parts[2]) - 1)
+    files_list = "\n".join([f"{idx+1}. `{f['filename']}`" for idx, f in enumerate(queue)])
+    await message.reply_text(
+        f"**🔗 MERGE QUEUE**\n\n"
+        f"**Queue:**\n{files_list or 'Empty'}"
+    )
@@ -2,11 +2,13 @@ from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from helper.database import pp_bots
 from helper.utils import progress_for_pyrogram, humanbytes, clean_file
+from helper.scheduler import scheduler
+from helper.jobs import job_handler, submit_job
+from helper.tg_stream import run_ffmpeg_on_media
 from config import Config
 from bot import app
 import os
 import time
-import asyncio
 import logging
 
 
@@ -42,14 +44,22 @@ async def handle_remove_streams_mode(client, message, file, filename, file_size)
 @Client.on_callback_query(filters.regex("^remove_all_audio_"))
 async def remove_all_audio_callback(client, query: CallbackQuery):
     """Remove all audio streams from video"""
-    file_id = query.data.split("_")[-1]
-    user_id = query.from_user.id
+    file_msg = query.message.reply_to_message
+    if not file_msg:
+        return await query.message.edit_text("**❌ Original file not found!**")
     
     await query.message.edit_text("**🔇 Removing audio streams...**")
+    # Runs here, or on a worker node when RUN_MODE=frontend
+    await submit_job(client, "remove_audio", file_msg, query.message)
+
+
+@job_handler("remove_audio")
+async def remove_all_audio_job(client, file_msg, status_msg, params):
+    """Remove all audio streams from video"""
+    user_id = file_msg.from_user.id
     
+    job = None
     try:
-        file_msg = query.message.reply_to_message
-        
         if file_msg.video:
             file = file_msg.video
             filename = file.file_name or "video.mp4"
@@ -57,43 +67,35 @@ async def remove_all_audio_callback(client, query: CallbackQuery):
             file = file_msg.document
             filename = file.file_name
         else:
-            return await query.message.edit_text("**❌ Invalid file type!**")
+            return await status_msg.edit_text("**❌ Invalid file type!**")
         
         downloads_dir = "downloads"
         os.makedirs(downloads_dir, exist_ok=True)
         
-        video_path = os.path.join(downloads_dir, filename)
         output_name = f"{os.path.splitext(filename)[0]}_no_audio.mp4"
         output_path = os.path.join(downloads_dir, output_name)
         
-        await query.message.edit_text("**📥 Downloading video...**")
+        job = await scheduler.acquire("rename", user_id, status_msg)
         
         upload_client = app if (app and Config.STRING_SESSION) else client
         
-        await upload_client.download_media(
-            file_msg,
-            file_name=video_path,
-            progress=progress_for_pyrogram,
-            progress_args=("📥 Downloading...", query.message, time.time())
-        )
-        
-        # Remove audio using FFmpeg (-an = no audio)
-        await query.message.edit_text("**🔇 Removing audio...**")
-        
-        cmd = f'ffmpeg -i "{video_path}" -c:v copy -an "{output_path}"'
+        # Remove audio using FFmpeg (-an = no audio), fed straight from Telegram (no full download first)
+        await status_msg.edit_text("**🔇 Removing audio...**")
         
-        process = await asyncio.create_subprocess_shell(
-            cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+        returncode, stderr = await run_ffmpeg_on_media(
+            upload_client, file_msg, file.file_size, filename,
+            ["-c:v", "copy", "-an", output_path],
+            progress=progress_for_pyrogram,
+            progress_args=("📥 Streaming & processing...", status_msg, time.time())
         )
-        stdout, stderr = await process.communicate()
         
-        if process.returncode == 0 and os.path.exists(output_path):
-            await query.message.edit_text("**📤 Uploading video...**")
+        if returncode == 0 and os.path.exists(output_path):
+            await status_msg.edit_text("**📤 Uploading video...**")
+            
+            settings = await pp_bots.get_user_settings(user_id)
             
             # Get caption
-            c_caption = await pp_bots.get_caption(user_id)
+            c_caption = settings.caption
             caption = c_caption.format(
                 filename=output_name,
                 filesize=humanbytes(os.path.getsize(output_path)),
@@ -107,13 +109,13 @@ async def remove_all_audio_callback(client, query: CallbackQuery):
             
             # Get thumbnail
             ph_path = None
-            c_thumb = await pp_bots.get_thumbnail(user_id)
+            c_thumb = settings.thumbnail
             if c_thumb:
                 ph_path = await client.download_media(c_thumb)
             
             # Check channel
-            upload_channel = await pp_bots.get_upload_channel(user_id)
-            upload_to = upload_channel if upload_channel else query.message.chat.id
+            upload_channel = settings.upload_channel
+            upload_to = upload_channel if upload_channel else status_msg.chat.id
             
             await upload_client.send_video(
                 upload_to,
@@ -121,36 +123,45 @@ async def remove_all_audio_callback(client, query: CallbackQuery):
                 caption=caption,
                 thumb=ph_path,
                 progress=progress_for_pyrogram,
-                progress_args=("📤 Uploading...", query.message, time.time())
+                progress_args=("📤 Uploading...", status_msg, time.time())
             )
             
-            await query.message.edit_text("**✅ Audio removed successfully!**")
+            await status_msg.edit_text("**✅ Audio removed successfully!**")
             
             clean_file(ph_path)
         else:
             error_msg = stderr.decode()[:200] if stderr else "Unknown error"
-            await query.message.edit_text(f"**❌ Failed to remove audio!**\n\n`{error_msg}`")
+            await status_msg.edit_text(f"**❌ Failed to remove audio!**\n\n`{error_msg}`")
         
         # Cleanup
-        clean_file(video_path)
         clean_file(output_path)
         
     except Exception as e:
-        await query.message.edit_text(f"**❌ Error:** `{e}`")
+        await status_msg.edit_text(f"**❌ Error:** `{e}`")
         logging.error(f"Remove audio error: {e}")
+    finally:
+        scheduler.release(job)
 
 
 @Client.on_callback_query(filters.regex("^remove_all_subs_"))
 async def remove_all_subs_callback(client, query: CallbackQuery):
     """Remove all subtitle streams from video"""
-    file_id = query.data.split("_")[-1]
-    user_id = query.from_user.id
+    file_msg = query.message.reply_to_message
+    if not file_msg:
+        return await query.message.edit_text("**❌ Original file not found!**")
     
     await query.message.edit_text("**📝 Removing subtitle streams...**")
+    # Runs here, or on a worker node when RUN_MODE=frontend
+    await submit_job(client, "remove_subs", file_msg, query.message)
+
+
+@job_handler("remove_subs")
+async def remove_all_subs_job(client, file_msg, status_msg, params):
+    """Remove all subtitle streams from video"""
+    user_id = file_msg.from_user.id
     
+    job = None
     try:
-        file_msg = query.message.reply_to_message
-        
         if file_msg.video:
             file = file_msg.video
             filename = file.file_name or "video.mp4"
@@ -158,43 +169,35 @@ async def remove_all_subs_callback(client, query: CallbackQuery):
             file = file_msg.document
             filename = file.file_name
         else:
-            return await query.message.edit_text("**❌ Invalid file type!**")
+            return await status_msg.edit_text("**❌ Invalid file type!**")
         
         downloads_dir = "downloads"
         os.makedirs(downloads_dir, exist_ok=True)
         
-        video_path = os.path.join(downloads_dir, filename)
         output_name = f"{os.path.splitext(filename)[0]}_no_subs.mp4"
         output_path = os.path.join(downloads_dir, output_name)
         
-        await query.message.edit_text("**📥 Downloading video...**")
+        job = await scheduler.acquire("rename", user_id, status_msg)
         
         upload_client = app if (app and Config.STRING_SESSION) else client
         
-        await upload_client.download_media(
-            file_msg,
-            file_name=video_path,
-            progress=progress_for_pyrogram,
-            progress_args=("📥 Downloading...", query.message, time.time())
-        )
-        
-        # Remove subtitles using FFmpeg (-sn = no subtitles)
-        await query.message.edit_text("**📝 Removing subtitles...**")
+        # Remove subtitles using FFmpeg (-sn = no subtitles), fed straight from Telegram (no full download first)
+        await status_msg.edit_text("**📝 Removing subtitles...**")
         
-        cmd = f'ffmpeg -i "{video_path}" -c:v copy -c:a copy -sn "{output_path}"'
-        
-        process = await asyncio.create_subprocess_shell(
-            cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+        returncode, stderr = await run_ffmpeg_on_media(
+            upload_client, file_msg, file.file_size, filename,
+            ["-c:v", "copy", "-c:a", "copy", "-sn", output_path],
+            progress=progress_for_pyrogram,
+            progress_args=("📥 Streaming & processing...", status_msg, time.time())
         )
-        stdout, stderr = await process.communicate()
         
-        if process.returncode == 0 and os.path.exists(output_path):
-            await query.message.edit_text("**📤 Uploading video...**")
+        if returncode == 0 and os.path.exists(output_path):
+            await status_msg.edit_text("**📤 Uploading video...**")
+            
+            settings = await pp_bots.get_user_settings(user_id)
             
             # Get caption
-            c_caption = await pp_bots.get_caption(user_id)
+            c_caption = settings.caption
             caption = c_caption.format(
                 filename=output_name,
                 filesize=humanbytes(os.path.getsize(output_path)),
@@ -208,13 +211,13 @@ async def remove_all_subs_callback(client, query: CallbackQuery):
             
             # Get thumbnail
             ph_path = None
-            c_thumb = await pp_bots.get_thumbnail(user_id)
+            c_thumb = settings.thumbnail
             if c_thumb:
                 ph_path = await client.download_media(c_thumb)
             
             # Check channel
-            upload_channel = await pp_bots.get_upload_channel(user_id)
-            upload_to = upload_channel if upload_channel else query.message.chat.id
+            upload_channel = settings.upload_channel
+            upload_to = upload_channel if upload_channel else status_msg.chat.id
             
             await upload_client.send_video(
                 upload_to,
@@ -222,36 +225,45 @@ async def remove_all_subs_callback(client, query: CallbackQuery):
                 caption=caption,
                 thumb=ph_path,
                 progress=progress_for_pyrogram,
-                progress_args=("📤 Uploading...", query.message, time.time())
+                progress_args=("📤 Uploading...", status_msg, time.time())
             )
             
-            await query.message.edit_text("**✅ Subtitles removed successfully!**")
+            await status_msg.edit_text("**✅ Subtitles removed successfully!**")
             
             clean_file(ph_path)
         else:
             error_msg = stderr.decode()[:200] if stderr else "Unknown error"
-            await query.message.edit_text(f"**❌ Failed to remove subtitles!**\n\n`{error_msg}`")
+            await status_msg.edit_text(f"**❌ Failed to remove subtitles!**\n\n`{error_msg}`")
         
         # Cleanup
-        clean_file(video_path)
         clean_file(output_path)
         
     except Exception as e:
-        await query.message.edit_text(f"**❌ Error:** `{e}`")
+        await status_msg.edit_text(f"**❌ Error:** `{e}`")
         logging.error(f"Remove subtitles error: {e}")
+    finally:
+        scheduler.release(job)
 
 
 @Client.on_callback_query(filters.regex("^remove_both_"))
 async def remove_both_callback(client, query: CallbackQuery):
     """Remove both audio and subtitle streams (video only)"""
-    file_id = query.data.split("_")[-1]
-    user_id = query.from_user.id
+    file_msg = query.message.reply_to_message
+    if not file_msg:
+        return await query.message.edit_text("**❌ Original file not found!**")
     
     await query.message.edit_text("**🔇📝 Removing audio and subtitles...**")
+    # Runs here, or on a worker node when RUN_MODE=frontend
+    await submit_job(client, "remove_both", file_msg, query.message)
+
+
+@job_handler("remove_both")
+async def remove_both_job(client, file_msg, status_msg, params):
+    """Remove both audio and subtitle streams (video only)"""
+    user_id = file_msg.from_user.id
     
+    job = None
     try:
-        file_msg = query.message.reply_to_message
-        
         if file_msg.video:
             file = file_msg.video
             filename = file.file_name or "video.mp4"
@@ -259,43 +271,35 @@ async def remove_both_callback(client, query: CallbackQuery):
             file = file_msg.document
             filename = file.file_name
         else:
-            return await query.message.edit_text("**❌ Invalid file type!**")
+            return await status_msg.edit_text("**❌ Invalid file type!**")
         
         downloads_dir = "downloads"
         os.makedirs(downloads_dir, exist_ok=True)
         
-        video_path = os.path.join(downloads_dir, filename)
         output_name = f"{os.path.splitext(filename)[0]}_video_only.mp4"
         output_path = os.path.join(downloads_dir, output_name)
         
-        await query.message.edit_text("**📥 Downloading video...**")
+        job = await scheduler.acquire("rename", user_id, status_msg)
         
         upload_client = app if (app and Config.STRING_SESSION) else client
         
-        await upload_client.download_media(
-            file_msg,
-            file_name=video_path,
-            progress=progress_for_pyrogram,
-            progress_args=("📥 Downloading...", query.message, time.time())
-        )
-        
-        # Remove both audio and subtitles using FFmpeg
-        await query.message.edit_text("**🔇📝 Removing audio and subtitles...**")
+        # Remove both audio and subtitles using FFmpeg, fed straight from Telegram (no full download first)
+        await status_msg.edit_text("**🔇📝 Removing audio and subtitles...**")
         
-        cmd = f'ffmpeg -i "{video_path}" -c:v copy -an -sn "{output_path}"'
-        
-        process = await asyncio.create_subprocess_shell(
-            cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+        returncode, stderr = await run_ffmpeg_on_media(
+            upload_client, file_msg, file.file_size, filename,
+            ["-c:v", "copy", "-an", "-sn", output_path],
+            progress=progress_for_pyrogram,
+            progress_args=("📥 Streaming & processing...", status_msg, time.time())
         )
-        stdout, stderr = await process.communicate()
         
-        if process.returncode == 0 and os.path.exists(output_path):
-            await query.message.edit_text("**📤 Uploading video...**")
+        if returncode == 0 and os.path.exists(output_path):
+            await status_msg.edit_text("**📤 Uploading video...**")
+            
+            settings = await pp_bots.get_user_settings(user_id)
             
             # Get caption
-            c_caption = await pp_bots.get_caption(user_id)
+            c_caption = settings.caption
             caption = c_caption.format(
                 filename=output_name,
                 filesize=humanbytes(os.path.getsize(output_path)),
@@ -310,13 +314,13 @@ async def remove_both_callback(client, query: CallbackQuery):
             
             # Get thumbnail
             ph_path = None
-            c_thumb = await pp_bots.get_thumbnail(user_id)
+            c_thumb = settings.thumbnail
             if c_thumb:
                 ph_path = await client.download_media(c_thumb)
             
             # Check channel
-            upload_channel = await pp_bots.get_upload_channel(user_id)
-            upload_to = upload_channel if upload_channel else query.message.chat.id
+            upload_channel = settings.upload_channel
+            upload_to = upload_channel if upload_channel else status_msg.chat.id
             
             await upload_client.send_video(
                 upload_to,
@@ -324,23 +328,24 @@ async def remove_both_callback(client, query: CallbackQuery):
                 caption=caption,
                 thumb=ph_path,
                 progress=progress_for_pyrogram,
-                progress_args=("📤 Uploading...", query.message, time.time())
+                progress_args=("📤 Uploading...", status_msg, time.time())
             )
             
-            await query.message.edit_text("**✅ Audio and subtitles removed successfully!**")
+            await status_msg.edit_text("**✅ Audio and subtitles removed successfully!**")
             
             clean_file(ph_path)
         else:
             error_msg = stderr.decode()[:200] if stderr else "Unknown error"
-            await query.message.edit_text(f"**❌ Failed to remove streams!**\n\n`{error_msg}`")
+            await status_msg.edit_text(f"**❌ Failed to remove streams!**\n\n`{error_msg}`")
         
         # Cleanup
-        clean_file(video_path)
         clean_file(output_path)
         
     except Exception as e:
-        await query.message.edit_text(f"**❌ Error:** `{e}`")
+        await status_msg.edit_text(f"**❌ Error:** `{e}`")
         logging.error(f"Remove both streams error: {e}")
+    finally:
+        scheduler.release(job)
 
 
 # ==================== COMMAND HANDLER ====================
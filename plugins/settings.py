@@ -10,14 +10,15 @@ async def settings_command(client, message):
     user_id = message.from_user.id
     
     # Get all user settings
-    format_template = await pp_bots.get_format_template(user_id)
-    media_mode = await pp_bots.get_media_mode(user_id)
-    upload_channel = await pp_bots.get_upload_channel(user_id)
-    thumbnail = await pp_bots.get_thumbnail(user_id)
-    caption = await pp_bots.get_caption(user_id)
-    metadata_enabled = await pp_bots.get_metadata(user_id)
-    remove_words = await pp_bots.get_remove_words(user_id)
-    replace_words = await pp_bots.get_replace_words(user_id)
+    settings = await pp_bots.get_user_settings(user_id)
+    format_template = settings.format_template
+    media_mode = settings.media_mode
+    upload_channel = settings.upload_channel
+    thumbnail = settings.thumbnail
+    caption = settings.caption
+    metadata_enabled = settings.metadata
+    remove_words = settings.remove_words
+    replace_words = settings.replace_words
     
     # Format settings text
     format_text = format_template if format_template else "Not Set"
@@ -74,14 +75,15 @@ async def refresh_settings_callback(client, query: CallbackQuery):
     user_id = query.from_user.id
     
     # Get all user settings
-    format_template = await pp_bots.get_format_template(user_id)
-    media_mode = await pp_bots.get_media_mode(user_id)
-    upload_channel = await pp_bots.get_upload_channel(user_id)
-    thumbnail = await pp_bots.get_thumbnail(user_id)
-    caption = await pp_bots.get_caption(user_id)
-    metadata_enabled = await pp_bots.get_metadata(user_id)
-    remove_words = await pp_bots.get_remove_words(user_id)
-    replace_words = await pp_bots.get_replace_words(user_id)
+    settings = await pp_bots.get_user_settings(user_id)
+    format_template = settings.format_template
+    media_mode = settings.media_mode
+    upload_channel = settings.upload_channel
+    thumbnail = settings.thumbnail
+    caption = settings.caption
+    metadata_enabled = settings.metadata
+    remove_words = settings.remove_words
+    replace_words = settings.replace_words
     
     format_text = format_template if format_template else "Not Set"
     mode_text = media_mode.capitalize()
@@ -11,12 +11,13 @@ async def status_command(client, message):
     user_id = message.from_user.id
     
     # Get user settings
-    format_template = await AshutoshGoswami24.get_format_template(user_id)
-    media_preference = await AshutoshGoswami24.get_media_preference(user_id)
-    upload_channel = await AshutoshGoswami24.get_upload_channel(user_id)
-    caption = await AshutoshGoswami24.get_caption(user_id)
-    thumbnail = await AshutoshGoswami24.get_thumbnail(user_id)
-    metadata_enabled = await AshutoshGoswami24.get_metadata(user_id)
+    settings = await AshutoshGoswami24.get_user_settings(user_id)
+    format_template = settings.format_template
+    media_preference = settings.media_preference
+    upload_channel = settings.upload_channel
+    caption = settings.caption
+    thumbnail = settings.thumbnail
+    metadata_enabled = settings.metadata
     
     # Bot uptime
     uptime = time.time() - Config.BOT_UPTIME
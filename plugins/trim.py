@@ -2,6 +2,11 @@ from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from helper.database import pp_bots
 from helper.utils import progress_for_pyrogram, humanbytes, parse_time, format_time, clean_file
+from helper.scheduler import scheduler
+from helper.jobs import job_handler, submit_job
+from helper.tg_download import download_media_parallel
+from helper.downloader import downloader
+from helper.tg_stream import media_server
 from config import Config
 from bot import app
 import os
@@ -15,6 +20,27 @@ from pyromod.exceptions import ListenerTimeout
 trim_sessions = {}
 
 
+async def run_trim(source, start_time, end_time, trimmed_path, seek_input=False):
+    """Stream-copy [start_time, end_time] of source into trimmed_path, returning (returncode, stderr)
+
+    seek_input puts -ss/-to before -i, so ffmpeg seeks in the input instead of
+    reading everything up to start_time; needed when source is a URL.
+    """
+    cut = ["-ss", str(start_time), "-to", str(end_time)]
+    if seek_input:
+        cmd = ["ffmpeg", "-y", *cut, "-i", source, "-c", "copy", "-avoid_negative_ts", "make_zero", trimmed_path]
+    else:
+        cmd = ["ffmpeg", "-y", "-i", source, *cut, "-c", "copy", trimmed_path]
+    
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    return process.returncode, stderr
+
+
 @Client.on_message(filters.private & filters.command("trim"))
 async def trim_command(client, message):
     """Trim video command"""
@@ -59,24 +85,17 @@ async def trim_from_link(client, message, video_link, intro_title=None):
         downloads_dir = "downloads"
         os.makedirs(downloads_dir, exist_ok=True)
         
-        # Download using requests
-        import requests
         filename = f"video_{user_id}_{int(time.time())}.mp4"
         video_path = os.path.join(downloads_dir, filename)
         
-        response = requests.get(video_link, stream=True, timeout=60)
-        total_size = int(response.headers.get('content-length', 0))
+        async def progress(downloaded, total_size):
+            if total_size > 0:
+                try:
+                    await ms.edit(f"**📥 Downloading: {downloaded / total_size * 100:.1f}%**")
+                except:
+                    pass
         
-        with open(video_path, 'wb') as f:
-            downloaded = 0
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    if total_size > 0:
-                        percent = (downloaded / total_size) * 100
-                        if int(percent) % 10 == 0:
-                            await ms.edit(f"**📥 Downloading: {percent:.1f}%**")
+        await downloader.download(video_link, video_path, progress)
         
         await ms.edit("**✂️ Ready to trim! Send start time (HH:MM:SS or MM:SS):**")
         
@@ -155,8 +174,6 @@ async def trim_from_link(client, message, video_link, intro_title=None):
 
 async def handle_trim_mode_media(client, message, file, filename, file_size):
     """Handle trim mode when user sends video file"""
-    user_id = message.from_user.id
-    
     # Ask for start time
     ask_msg = await message.reply_text(
         "**✂️ TRIM VIDEO**\n\n"
@@ -194,8 +211,34 @@ async def handle_trim_mode_media(client, message, file, filename, file_size):
         if end_time <= start_time:
             return await ask_msg.edit("**❌ End time must be greater than start time!**")
         
-        # Download and trim
-        await ask_msg.edit("**📥 Downloading video...**")
+        # Download, trim and upload run as a job (here, or on a worker node)
+        await submit_job(client, "trim", message, ask_msg, {
+            'filename': filename,
+            'file_size': file_size,
+            'start_time': start_time,
+            'end_time': end_time,
+        })
+        
+    except ListenerTimeout:
+        await ask_msg.edit("**⏰ Timeout! Trim cancelled. Please try again.**")
+    except Exception as e:
+        await ask_msg.edit(f"**❌ Error:** `{e}`")
+        logging.error(f"Trim error: {e}")
+
+
+@job_handler("trim")
+async def trim_job(client, message, status_msg, params):
+    """Cut the chosen range out of the video (stream copy) and upload it"""
+    user_id = message.from_user.id
+    filename = params['filename']
+    file_size = params['file_size']
+    start_time = params['start_time']
+    end_time = params['end_time']
+    
+    job = None
+    try:
+        # Stream copy, so it takes a rename slot
+        job = await scheduler.acquire("rename", user_id, status_msg)
         
         downloads_dir = "downloads"
         os.makedirs(downloads_dir, exist_ok=True)
@@ -205,30 +248,43 @@ async def handle_trim_mode_media(client, message, file, filename, file_size):
         
         upload_client = app if (app and Config.STRING_SESSION) else client
         
-        await upload_client.download_media(
-            message,
-            file_name=video_path,
-            progress=progress_for_pyrogram,
-            progress_args=("📥 Downloading...", ask_msg, time.time())
-        )
-        
-        # Trim video
-        await ask_msg.edit("**✂️ Trimming video...**")
-        
-        cmd = f'ffmpeg -i "{video_path}" -ss {start_time} -to {end_time} -c copy "{trimmed_path}"'
+        returncode, stderr = None, b""
+        if Config.TRIM_PARTIAL_DOWNLOAD and file_size:
+            # ffmpeg seeks through the container index over HTTP, so only the
+            # Telegram parts holding the index and the selected range are fetched
+            await status_msg.edit("**✂️ Fetching and trimming the selected part...**")
+            try:
+                async with media_server.serve(upload_client, message, file_size) as (url, streamed):
+                    returncode, stderr = await run_trim(url, start_time, end_time, trimmed_path, seek_input=True)
+                logging.info(f"Partial trim fetched {humanbytes(streamed.fetched)} of {humanbytes(file_size)}")
+            except Exception as e:
+                returncode, stderr = None, str(e).encode()
+            if returncode != 0:
+                logging.warning(f"Partial trim failed, downloading the whole file: {stderr.decode(errors='ignore')[-300:]}")
+                clean_file(trimmed_path)
         
-        process = await asyncio.create_subprocess_shell(
-            cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await process.communicate()
+        if returncode != 0:
+            await status_msg.edit("**📥 Downloading video...**")
+            await download_media_parallel(
+                upload_client,
+                message,
+                video_path,
+                progress=progress_for_pyrogram,
+                progress_args=("📥 Downloading...", status_msg, time.time()),
+                extra_clients=(client,)
+            )
+            
+            # Trim video
+            await status_msg.edit("**✂️ Trimming video...**")
+            returncode, stderr = await run_trim(video_path, start_time, end_time, trimmed_path)
         
-        if process.returncode == 0 and os.path.exists(trimmed_path):
-            await ask_msg.edit("**📤 Uploading trimmed video...**")
+        if returncode == 0 and os.path.exists(trimmed_path):
+            await status_msg.edit("**📤 Uploading trimmed video...**")
+            
+            settings = await pp_bots.get_user_settings(user_id)
             
             # Get caption
-            c_caption = await pp_bots.get_caption(user_id)
+            c_caption = settings.caption
             caption = c_caption.format(
                 filename=f"trimmed_{filename}",
                 filesize=humanbytes(os.path.getsize(trimmed_path)),
@@ -244,12 +300,12 @@ async def handle_trim_mode_media(client, message, file, filename, file_size):
             
             # Get thumbnail
             ph_path = None
-            c_thumb = await pp_bots.get_thumbnail(user_id)
+            c_thumb = settings.thumbnail
             if c_thumb:
                 ph_path = await client.download_media(c_thumb)
             
             # Check channel upload
-            upload_channel = await pp_bots.get_upload_channel(user_id)
+            upload_channel = settings.upload_channel
             upload_to = upload_channel if upload_channel else message.chat.id
             
             await upload_client.send_video(
@@ -258,28 +314,28 @@ async def handle_trim_mode_media(client, message, file, filename, file_size):
                 caption=caption,
                 thumb=ph_path,
                 progress=progress_for_pyrogram,
-                progress_args=("📤 Uploading...", ask_msg, time.time())
+                progress_args=("📤 Uploading...", status_msg, time.time())
             )
             
             if upload_channel:
-                await ask_msg.edit("**✅ Trimmed video uploaded to channel!**")
+                await status_msg.edit("**✅ Trimmed video uploaded to channel!**")
             else:
-                await ask_msg.delete()
+                await status_msg.delete()
             
             clean_file(ph_path)
         else:
             error_msg = stderr.decode() if stderr else "Unknown error"
-            await ask_msg.edit(f"**❌ Trimming failed!**\n\n`{error_msg[:200]}`")
+            await status_msg.edit(f"**❌ Trimming failed!**\n\n`{error_msg[:200]}`")
         
         # Cleanup
         clean_file(video_path)
         clean_file(trimmed_path)
         
-    except ListenerTimeout:
-        await ask_msg.edit("**⏰ Timeout! Trim cancelled. Please try again.**")
     except Exception as e:
-        await ask_msg.edit(f"**❌ Error:** `{e}`")
+        await status_msg.edit(f"**❌ Error:** `{e}`")
         logging.error(f"Trim error: {e}")
+    finally:
+        scheduler.release(job)
 
 
 @Client.on_callback_query(filters.regex("cancel_trim"))
@@ -232,8 +232,7 @@ async def clear_words_command(client, message):
     """Clear all word removals and replacements"""
     user_id = message.from_user.id
     
-    await pp_bots.set_remove_words(user_id, [])
-    await pp_bots.set_replace_words(user_id, {})
+    await pp_bots.update_settings(user_id, remove_words=[], replace_words={})
     
     await message.reply_text(
         "**✅ All Word Removals & Replacements Cleared!**\n\n"
@@ -295,10 +294,13 @@ async def clear_words_callback(client, query):
     """Clear all words via callback"""
     user_id = query.from_user.id
     
-    await pp_bots.set_remove_words(user_id, [])
-    await pp_bots.set_replace_words(user_id, {})
-    await pp_bots.set_prefix(user_id, None)
-    await pp_bots.set_suffix(user_id, None)
+    await pp_bots.update_settings(
+        user_id,
+        remove_words=[],
+        replace_words={},
+        prefix=None,
+        suffix=None,
+    )
     
     await query.answer("✅ All settings cleared!", show_alert=True)
     await query.message.edit_text(